@@ -0,0 +1,201 @@
+"""
+Shared asyncio client for OpenAI Responses API calls.
+
+Every async LLM request in the process runs on one long-lived event loop in a
+background thread. That loop owns a single AsyncOpenAI client (Portkey gateway,
+pooled HTTP connections) and one semaphore capping how many requests are in
+flight, so the pool and the limit are genuinely process-wide: pipelines running
+in different worker threads all share them instead of each opening its own
+connections. Sync code hands coroutines to the loop with run_async; coroutines
+on any other loop can await aresponses_create directly and the request is
+forwarded to the shared loop.
+
+Configuration (environment variables):
+    LLM_ASYNC_CONCURRENCY  Maximum concurrent LLM requests per process (default: 32)
+    LLM_HTTP_POOL_SIZE     Maximum pooled HTTP connections to the gateway (default: 64)
+
+Usage:
+    from async_llm import aresponses_create, run_async
+
+    async def main():
+        return await asyncio.gather(*(aresponses_create(model=..., input=...) for ...))
+
+    responses = run_async(main())
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+import openai
+from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
+from dotenv import load_dotenv
+
+from logger_config import logger
+from llm_cache import acached_responses_create
+
+load_dotenv()
+
+ASYNC_LLM_CONCURRENCY = int(os.getenv("LLM_ASYNC_CONCURRENCY", "32"))
+HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "64"))
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+# Only touched from the shared loop's thread
+_client: Optional[openai.AsyncOpenAI] = None
+_limiter: Optional[asyncio.Semaphore] = None
+_concurrency = ASYNC_LLM_CONCURRENCY
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-llm", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def set_async_concurrency(limit: int) -> None:
+    """
+    Set the process-wide in-flight LLM request limit.
+
+    Requests already waiting keep the previous limit; new ones use this one.
+    """
+    global _concurrency
+    if limit < 1:
+        raise ValueError(f"Async LLM concurrency must be >= 1, got {limit}")
+
+    def _replace():
+        global _concurrency, _limiter
+        _concurrency = limit
+        _limiter = None
+
+    loop = _loop
+    if loop is None:
+        _concurrency = limit
+    else:
+        loop.call_soon_threadsafe(_replace)
+    logger.info(f"Async LLM concurrency limit: {limit}")
+
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """Return the shared AsyncOpenAI client; only valid on the shared loop (see aresponses_create)."""
+    global _client
+    if asyncio.get_running_loop() is not _loop:
+        raise RuntimeError("The shared AsyncOpenAI client can only be used on the async_llm event loop")
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY environment variable is not set")
+        _client = openai.AsyncOpenAI(
+            # Retries and backoff are handled by rate_limiter
+            max_retries=0,
+            api_key=api_key,
+            base_url=PORTKEY_GATEWAY_URL,
+            default_headers=createHeaders(
+                provider="openai",
+                api_key=os.environ.get("PORTKEY_API_KEY"),
+            ),
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE,
+                ),
+            ),
+        )
+        logger.info(f"Created shared AsyncOpenAI client (pool size {HTTP_POOL_SIZE})")
+    return _client
+
+
+def _get_limiter() -> asyncio.Semaphore:
+    global _limiter
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(_concurrency)
+    return _limiter
+
+
+async def _responses_create(client: Optional[openai.AsyncOpenAI], bypass_cache: bool,
+                            accept: Optional[Callable[[Any], bool]], request: dict):
+    async with _get_limiter():
+        return await acached_responses_create(
+            client or get_async_openai_client(), bypass=bypass_cache, accept=accept, **request
+        )
+
+
+async def aresponses_create(
+    client: Optional[openai.AsyncOpenAI] = None,
+    bypass_cache: bool = False,
+    accept: Optional[Callable[[Any], bool]] = None,
+    **request,
+):
+    """
+    Async, rate-bounded, cached equivalent of client.responses.create(**request).
+
+    Runs on the shared loop; awaited from another loop, the request is forwarded
+    there and cancelling the caller cancels the request.
+
+    Args:
+        client: AsyncOpenAI client; defaults to the shared client
+        bypass_cache: Skip the on-disk LLM response cache for this call
+        accept: Cache accept check, see llm_cache.cached_responses_create
+        **request: Keyword arguments for responses.create
+    """
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await _responses_create(client, bypass_cache, accept, request)
+    return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(_responses_create(client, bypass_cache, accept, request), loop)
+    )
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine on the shared loop from sync code and return its result.
+
+    The caller's context variables (cache run, call deadline) are visible to the
+    coroutine. If `timeout` expires the coroutine is cancelled and TimeoutError raised.
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_async cannot be called from the async_llm event loop; await the coroutine instead")
+
+    # run_coroutine_threadsafe schedules the task under a copy of this thread's context
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def close_async_openai_client(timeout: float = 5.0) -> None:
+    """Close the shared client and release its pooled connections."""
+    loop = _loop
+    if loop is None or not loop.is_running():
+        return
+
+    async def _close():
+        global _client
+        client, _client = _client, None
+        if client is not None:
+            await client.close()
+
+    try:
+        asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Closing the shared AsyncOpenAI client failed: {str(e)}")
+
+
+atexit.register(close_async_openai_client)
@@ -0,0 +1,223 @@
+"""
+Concurrency helpers for running several task pipelines side by side.
+
+Every external dependency (LLM, GitHub, Supabase) gets its own bounded
+semaphore so a batch of create_task pipelines cannot flood a single provider.
+Time spent inside each stage is recorded so batch runs can print an
+aggregate throughput/latency report at the end.
+
+run_stage_graph executes the steps of a single pipeline as a dependency
+graph so independent steps overlap.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger_config import logger
+
+# Default in-flight limits per external stage
+DEFAULT_STAGE_LIMITS = {
+    "llm": 8,
+    "github": 4,
+    "supabase": 4,
+}
+
+_stage_semaphores: Dict[str, threading.BoundedSemaphore] = {
+    stage: threading.BoundedSemaphore(limit) for stage, limit in DEFAULT_STAGE_LIMITS.items()
+}
+_stage_stats: Dict[str, Dict] = {}
+_stats_lock = threading.Lock()
+
+
+def configure_stage_limits(llm: Optional[int] = None, github: Optional[int] = None, supabase: Optional[int] = None) -> Dict[str, int]:
+    """
+    Replace the per-stage semaphores with new limits.
+
+    Must be called before any pipeline starts; in-flight holders of the old
+    semaphores are not affected.
+
+    Returns:
+        Dict of the limits now in effect
+    """
+    requested = {"llm": llm, "github": github, "supabase": supabase}
+    limits = {}
+    for stage, default in DEFAULT_STAGE_LIMITS.items():
+        limit = requested.get(stage) or default
+        if limit < 1:
+            raise ValueError(f"Concurrency limit for stage '{stage}' must be >= 1, got {limit}")
+        _stage_semaphores[stage] = threading.BoundedSemaphore(limit)
+        limits[stage] = limit
+    logger.info(f"Stage concurrency limits: {limits}")
+    return limits
+
+
+def reset_stage_stats() -> None:
+    """Clear the recorded per-stage timings."""
+    with _stats_lock:
+        _stage_stats.clear()
+
+
+def _record_stage(stage: str, wait_seconds: float, run_seconds: float) -> None:
+    with _stats_lock:
+        stats = _stage_stats.setdefault(stage, {"calls": 0, "wait_seconds": 0.0, "run_seconds": 0.0, "max_run_seconds": 0.0})
+        stats["calls"] += 1
+        stats["wait_seconds"] += wait_seconds
+        stats["run_seconds"] += run_seconds
+        stats["max_run_seconds"] = max(stats["max_run_seconds"], run_seconds)
+
+
+@contextmanager
+def stage_slot(stage: str):
+    """
+    Hold one concurrency slot for the given stage ("llm", "github" or "supabase").
+
+    Usage:
+        with stage_slot("github"):
+            create_github_repo(...)
+    """
+    semaphore = _stage_semaphores.get(stage)
+    if semaphore is None:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+
+    wait_start = time.monotonic()
+    semaphore.acquire()
+    run_start = time.monotonic()
+    try:
+        yield
+    finally:
+        semaphore.release()
+        _record_stage(stage, run_start - wait_start, time.monotonic() - run_start)
+
+
+def run_stage_graph(
+    stages: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], List[str]]],
+    max_workers: int = 4,
+    on_failure: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run a dependency graph of named stages, starting each stage as soon as all of
+    its dependencies have finished.
+
+    Args:
+        stages: Mapping of stage name -> (function, dependency names). Each function
+                is called with a dict of the results of every stage finished so far
+                (always including its own dependencies).
+        max_workers: Maximum number of stages running at once
+        on_failure: Called with the results of the stages that succeeded once every
+                    running stage has finished after a failure, e.g. to undo side
+                    effects of finished stages. Its own errors are logged and do not
+                    replace the stage's error.
+
+    Returns:
+        Dict of stage name -> result
+
+    Raises:
+        ValueError: If a dependency is unknown or the graph has a cycle
+        Exception: The first exception raised by a stage. Stages already running
+                   are allowed to finish but no new stages are started.
+    """
+    for name, (_, deps) in stages.items():
+        unknown = [d for d in deps if d not in stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stage(s): {unknown}")
+
+    results: Dict[str, Any] = {}
+    pending = dict(stages)
+    running = {}
+    first_error: Optional[BaseException] = None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as executor:
+        while pending or running:
+            if first_error is None:
+                ready = [name for name, (_, deps) in pending.items() if all(d in results for d in deps)]
+                for name in ready:
+                    func, _ = pending.pop(name)
+                    logger.info(f"Starting stage: {name}")
+                    # Each stage runs in a copy of the caller's context (e.g. its LLM cache run)
+                    running[executor.submit(contextvars.copy_context().run, func, dict(results))] = name
+
+            if not running:
+                if first_error is None and pending:
+                    raise ValueError(f"Stage graph has a cycle among: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    logger.info(f"Finished stage: {name}")
+                except Exception as e:
+                    logger.error(f"Stage '{name}' failed: {str(e)}")
+                    if first_error is None:
+                        first_error = e
+
+    if first_error is not None:
+        if on_failure is not None:
+            try:
+                on_failure(dict(results))
+            except Exception as e:
+                logger.error(f"Cleanup after failed stage graph failed: {str(e)}")
+        raise first_error
+    return results
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def format_batch_report(results: List[Dict], wall_seconds: float) -> str:
+    """
+    Format an aggregate throughput/latency report for a batch run.
+
+    Args:
+        results: One dict per pipeline with "label", "status" ("success"/"failed"),
+                 "duration" (seconds) and optionally "error"
+        wall_seconds: Total wall-clock time of the batch
+
+    Returns:
+        Multi-line report string
+    """
+    succeeded = [r for r in results if r["status"] == "success"]
+    failed = [r for r in results if r["status"] != "success"]
+    durations = sorted(r["duration"] for r in results)
+    throughput = (len(succeeded) / wall_seconds * 60) if wall_seconds > 0 else 0.0
+
+    lines = [
+        "BATCH GENERATION REPORT",
+        f"  Pipelines:        {len(results)} ({len(succeeded)} succeeded, {len(failed)} failed)",
+        f"  Wall-clock:       {wall_seconds:.1f}s",
+        f"  Throughput:       {throughput:.2f} tasks/min",
+    ]
+    if durations:
+        lines.append(
+            f"  Task latency:     avg {sum(durations) / len(durations):.1f}s | "
+            f"p50 {_percentile(durations, 50):.1f}s | p95 {_percentile(durations, 95):.1f}s | "
+            f"max {durations[-1]:.1f}s"
+        )
+
+    with _stats_lock:
+        stage_snapshot = {stage: dict(stats) for stage, stats in _stage_stats.items()}
+    if stage_snapshot:
+        lines.append("  Stage timings:")
+        for stage, stats in sorted(stage_snapshot.items()):
+            calls = stats["calls"]
+            lines.append(
+                f"    {stage:<9} {calls:>4} calls | avg run {stats['run_seconds'] / calls:.1f}s | "
+                f"max run {stats['max_run_seconds']:.1f}s | avg wait {stats['wait_seconds'] / calls:.1f}s"
+            )
+
+    if failed:
+        lines.append("  Failures:")
+        for r in failed:
+            lines.append(f"    - {r['label']}: {r.get('error', 'unknown error')}")
+
+    return "\n".join(lines)
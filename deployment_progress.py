@@ -0,0 +1,145 @@
+"""
+Non-blocking progress reporting for task deployments.
+
+A deployment emits a dozen progress messages into task_deployment_jobs.log.
+Writing each one synchronously puts an HTTP round trip on the deploy's
+critical path, so DeploymentProgressReporter records the message, returns
+immediately, and leaves the write to a background thread. Updates that arrive
+within the flush interval are coalesced into one write of the latest state,
+which also carries the ordered history of every message so far. Terminal
+states (COMPLETED / FAILED) are flushed synchronously so callers polling the
+job never miss the outcome.
+
+Configuration (environment variables):
+    DEPLOY_PROGRESS_INTERVAL_SECONDS  Minimum time between progress writes (default: 1)
+"""
+
+import datetime
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from logger_config import logger
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+PROGRESS_MIN_INTERVAL_SECONDS = float(os.getenv("DEPLOY_PROGRESS_INTERVAL_SECONDS", "1"))
+# Oldest history entries are dropped beyond this many
+PROGRESS_HISTORY_LIMIT = 100
+
+
+class DeploymentProgressReporter:
+    """
+    Coalescing writer for one task_deployment_jobs row.
+
+    Without a tasksession_id every method is a no-op, so callers don't need to
+    guard each update.
+    """
+
+    def __init__(
+        self,
+        tasksession_id: Optional[str],
+        supabase_factory: Callable[[], object],
+        min_interval: float = PROGRESS_MIN_INTERVAL_SECONDS,
+    ):
+        self.tasksession_id = tasksession_id
+        self.min_interval = min_interval
+        self._supabase_factory = supabase_factory
+        self._supabase = None
+        self._history: List[Dict] = []
+        self._latest: Optional[Dict] = None
+        self._output: Optional[List[str]] = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tasksession_id)
+
+    def update(self, status: str, message: str) -> None:
+        """Record a progress message; terminal statuses are written before returning."""
+        if not self.enabled:
+            return
+        entry = {
+            "status": status,
+            "message": message,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self._history.append(entry)
+            del self._history[:-PROGRESS_HISTORY_LIMIT]
+            self._latest = entry
+            # Script output belongs to the step that produced it
+            self._output = None
+            self._dirty = True
+        if status in TERMINAL_STATUSES:
+            self.flush()
+        else:
+            self._schedule()
+
+    def set_output(self, lines: List[str]) -> None:
+        """Attach the latest output lines of the running step (no history entry)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._output = list(lines)
+            self._dirty = True
+        self._schedule()
+
+    def flush(self) -> None:
+        """Write the latest state now if anything changed since the last write."""
+        if not self.enabled:
+            return
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty or self._latest is None:
+                    return
+                log = dict(self._latest, history=list(self._history))
+                if self._output is not None:
+                    log["output"] = self._output
+                self._dirty = False
+            try:
+                if self._supabase is None:
+                    self._supabase = self._supabase_factory()
+                self._supabase.table("task_deployment_jobs").update({
+                    "log": log
+                }).eq("tasksession_id", self.tasksession_id).execute()
+            except Exception as e:
+                logger.warning(f"Failed to update deployment log for {self.tasksession_id}: {str(e)}")
+                with self._lock:
+                    self._dirty = True
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Stop the background writer and flush whatever is still pending."""
+        if not self.enabled:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(5.0, 2 * self.min_interval))
+        self.flush()
+
+    def _schedule(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="deployment-progress", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            # Anything recorded during this wait is folded into the same write
+            delay = self.min_interval - (time.monotonic() - self._last_flush)
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
@@ -0,0 +1,443 @@
+"""
+Warm droplet pool for fast task deployment.
+
+Keeps a configured number of droplets per tech stack ready ahead of deploy
+requests. A pool droplet is in one of two states:
+
+    warm    the stack's base images are pulled
+    staged  additionally, one undeployed task of the stack is uploaded to
+            /root/task and its Compose images are pulled and built, so the
+            dependency layers are cached and deploying it is just run.sh against
+            a hot Docker cache plus the database update
+
+Pool state lives on each droplet in a small JSON marker file, so every process
+(the CLI, the API worker) sees the same pool without a shared table. Every
+change of state swaps that marker atomically (it is renamed aside first, so
+only one of several concurrent callers can win). Two more states guard the
+windows in which /root/task is being rewritten:
+
+    staging  stage_task is replacing the staged files; nothing can claim it
+    in-use   a deploy (through claim_droplet or release_droplet) owns the
+             droplet; reconcile_pool leaves it alone until its containers are
+             up, or until the marker is older than DROPLET_POOL_MARKER_TTL
+
+Configuration (environment variables):
+    DROPLET_POOL_CONFIG   JSON stacks keyed by name, e.g.
+                          {"fastapi-postgres": {"competencies": ["comp_1", "comp_2"],
+                                                "size": 2,
+                                                "images": ["python:3.11-slim", "postgres:16"]}}
+    DROPLET_POOL_IPS      Droplets the pool may use (default: AVAILABLE_IPS)
+    DROPLET_POOL_MARKER_TTL
+                          Seconds an in-use or staging marker is honoured, covering a
+                          deploy between upload and run.sh or a slow build (default: 1800)
+
+Droplet addresses may carry a port ("127.0.0.1:2222") and DROPLET_SSH_USER /
+DROPLET_SSH_PORT override the login, so the pool can be exercised against a
+local container running sshd and Docker instead of real droplets.
+"""
+
+import datetime
+import json
+import os
+import shlex
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from logger_config import logger
+from droplet_utils import (
+    DROPLET_PROBE_TIMEOUT_SECONDS,
+    get_available_droplet_ips,
+    probe_droplet_health,
+    score_droplet_health,
+    ssh_connections,
+    upload_files_to_droplet,
+)
+
+POOL_MARKER_PATH = "/root/.droplet_pool.json"
+POOL_TASK_DIR = "/root/task"
+POOL_MARKER_TTL_SECONDS = float(os.getenv("DROPLET_POOL_MARKER_TTL", "1800"))
+# Marker states that can be claimed for a deploy or (re)staged
+_CLAIMABLE_STATES = '"state": "(warm|staged)"'
+# Resolves the Compose CLI on the droplet: v2 plugin or standalone docker-compose
+_COMPOSE_CLI = 'if docker compose version >/dev/null 2>&1; then DC="docker compose"; else DC="docker-compose"; fi'
+
+
+def load_pool_config() -> Dict[str, Dict]:
+    """
+    Read the pool stacks from DROPLET_POOL_CONFIG.
+
+    Returns:
+        {stack_name: {"competencies": [...], "size": int, "images": [...]}}, empty if unset
+    """
+    raw = os.getenv("DROPLET_POOL_CONFIG")
+    if not raw:
+        return {}
+    try:
+        config = json.loads(raw)
+        return {
+            name: {
+                "competencies": list(spec.get("competencies", [])),
+                "size": int(spec.get("size", 1)),
+                "images": list(spec.get("images", [])),
+            }
+            for name, spec in config.items()
+        }
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.warning(f"Ignoring invalid DROPLET_POOL_CONFIG: {str(e)}")
+        return {}
+
+
+def get_pool_droplet_ips() -> List[str]:
+    """Droplets the pool manages: DROPLET_POOL_IPS, falling back to AVAILABLE_IPS."""
+    return get_available_droplet_ips("DROPLET_POOL_IPS") or get_available_droplet_ips()
+
+
+def task_competency_ids(task: Dict) -> Set[str]:
+    """Competency IDs listed in a task's criterias."""
+    criterias = task.get("criterias") or []
+    return {c.get("competency_id") for c in criterias if isinstance(c, dict) and c.get("competency_id")}
+
+
+def stacks_for_task(task: Dict, config: Dict[str, Dict]) -> List[str]:
+    """Pool stacks whose competencies are all covered by the task."""
+    competency_ids = task_competency_ids(task)
+    return [name for name, spec in config.items()
+            if spec["competencies"] and set(spec["competencies"]).issubset(competency_ids)]
+
+
+def read_pool_marker(droplet_ip: str) -> Optional[Dict]:
+    """Return the pool marker of a droplet, or None if it is not in the pool (or unreachable)."""
+    try:
+        ssh_connections.get_client(droplet_ip, timeout=DROPLET_PROBE_TIMEOUT_SECONDS)
+        exit_status, stdout_data, _ = ssh_connections.run(
+            droplet_ip, f"cat {POOL_MARKER_PATH} 2>/dev/null", timeout=DROPLET_PROBE_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        logger.error(f"Error reading pool marker on {droplet_ip}: {str(e)}")
+        return None
+    if exit_status != 0 or not stdout_data.strip():
+        return None
+    try:
+        return json.loads(stdout_data)
+    except ValueError:
+        logger.warning(f"Ignoring corrupt pool marker on {droplet_ip}")
+        return None
+
+
+def _marker_json(marker: Dict) -> str:
+    return json.dumps(dict(marker, updated_at=datetime.datetime.now(datetime.timezone.utc).isoformat()))
+
+
+def _write_pool_marker(droplet_ip: str, marker: Dict) -> None:
+    tmp_path = f"{POOL_MARKER_PATH}.tmp"
+    exit_status, _, stderr_data = ssh_connections.run(
+        droplet_ip, f"printf %s {shlex.quote(_marker_json(marker))} > {tmp_path} && mv {tmp_path} {POOL_MARKER_PATH}"
+    )
+    if exit_status != 0:
+        raise RuntimeError(f"Failed to write pool marker on {droplet_ip}: {stderr_data.strip()}")
+
+
+def _swap_pool_marker(droplet_ip: str, marker: Dict, require: Optional[str] = None) -> Optional[Dict]:
+    """
+    Atomically replace a droplet's pool marker with `marker`.
+
+    The current marker is renamed aside first, so of several concurrent callers
+    only one takes it. With `require` (an extended regex) the swap only happens
+    if the current marker matches it; otherwise the marker is put back.
+
+    Returns:
+        The replaced marker ({} if it was corrupt), or None if there was no
+        marker, it did not match, or another caller won
+    """
+    taken_path = f"{POOL_MARKER_PATH}.swap.$$"
+    check = f"grep -qE {shlex.quote(require)} {taken_path} || {{ mv {taken_path} {POOL_MARKER_PATH}; exit 1; }}; " \
+        if require else ""
+    command = (
+        f"mv {POOL_MARKER_PATH} {taken_path} 2>/dev/null || exit 1; {check}"
+        f"cat {taken_path} && printf %s {shlex.quote(_marker_json(marker))} > {taken_path} && mv {taken_path} {POOL_MARKER_PATH}"
+    )
+    try:
+        exit_status, stdout_data, _ = ssh_connections.run(droplet_ip, command)
+    except Exception as e:
+        logger.error(f"Error updating pool marker on {droplet_ip}: {str(e)}")
+        return None
+    if exit_status != 0:
+        return None
+    try:
+        return json.loads(stdout_data)
+    except ValueError:
+        return {}
+
+
+def _in_use_marker(via: str) -> Dict:
+    return {"state": "in-use", "via": via}
+
+
+def _marker_expired(marker: Dict) -> bool:
+    """Whether an in-use or staging marker is old enough that its owner has finished or died."""
+    try:
+        updated_at = datetime.datetime.fromisoformat(marker["updated_at"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    age = datetime.datetime.now(datetime.timezone.utc) - updated_at
+    return age.total_seconds() > POOL_MARKER_TTL_SECONDS
+
+
+def release_droplet(droplet_ip: str) -> Optional[Dict]:
+    """
+    Mark a droplet in-use before a deploy that did not go through claim_droplet.
+
+    Every deploy path calls this (when a pool is configured) before touching
+    /root/task, so reconcile_pool never warms or stages over a deploy in
+    progress, even while the droplet has no containers yet, and no "staged"
+    marker outlives the files it describes. Staged task files are removed.
+
+    Returns:
+        The pool marker that was replaced, or None if the droplet was not in the pool
+    """
+    marker = _swap_pool_marker(droplet_ip, _in_use_marker("deploy"))
+    if marker is None:
+        _write_pool_marker(droplet_ip, _in_use_marker("deploy"))
+        return None
+    if marker.get("state") in ("warm", "staged", "staging"):
+        logger.info(f"Took {droplet_ip} out of the pool ({marker.get('state')}, stack '{marker.get('stack')}')")
+    if marker.get("state") == "staged":
+        try:
+            ssh_connections.run(droplet_ip, f"rm -rf {POOL_TASK_DIR}")
+        except Exception as e:
+            logger.warning(f"Failed to clear staged files on {droplet_ip}: {str(e)}")
+    return marker
+
+
+def pool_status(droplet_ips: List[str]) -> Dict[str, Dict]:
+    """
+    Probe droplets concurrently for load and pool membership.
+
+    Returns:
+        {ip: {"health": dict or None, "marker": dict or None}}
+    """
+    def _probe(ip: str) -> Dict:
+        health = probe_droplet_health(ip)
+        return {"health": health, "marker": read_pool_marker(ip) if health is not None else None}
+
+    if not droplet_ips:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(droplet_ips)) as executor:
+        return dict(zip(droplet_ips, executor.map(_probe, droplet_ips)))
+
+
+def warm_droplet(droplet_ip: str, stack: str, images: List[str]) -> bool:
+    """Pull a stack's base images on a droplet (in parallel) and mark it warm for that stack."""
+    logger.info(f"Warming {droplet_ip} for stack '{stack}' ({len(images)} image(s))")
+    if images:
+        pulls = " ".join(shlex.quote(image) for image in images)
+        command = (
+            f"pids=; for image in {pulls}; do docker pull -q \"$image\" >/dev/null & pids=\"$pids $!\"; done; "
+            "rc=0; for pid in $pids; do wait $pid || rc=1; done; exit $rc"
+        )
+        exit_status, _, stderr_data = ssh_connections.run(droplet_ip, command)
+        if exit_status != 0:
+            logger.error(f"Failed to pull base images on {droplet_ip}: {stderr_data.strip()}")
+            return False
+    _write_pool_marker(droplet_ip, {"stack": stack, "state": "warm"})
+    return True
+
+
+def stage_task(droplet_ip: str, stack: str, task: Dict, fetch_task_files: Callable[[str, str], bool]) -> bool:
+    """
+    Upload a task to a warm droplet and pre-build its images without starting them.
+
+    Args:
+        droplet_ip: Pool droplet to stage on
+        stack: Stack the droplet belongs to
+        task: Task row (needs task_id and task_blob.resources.github_repo)
+        fetch_task_files: Downloads a GitHub repo URL into a local directory (download_repo_files)
+    """
+    task_id = task.get("task_id")
+    github_repo_url = (task.get("task_blob") or {}).get("resources", {}).get("github_repo")
+    if not github_repo_url:
+        logger.warning(f"Task {task_id} has no GitHub repository; not staging it")
+        return False
+
+    # Take the droplet out of reach of claim_droplet before its files change
+    staging_id = uuid.uuid4().hex
+    if _swap_pool_marker(droplet_ip, {"stack": stack, "state": "staging", "task_id": task_id, "staging_id": staging_id},
+                         require=_CLAIMABLE_STATES) is None:
+        logger.info(f"{droplet_ip} was claimed or is busy; not staging task {task_id} on it")
+        return False
+
+    def _finish(marker: Dict) -> bool:
+        # Only if our staging marker is still there: a deploy may have taken the droplet meanwhile
+        if _swap_pool_marker(droplet_ip, marker, require=staging_id) is None:
+            logger.warning(f"{droplet_ip} left the pool while task {task_id} was being staged")
+            return False
+        return True
+
+    logger.info(f"Staging task {task_id} on {droplet_ip} (stack '{stack}')")
+    local_dir = tempfile.mkdtemp(prefix=f"stage_{task_id}_")
+    try:
+        if not fetch_task_files(github_repo_url, local_dir):
+            _finish({"stack": stack, "state": "warm"})
+            return False
+        exit_status, _, stderr_data = ssh_connections.run(droplet_ip, f"rm -rf {POOL_TASK_DIR}")
+        if exit_status != 0:
+            logger.error(f"Failed to clear {POOL_TASK_DIR} on {droplet_ip}: {stderr_data.strip()}")
+            _finish({"stack": stack, "state": "warm"})
+            return False
+        if not upload_files_to_droplet(local_dir, droplet_ip, POOL_TASK_DIR):
+            _finish({"stack": stack, "state": "warm"})
+            return False
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+
+    # Pull service images and build app images so run.sh only has to start them
+    command = (
+        f"cd {POOL_TASK_DIR} && if [ -n \"$(ls docker-compose.y*ml compose.y*ml 2>/dev/null)\" ]; then "
+        f"{_COMPOSE_CLI}; $DC pull --ignore-pull-failures -q && $DC build -q; fi"
+    )
+    exit_status, _, stderr_data = ssh_connections.run(droplet_ip, command)
+    if exit_status != 0:
+        logger.error(f"Failed to pre-build task {task_id} on {droplet_ip}: {stderr_data.strip()[-2000:]}")
+        _finish({"stack": stack, "state": "warm"})
+        return False
+    if not _finish({"stack": stack, "state": "staged", "task_id": task_id}):
+        return False
+    logger.info(f"Task {task_id} staged on {droplet_ip}")
+    return True
+
+
+def _try_claim(droplet_ip: str) -> Optional[Dict]:
+    """Atomically mark a warm or staged droplet in-use; returns its pool marker if this caller won the claim."""
+    return _swap_pool_marker(droplet_ip, _in_use_marker("claim"), require=_CLAIMABLE_STATES)
+
+
+def claim_droplet(
+    task: Dict,
+    droplet_ips: List[str],
+    config: Optional[Dict[str, Dict]] = None,
+    statuses: Optional[Dict[str, Dict]] = None,
+) -> Optional[Tuple[str, Dict]]:
+    """
+    Claim the best pool droplet for a task.
+
+    Preference: a droplet with this exact task staged, then a warm droplet of
+    the task's stack, then one staged with another task of the same stack
+    (its base images are still hot).
+
+    Args:
+        task: Task row (needs task_id and criterias)
+        droplet_ips: Candidate droplets
+        config: Pool stacks (default: load_pool_config())
+        statuses: pool_status(droplet_ips) if the caller already probed them
+
+    Returns:
+        (droplet_ip, marker) where marker["state"] == "staged" and
+        marker["task_id"] == task_id means files are already in place; None if no
+        pool droplet fits
+    """
+    config = load_pool_config() if config is None else config
+    stacks = stacks_for_task(task, config)
+    if not stacks:
+        return None
+
+    task_id = task.get("task_id")
+    exact, warm, reusable = [], [], []
+    statuses = pool_status(droplet_ips) if statuses is None else statuses
+    for ip, status in statuses.items():
+        marker, health = status["marker"], status["health"]
+        if not marker or not health or score_droplet_health(health) is None or marker.get("stack") not in stacks:
+            continue
+        if marker.get("state") == "staged" and marker.get("task_id") == task_id:
+            exact.append(ip)
+        elif marker.get("state") == "warm":
+            warm.append(ip)
+        elif marker.get("state") == "staged":
+            reusable.append(ip)
+
+    for ip in exact + warm + reusable:
+        marker = _try_claim(ip)
+        if marker is not None:
+            logger.info(f"Claimed pool droplet {ip} ({marker.get('state')}, stack '{marker.get('stack')}')")
+            return ip, marker
+    return None
+
+
+def reconcile_pool(
+    droplet_ips: List[str],
+    find_tasks: Callable[[List[str]], List[Dict]],
+    fetch_task_files: Callable[[str, str], bool],
+    config: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Bring every stack up to its configured size and stage tasks on its droplets.
+
+    Free droplets (reachable, no containers, and no marker or only an expired
+    in-use one) are warmed for stacks below their size. Every warm member, and
+    every member staged with a task that has since been deployed elsewhere, gets
+    the next undeployed task of the stack that is not already staged somewhere.
+    Members another process is staging are left alone.
+
+    Args:
+        droplet_ips: Droplets the pool may use
+        find_tasks: Returns undeployed tasks containing all given competency IDs, most wanted first
+        fetch_task_files: Downloads a GitHub repo URL into a local directory
+        config: Pool stacks (default: load_pool_config())
+
+    Returns:
+        {stack: {"size": target, "warm": n, "staged": n}} after reconciling
+    """
+    config = load_pool_config() if config is None else config
+    statuses = pool_status(droplet_ips)
+    markers = {ip: status["marker"] for ip, status in statuses.items()
+               if status["marker"] and status["marker"].get("state") != "in-use"}
+    # A fresh in-use marker is a deploy that has not started its containers yet
+    free = [ip for ip, status in statuses.items()
+            if status["health"] is not None and score_droplet_health(status["health"]) is not None
+            and (not status["marker"] or (status["marker"].get("state") == "in-use" and _marker_expired(status["marker"])))]
+
+    # (ip, stack, warm first?, task to stage or None)
+    jobs: List[Tuple[str, str, bool, Optional[Dict]]] = []
+    for stack, spec in config.items():
+        members = [ip for ip, marker in markers.items()
+                   if marker.get("stack") == stack and score_droplet_health(statuses[ip]["health"] or {}) is not None]
+        new_members = []
+        while len(members) + len(new_members) < spec["size"] and free:
+            new_members.append(free.pop(0))
+
+        undeployed = find_tasks(spec["competencies"]) if spec["competencies"] else []
+        undeployed_ids = {task.get("task_id") for task in undeployed}
+        staged_ids = {marker.get("task_id") for marker in markers.values()
+                      if marker.get("state") in ("staged", "staging") and marker.get("task_id") in undeployed_ids}
+        queue = [task for task in undeployed if task.get("task_id") not in staged_ids]
+
+        # Leave droplets another process is staging; one whose staging died is warmed again
+        stale = [ip for ip in members if markers[ip].get("state") == "staging" and _marker_expired(markers[ip])]
+        needs_task = [ip for ip in members
+                      if markers[ip].get("state") == "warm"
+                      or (markers[ip].get("state") == "staged" and markers[ip].get("task_id") not in undeployed_ids)] + stale
+        for ip in new_members + needs_task:
+            jobs.append((ip, stack, ip in new_members or ip in stale, queue.pop(0) if queue else None))
+
+    def _prepare(job: Tuple[str, str, bool, Optional[Dict]]) -> None:
+        ip, stack, needs_warm, task = job
+        try:
+            if needs_warm and not warm_droplet(ip, stack, config[stack]["images"]):
+                return
+            if task is not None:
+                stage_task(ip, stack, task, fetch_task_files)
+        except Exception as e:
+            logger.error(f"Failed to prepare pool droplet {ip} for stack '{stack}': {str(e)}")
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            list(executor.map(_prepare, jobs))
+
+    summary = {stack: {"size": spec["size"], "warm": 0, "staged": 0} for stack, spec in config.items()}
+    for ip in droplet_ips:
+        marker = read_pool_marker(ip)
+        if marker and marker.get("stack") in summary and marker.get("state") in ("warm", "staged"):
+            summary[marker["stack"]][marker["state"]] += 1
+    return summary
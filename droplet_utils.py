@@ -1,21 +1,83 @@
+import atexit
 import base64
+import codecs
+import hashlib
+import io
+import json
 import os
+import shlex
+import socket
+import tarfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from io import StringIO
 
 import digitalocean
 import paramiko
 
 from logger_config import logger
-from pathlib import Path
-from typing import Dict, List
+from pathlib import Path, PurePosixPath
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Login user and default port for droplet SSH; a host may also be given as "ip:port"
+DROPLET_SSH_USER = os.getenv("DROPLET_SSH_USER", "root")
+DROPLET_SSH_PORT = int(os.getenv("DROPLET_SSH_PORT", "22"))
+# Wall-clock limit for run.sh / reset scripts; the remote process group is killed after it
+REMOTE_SCRIPT_TIMEOUT_SECONDS = float(os.getenv("REMOTE_SCRIPT_TIMEOUT_SECONDS", "1800"))
+# Bytes of stdout/stderr kept per streamed command (older output is only logged)
+STREAM_TAIL_BYTES = 64 * 1024
+_REMOTE_PGID_MARKER = "__REMOTE_PGID__="
+# Seconds between SSH keepalive packets on pooled connections
+SSH_KEEPALIVE_SECONDS = 30
+# Pooled connections unused for longer than this are closed on the next checkout
+SSH_IDLE_TIMEOUT_SECONDS = 300
+# Wall-clock limit for a command fed through stdin (e.g. the archive upload)
+SSH_INPUT_TIMEOUT_SECONDS = float(os.getenv("SSH_INPUT_TIMEOUT_SECONDS", "600"))
+# "archive" (single tar.gz stream) or "sftp" (per-file put)
+DROPLET_UPLOAD_MODE = os.getenv("DROPLET_UPLOAD_MODE", "archive")
+# SSH connect/command timeout for a droplet health probe
+DROPLET_PROBE_TIMEOUT_SECONDS = float(os.getenv("DROPLET_PROBE_TIMEOUT_SECONDS", "10"))
+# An idle droplet scoring at least this is taken as soon as its probe answers
+DROPLET_GOOD_ENOUGH_SCORE = float(os.getenv("DROPLET_GOOD_ENOUGH_SCORE", "0.5"))
+# Relative weight of CPU, memory and disk headroom in score_droplet_health
+DROPLET_SCORE_WEIGHTS = {"cpu": 0.4, "memory": 0.35, "disk": 0.25}
+# One round trip collecting every load signal as key=value lines
+_HEALTH_PROBE_COMMAND = (
+    "echo containers=$(docker ps -q | wc -l); "
+    "echo cpus=$(nproc); "
+    "echo load1=$(cut -d' ' -f1 /proc/loadavg); "
+    "awk '/^MemTotal:/ {print \"mem_total_kb=\" $2} /^MemAvailable:/ {print \"mem_available_kb=\" $2}' /proc/meminfo; "
+    "df -Pk / | awk 'NR==2 {print \"disk_total_kb=\" $2; print \"disk_available_kb=\" $4}'"
+)
+
+_ssh_key_cache: Dict[str, object] = {}
+_ssh_key_lock = threading.Lock()
 
 
 def get_ssh_key():
-    """Load SSH private key from environment variable (base64 encoded or raw PEM) and return paramiko key object."""
+    """
+    Load SSH private key from environment variable (base64 encoded or raw PEM) and return paramiko key object.
+
+    The parsed key is cached per env value, so repeated calls don't re-decode it.
+    """
     raw_value = os.getenv("DROPLET_SSH_PRIVATE_KEY")
     if not raw_value:
         return None
 
+    with _ssh_key_lock:
+        if raw_value not in _ssh_key_cache:
+            key = _parse_ssh_key(raw_value)
+            if key is None:
+                return None
+            _ssh_key_cache.clear()
+            _ssh_key_cache[raw_value] = key
+        return _ssh_key_cache[raw_value]
+
+
+def _parse_ssh_key(raw_value: str):
+    """Decode the raw DROPLET_SSH_PRIVATE_KEY value into a paramiko key (Ed25519 or RSA)."""
     ssh_private_key = None
     raw_value = raw_value.strip().replace("\r\n", "\n").replace("\r", "\n")
 
@@ -49,42 +111,520 @@ def get_ssh_key():
     return None
 
 
-def get_droplet_info(droplet_ip: str) -> dict:
+def split_ssh_host(host: str) -> Tuple[str, int]:
+    """Split "ip[:port]" into (ip, port), defaulting to DROPLET_SSH_PORT."""
+    hostname, sep, port = host.rpartition(":")
+    if sep and port.isdigit() and ":" not in hostname:
+        return hostname, int(port)
+    return host, DROPLET_SSH_PORT
+
+
+class _OutputStream:
+    """Incremental line splitter for one output stream, keeping only a bounded tail."""
+
+    # A line longer than this is forwarded in pieces rather than buffered whole
+    MAX_LINE_BYTES = 64 * 1024
+
+    def __init__(self, name: str, on_output: Optional[Callable[[str, str], None]], tail_bytes: int):
+        self.name = name
+        self.on_output = on_output
+        self.tail_bytes = tail_bytes
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+        self._tail: Deque[str] = deque()
+        self._tail_size = 0
+
+    def feed(self, data: bytes) -> None:
+        text = self._partial + self._decoder.decode(data)
+        lines = text.split("\n")
+        self._partial = lines.pop()
+        if len(self._partial) > self.MAX_LINE_BYTES:
+            lines.append(self._partial)
+            self._partial = ""
+        for line in lines:
+            self._emit(line)
+
+    def flush(self) -> None:
+        text = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if text:
+            self._emit(text)
+
+    def _emit(self, line: str) -> None:
+        self._tail.append(line)
+        self._tail_size += len(line) + 1
+        while self._tail_size > self.tail_bytes and len(self._tail) > 1:
+            self._tail_size -= len(self._tail.popleft()) + 1
+        if self.on_output is not None:
+            try:
+                self.on_output(self.name, line)
+            except Exception as e:
+                logger.warning(f"Output callback failed: {str(e)}")
+
+    def tail(self) -> str:
+        return "\n".join(self._tail)
+
+
+class SSHConnectionManager:
+    """
+    Keeps one authenticated SSH connection (and SFTP session) per droplet and
+    reuses it for every upload and command of a deployment.
+
+    Connections are health-checked on checkout and transparently reopened if the
+    transport died. A connection is checked out for the whole of each command or
+    SFTP session and is never closed as idle while checked out. Use the
+    module-level `ssh_connections` instance.
+    """
+
+    def __init__(self, username: str = DROPLET_SSH_USER):
+        self.username = username
+        self._clients: Dict[str, paramiko.SSHClient] = {}
+        self._sftp: Dict[str, paramiko.SFTPClient] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._sftp_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _host_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+    def _sftp_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            return self._sftp_locks.setdefault(host, threading.Lock())
+
+    def _is_idle(self, host: str, now: float) -> bool:
+        """Caller holds self._lock."""
+        used = self._last_used.get(host)
+        return (used is not None and not self._in_use.get(host)
+                and now - used > SSH_IDLE_TIMEOUT_SECONDS)
+
+    def _close_idle(self, keep: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            idle = [host for host in self._last_used if host != keep and self._is_idle(host, now)]
+        for host in idle:
+            with self._host_lock(host):
+                # A checkout may have started since the scan; only close if still idle
+                with self._lock:
+                    if not self._is_idle(host, time.monotonic()):
+                        continue
+                logger.info(f"Closing idle SSH connection to {host}")
+                self._discard(host)
+
+    @contextmanager
+    def checkout(self, host: str, timeout: float = 30) -> Iterator[paramiko.SSHClient]:
+        """Hold the pooled client for host for the duration of the block."""
+        with self._lock:
+            self._in_use[host] = self._in_use.get(host, 0) + 1
+        try:
+            yield self.get_client(host, timeout=timeout)
+        finally:
+            with self._lock:
+                self._in_use[host] -= 1
+                if not self._in_use[host]:
+                    del self._in_use[host]
+                if host in self._clients:
+                    self._last_used[host] = time.monotonic()
+
+    def get_client(self, host: str, timeout: float = 30) -> paramiko.SSHClient:
+        """
+        Return a live SSH client for host, connecting on first use or after a dropped transport.
+
+        Use checkout() instead when holding on to the client, so it is not closed as idle.
+        """
+        self._close_idle(keep=host)
+        with self._host_lock(host):
+            client = self._clients.get(host)
+            transport = client.get_transport() if client else None
+            if transport is None or not transport.is_active():
+                if client is not None:
+                    logger.info(f"SSH connection to {host} dropped; reconnecting")
+                    self._discard(host)
+                ssh_key = get_ssh_key()
+                if not ssh_key:
+                    raise RuntimeError("Failed to load SSH key for droplet (set DROPLET_SSH_PRIVATE_KEY in env)")
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                hostname, port = split_ssh_host(host)
+                client.connect(hostname, port=port, username=self.username, pkey=ssh_key, timeout=timeout)
+                client.get_transport().set_keepalive(SSH_KEEPALIVE_SECONDS)
+                self._clients[host] = client
+                logger.info(f"Opened SSH connection to {host}")
+            with self._lock:
+                self._last_used[host] = time.monotonic()
+            return client
+
+    @contextmanager
+    def sftp_session(self, host: str, timeout: float = 30) -> Iterator[paramiko.SFTPClient]:
+        """
+        The pooled SFTP session on host, held exclusively for the duration of the block.
+
+        SFTPClient is not safe to use from several threads at once, so concurrent
+        callers for the same host wait for each other.
+        """
+        with self.checkout(host, timeout=timeout) as client, self._sftp_lock(host):
+            with self._host_lock(host):
+                sftp = self._sftp.get(host)
+                if sftp is None or sftp.get_channel() is None or sftp.get_channel().closed:
+                    sftp = client.open_sftp()
+                    self._sftp[host] = sftp
+            yield sftp
+
+    def run(self, host: str, command: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """
+        Run a command on host over the pooled connection and wait for it to finish.
+
+        Returns:
+            (exit_status, stdout, stderr)
+        """
+        with self.checkout(host) as client:
+            stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+            stdout_data = stdout.read().decode()
+            stderr_data = stderr.read().decode()
+            exit_status = stdout.channel.recv_exit_status()
+        return exit_status, stdout_data, stderr_data
+
+    def run_with_input(
+        self,
+        host: str,
+        command: str,
+        data: bytes,
+        chunk_size: int = 256 * 1024,
+        timeout: Optional[float] = SSH_INPUT_TIMEOUT_SECONDS,
+    ) -> Tuple[int, str, str]:
+        """
+        Run a command on host over the pooled connection, streaming data to its stdin.
+
+        Raises TimeoutError (and closes the channel) if sending the data and waiting
+        for the command take longer than timeout seconds (None or 0 = no limit).
+
+        Returns:
+            (exit_status, stdout, stderr)
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def remaining() -> Optional[float]:
+            if deadline is None:
+                return None
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise TimeoutError(f"Command on {host} exceeded {timeout:.0f}s")
+            return left
+
+        with self.checkout(host) as client:
+            channel = client.get_transport().open_session()
+            try:
+                channel.exec_command(command)
+                view = memoryview(data)
+                try:
+                    for offset in range(0, len(view), chunk_size):
+                        channel.settimeout(remaining())
+                        channel.sendall(view[offset:offset + chunk_size])
+                except socket.timeout:
+                    raise TimeoutError(f"Sending input to {host} exceeded {timeout:.0f}s")
+                channel.shutdown_write()
+                stdout_data, stderr_data = bytearray(), bytearray()
+                while True:
+                    idle = True
+                    if channel.recv_ready():
+                        stdout_data += channel.recv(65536)
+                        idle = False
+                    if channel.recv_stderr_ready():
+                        stderr_data += channel.recv_stderr(65536)
+                        idle = False
+                    if idle and channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                        break
+                    remaining()
+                    if idle:
+                        time.sleep(0.05)
+                exit_status = channel.recv_exit_status()
+            finally:
+                channel.close()
+        return exit_status, stdout_data.decode(), stderr_data.decode()
+
+    def run_streaming(
+        self,
+        host: str,
+        command: str,
+        on_output: Optional[Callable[[str, str], None]] = None,
+        timeout: Optional[float] = REMOTE_SCRIPT_TIMEOUT_SECONDS,
+        tail_bytes: int = STREAM_TAIL_BYTES,
+    ) -> Tuple[int, str, str]:
+        """
+        Run a long command on host, forwarding its output line by line as it arrives.
+
+        Only the last tail_bytes of each stream are kept, so memory stays bounded
+        however much the command prints. If the command runs longer than timeout
+        seconds its whole remote process group is killed and TimeoutError is raised.
+
+        Args:
+            host: Droplet address
+            command: Shell command to run
+            on_output: Called with ("stdout" | "stderr", line) for every output line
+            timeout: Wall-clock limit in seconds (None or 0 = no limit)
+            tail_bytes: Bytes of each stream to keep for the return value
+
+        Returns:
+            (exit_status, stdout tail, stderr tail)
+        """
+        with self.checkout(host) as client:
+            return self._run_streaming(client, host, command, on_output, timeout, tail_bytes)
+
+    def _run_streaming(
+        self,
+        client: paramiko.SSHClient,
+        host: str,
+        command: str,
+        on_output: Optional[Callable[[str, str], None]],
+        timeout: Optional[float],
+        tail_bytes: int,
+    ) -> Tuple[int, str, str]:
+        channel = client.get_transport().open_session()
+        # sshd starts every exec in its own session, so the shell's PID is the process
+        # group of everything the command spawns; report it first so we can kill the group
+        channel.exec_command(f"echo {_REMOTE_PGID_MARKER}$$ >&2; exec bash -c {shlex.quote(command)}")
+        streams = {name: _OutputStream(name, on_output, tail_bytes) for name in ("stdout", "stderr")}
+        pgid = None
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                idle = True
+                if channel.recv_ready():
+                    streams["stdout"].feed(channel.recv(65536))
+                    idle = False
+                if channel.recv_stderr_ready():
+                    data = channel.recv_stderr(65536)
+                    if pgid is None and _REMOTE_PGID_MARKER.encode() in data:
+                        head, _, rest = data.partition(_REMOTE_PGID_MARKER.encode())
+                        pid_line, _, data = rest.partition(b"\n")
+                        pgid = int(pid_line.strip() or 0) or None
+                        data = head + data
+                    streams["stderr"].feed(data)
+                    idle = False
+                if idle and channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    self._kill_process_group(host, pgid)
+                    raise TimeoutError(f"Command on {host} exceeded {timeout:.0f}s and was killed")
+                if idle:
+                    time.sleep(0.05)
+            exit_status = channel.recv_exit_status()
+        finally:
+            channel.close()
+            for stream in streams.values():
+                stream.flush()
+        return exit_status, streams["stdout"].tail(), streams["stderr"].tail()
+
+    def _kill_process_group(self, host: str, pgid: Optional[int]) -> None:
+        """TERM, then KILL after a grace period, every process in a remote process group."""
+        if not pgid:
+            logger.warning(f"Remote process group on {host} unknown; closing the channel only")
+            return
+        logger.warning(f"Killing remote process group {pgid} on {host}")
+        try:
+            self.run(host, f"kill -TERM -- -{pgid} 2>/dev/null; sleep 5; kill -KILL -- -{pgid} 2>/dev/null; true", timeout=30)
+        except Exception as e:
+            logger.error(f"Failed to kill remote process group {pgid} on {host}: {str(e)}")
+
+    def _discard(self, host: str) -> None:
+        sftp = self._sftp.pop(host, None)
+        client = self._clients.pop(host, None)
+        with self._lock:
+            self._last_used.pop(host, None)
+        for resource in (sftp, client):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+
+    def close(self, host: str) -> None:
+        """Close the pooled connection to host, if any."""
+        with self._host_lock(host):
+            self._discard(host)
+
+    def discard_if_idle(self, host: str) -> bool:
+        """
+        Close the pooled connection to host unless a checkout is using it.
+
+        For dropping a connection that just failed: another thread's command on
+        the same host keeps running, and the next get_client reconnects if the
+        transport is really dead.
+
+        Returns:
+            True if the connection was closed
+        """
+        with self._host_lock(host):
+            with self._lock:
+                if self._in_use.get(host):
+                    return False
+            self._discard(host)
+            return True
+
+    def close_all(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            hosts = list(self._clients)
+        for host in hosts:
+            self.close(host)
+
+
+ssh_connections = SSHConnectionManager()
+atexit.register(ssh_connections.close_all)
+
+
+class DropletInventory:
     """
-    Get droplet information from DigitalOcean API.
+    IP -> droplet index of the DigitalOcean account, cached in memory and on disk.
+
+    Listing every droplet is a paginated API crawl, so it happens at most once per
+    DO_INVENTORY_TTL_SECONDS and off the caller's thread: lookups answer from the
+    cache and a stale or missing entry only schedules a background refresh.
+
+    Configuration (environment variables):
+        DO_INVENTORY_PATH         Cache file (default: .droplet_inventory.json next to this file)
+        DO_INVENTORY_TTL_SECONDS  Age after which the index is refreshed (default: 900)
+    """
+
+    # Never re-list the account more often than this, even on repeated misses
+    MIN_REFRESH_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: Path, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._droplets: Optional[Dict[str, dict]] = None
+        self._refreshed_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _load(self) -> None:
+        """Populate the index from disk on first use (caller holds the lock)."""
+        if self._droplets is not None:
+            return
+        self._droplets = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._droplets = dict(data.get("droplets", {}))
+            self._refreshed_at = float(data.get("refreshed_at", 0))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable droplet inventory {self.path}: {str(e)}")
+
+    def _save(self, droplets: Dict[str, dict], refreshed_at: float) -> None:
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"refreshed_at": refreshed_at, "droplets": droplets}, f, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to persist droplet inventory to {self.path}: {str(e)}")
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            self._load()
+            return time.time() - self._refreshed_at > self.ttl_seconds
+
+    def refresh(self) -> bool:
+        """List the account's droplets and rebuild the index (blocking)."""
+        do_token = os.getenv("DIGITALOCEAN_API_PAT")
+        if not do_token:
+            logger.warning("DigitalOcean API token not found, skipping droplet info")
+            return False
+        try:
+            manager = digitalocean.Manager(token=do_token)
+            droplets = {}
+            for droplet in manager.get_all_droplets():
+                if droplet.ip_address:
+                    droplets[droplet.ip_address] = {
+                        "id": droplet.id,
+                        "name": droplet.name,
+                        "size": droplet.size_slug,
+                        "region": droplet.region["slug"],
+                        "status": droplet.status,
+                        "created_at": droplet.created_at
+                    }
+        except Exception as e:
+            logger.error(f"Error listing DigitalOcean droplets: {str(e)}")
+            return False
+
+        refreshed_at = time.time()
+        with self._lock:
+            self._droplets = droplets
+            self._refreshed_at = refreshed_at
+        self._save(droplets, refreshed_at)
+        logger.info(f"Refreshed droplet inventory ({len(droplets)} droplets)")
+        return True
+
+    def refresh_async(self, force: bool = False) -> Optional[threading.Thread]:
+        """Start a background refresh unless one is running or the last attempt was too recent."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            now = time.monotonic()
+            if not force and self._last_attempt and now - self._last_attempt < self.MIN_REFRESH_INTERVAL_SECONDS:
+                return None
+            self._last_attempt = now
+            self._refresh_thread = threading.Thread(target=self.refresh, name="droplet-inventory-refresh", daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+
+    def prefetch(self) -> None:
+        """Refresh in the background if the index is stale, so a later lookup finds it warm."""
+        if self.is_stale():
+            self.refresh_async()
+
+    def lookup(self, droplet_ip: str, wait_seconds: float = 0) -> Optional[dict]:
+        """
+        Return the cached info for an IP.
+
+        A stale index or unknown IP schedules a background refresh; the caller
+        waits for it at most wait_seconds (default: not at all).
+        """
+        with self._lock:
+            self._load()
+            info = self._droplets.get(droplet_ip)
+            stale = time.time() - self._refreshed_at > self.ttl_seconds
+        if info is not None and not stale:
+            return dict(info)
+
+        thread = self.refresh_async()
+        if thread is not None and wait_seconds > 0:
+            thread.join(wait_seconds)
+            with self._lock:
+                info = self._droplets.get(droplet_ip, info)
+        return dict(info) if info is not None else None
+
+
+droplet_inventory = DropletInventory(
+    Path(os.getenv("DO_INVENTORY_PATH", str(Path(__file__).parent / ".droplet_inventory.json"))),
+    float(os.getenv("DO_INVENTORY_TTL_SECONDS", "900")),
+)
+
+
+def get_droplet_info(droplet_ip: str, wait_seconds: float = 0) -> dict:
+    """
+    Get droplet information from the cached DigitalOcean inventory.
+    
+    Never blocks on the account listing unless wait_seconds is given; a stale or
+    missing entry triggers a background refresh for the next caller.
     
     Args:
         droplet_ip: IP address of the droplet
+        wait_seconds: How long to wait for a refresh when the entry is missing or stale
     
     Returns:
         Dict containing droplet information or None if not found
     """
-    try:
-        do_token = os.getenv("DIGITALOCEAN_API_PAT")
-        if not do_token:
-            logger.warning("DigitalOcean API token not found, skipping droplet info")
-            return None
-        
-        manager = digitalocean.Manager(token=do_token)
-        droplets = manager.get_all_droplets()
-        
-        for droplet in droplets:
-            if droplet.ip_address == droplet_ip:
-                return {
-                    "id": droplet.id,
-                    "name": droplet.name,
-                    "size": droplet.size_slug,
-                    "region": droplet.region["slug"],
-                    "status": droplet.status,
-                    "created_at": droplet.created_at
-                }
-        
-        logger.warning(f"Droplet with IP {droplet_ip} not found in DigitalOcean account")
-        return None
-        
-    except Exception as e:
-        logger.error(f"Error getting droplet info for {droplet_ip}: {str(e)}")
-        return None
+    info = droplet_inventory.lookup(split_ssh_host(droplet_ip)[0], wait_seconds=wait_seconds)
+    if info is None:
+        logger.warning(f"Droplet with IP {droplet_ip} not in the droplet inventory (yet)")
+    return info
 
 def get_available_droplet_ips(env_var_name: str = "AVAILABLE_IPS") -> List[str]:
     """
@@ -105,7 +645,109 @@ def get_available_droplet_ips(env_var_name: str = "AVAILABLE_IPS") -> List[str]:
     logger.info(f"Found {len(droplet_ips)} droplet IPs: {droplet_ips}")
     return droplet_ips
 
-def upload_files_to_droplet(local_dir: str, droplet_ip: str, remote_dir: str = "/root/task") -> bool:
+def probe_droplet_health(droplet_ip: str, timeout: float = DROPLET_PROBE_TIMEOUT_SECONDS) -> Optional[Dict[str, float]]:
+    """
+    Collect load signals from a droplet over its pooled SSH connection.
+
+    Args:
+        droplet_ip: IP address of the droplet
+        timeout: SSH connect and command timeout in seconds
+
+    Returns:
+        Dict with containers, cpus, load1, mem_total_kb, mem_available_kb,
+        disk_total_kb and disk_available_kb, or None if the droplet did not answer
+    """
+    try:
+        # The probe connection stays pooled, so the deployment that follows reuses it
+        ssh_connections.get_client(droplet_ip, timeout=timeout)
+        exit_status, stdout_data, stderr_data = ssh_connections.run(droplet_ip, _HEALTH_PROBE_COMMAND, timeout=timeout)
+    except Exception as e:
+        logger.error(f"Error probing {droplet_ip}: {str(e)}")
+        ssh_connections.discard_if_idle(droplet_ip)
+        return None
+
+    health = {}
+    for line in stdout_data.splitlines():
+        key, _, value = line.partition("=")
+        try:
+            health[key.strip()] = float(value.strip())
+        except ValueError:
+            continue
+    if "containers" not in health:
+        logger.error(f"Failed to probe {droplet_ip} (exit {exit_status}): {stderr_data.strip()}")
+        return None
+    return health
+
+
+def score_droplet_health(health: Dict[str, float]) -> Optional[float]:
+    """
+    Score a probed droplet between 0 (saturated) and 1 (completely free).
+
+    Droplets with running containers are still hosting an assessment and are not
+    eligible (None). Missing signals count as neutral headroom.
+    """
+    if health.get("containers", 0) > 0:
+        return None
+
+    def _free_fraction(available_key: str, total_key: str) -> float:
+        total = health.get(total_key)
+        if not total or available_key not in health:
+            return 0.5
+        return max(0.0, min(1.0, health[available_key] / total))
+
+    cpus = health.get("cpus") or 1
+    cpu_free = max(0.0, 1.0 - health["load1"] / cpus) if "load1" in health else 0.5
+    return (DROPLET_SCORE_WEIGHTS["cpu"] * cpu_free
+            + DROPLET_SCORE_WEIGHTS["memory"] * _free_fraction("mem_available_kb", "mem_total_kb")
+            + DROPLET_SCORE_WEIGHTS["disk"] * _free_fraction("disk_available_kb", "disk_total_kb"))
+
+
+def build_upload_archive(local_dir: str) -> Tuple[bytes, int]:
+    """
+    Pack a local directory into an in-memory tar.gz, preserving file modes.
+
+    Shell scripts are marked executable, matching the per-file SFTP upload.
+
+    Returns:
+        (archive bytes, number of files)
+    """
+    local_path = Path(local_dir)
+    buffer = io.BytesIO()
+    file_count = 0
+    with tarfile.open(fileobj=buffer, mode="w:gz", compresslevel=6) as archive:
+        for file_path in sorted(local_path.rglob("*")):
+            if not file_path.is_file():
+                continue
+            info = archive.gettarinfo(str(file_path), arcname=file_path.relative_to(local_path).as_posix())
+            info.uid = info.gid = 0
+            info.uname = info.gname = "root"
+            if file_path.suffix == ".sh":
+                info.mode |= 0o755
+            with open(file_path, "rb") as f:
+                archive.addfile(info, f)
+            file_count += 1
+    return buffer.getvalue(), file_count
+
+def _upload_archive(local_dir: str, droplet_ip: str, remote_dir: str) -> None:
+    """Stream the directory as one tar.gz over a single exec channel and verify its SHA-256 remotely."""
+    archive, file_count = build_upload_archive(local_dir)
+    expected_sha = hashlib.sha256(archive).hexdigest()
+    quoted_dir = shlex.quote(remote_dir)
+    # tee feeds the same bytes to sha256sum (via fd 3) and to tar; tar output goes to stderr
+    command = (
+        f"bash -o pipefail -c "
+        + shlex.quote(f"mkdir -p {quoted_dir} && {{ tee /dev/fd/3 | tar -xzpf - -C {quoted_dir} >&2; }} 3>&1 | sha256sum")
+    )
+    logger.info(f"Uploading {file_count} files to {droplet_ip}:{remote_dir} as a {len(archive)} byte archive")
+    exit_status, stdout_data, stderr_data = ssh_connections.run_with_input(droplet_ip, command, archive)
+    if exit_status != 0:
+        raise RuntimeError(f"Remote tar extraction failed (exit {exit_status}): {stderr_data.strip()}")
+    remote_sha = stdout_data.split()[0] if stdout_data.split() else ""
+    if remote_sha != expected_sha:
+        raise RuntimeError(f"Archive checksum mismatch on {droplet_ip}: expected {expected_sha}, got {remote_sha or 'nothing'}")
+    logger.info(f"Archive checksum verified on {droplet_ip} ({expected_sha[:12]})")
+
+def upload_files_to_droplet(local_dir: str, droplet_ip: str, remote_dir: str = "/root/task", mode: str = None) -> bool:
     """
     Upload files from local directory to droplet via SSH.
     
@@ -113,53 +755,52 @@ def upload_files_to_droplet(local_dir: str, droplet_ip: str, remote_dir: str = "
         local_dir: Local directory containing files to upload
         droplet_ip: IP address of the droplet
         remote_dir: Remote directory to upload files to
+        mode: "archive" streams one compressed tar into `tar -x` on the droplet and
+              verifies its checksum; "sftp" puts files one by one. Defaults to
+              DROPLET_UPLOAD_MODE (archive). A failed archive upload falls back to sftp.
     
     Returns:
         True if successful, False otherwise
     """
-    ssh_key = get_ssh_key()
-    if not ssh_key:
-        logger.error("Failed to load SSH key for droplet (set DROPLET_SSH_PRIVATE_KEY in env)")
-        return False
-
+    mode = (mode or DROPLET_UPLOAD_MODE).lower()
+    if mode == "archive":
+        try:
+            _upload_archive(local_dir, droplet_ip, remote_dir)
+            logger.info(f"Successfully uploaded files to {droplet_ip}:{remote_dir}")
+            return True
+        except Exception as e:
+            logger.warning(f"Archive upload to {droplet_ip} failed ({str(e)}); falling back to SFTP")
+    
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            droplet_ip,
-            username="root",
-            pkey=ssh_key,
-            timeout=30
-        )
-
-        # Create remote directory
-        ssh.exec_command(f"mkdir -p {remote_dir}")
+        local_path = Path(local_dir)
+        files = [file_path for file_path in local_path.rglob("*") if file_path.is_file()]
         
-        # Create SFTP client
-        sftp = ssh.open_sftp()
+        # Create every remote directory in one command, waiting for it before uploading
+        remote_dirs = {remote_dir}
+        for file_path in files:
+            remote_dirs.add((PurePosixPath(remote_dir) / file_path.relative_to(local_path).parent.as_posix()).as_posix())
+        exit_status, _, stderr_data = ssh_connections.run(
+            droplet_ip, "mkdir -p " + " ".join(shlex.quote(d) for d in sorted(remote_dirs))
+        )
+        if exit_status != 0:
+            raise RuntimeError(f"mkdir failed on {droplet_ip}: {stderr_data.strip()}")
         
-        # Upload all files recursively
-        local_path = Path(local_dir)
-        for file_path in local_path.rglob("*"):
-            if file_path.is_file():
+        # Upload all files over the pooled SFTP session
+        scripts = []
+        with ssh_connections.sftp_session(droplet_ip) as sftp:
+            for file_path in files:
                 relative_path = file_path.relative_to(local_path)
                 remote_file_path = f"{remote_dir}/{relative_path.as_posix()}"
-                
-                # Create remote directory if needed
-                remote_file_dir = "/".join(remote_file_path.split("/")[:-1])
-                ssh.exec_command(f"mkdir -p {remote_file_dir}")
-                
-                # Upload file
                 sftp.put(str(file_path), remote_file_path)
                 
                 # Make shell scripts executable
                 if file_path.suffix == ".sh":
-                    ssh.exec_command(f"chmod +x {remote_file_path}")
+                    scripts.append(remote_file_path)
                 
                 logger.info(f"Uploaded: {relative_path}")
         
-        sftp.close()
-        ssh.close()
+        if scripts:
+            ssh_connections.run(droplet_ip, "chmod +x " + " ".join(shlex.quote(p) for p in scripts))
         
         logger.info(f"Successfully uploaded files to {droplet_ip}:{remote_dir}")
         return True
@@ -168,57 +809,39 @@ def upload_files_to_droplet(local_dir: str, droplet_ip: str, remote_dir: str = "
         logger.error(f"Error uploading files to droplet {droplet_ip}: {str(e)}")
         return False
 
-def execute_script_on_droplet(droplet_ip: str, run_script: str) -> bool:
+def execute_script_on_droplet(droplet_ip: str, run_script: str, timeout: float = REMOTE_SCRIPT_TIMEOUT_SECONDS) -> bool:
     """
-    Execute a script on a droplet via SSH.
+    Execute a script on a droplet via SSH, printing its output as it runs.
     
     Args:
         droplet_ip: IP address of the droplet
         run_script: Path to the script to execute
+        timeout: Seconds before the script's remote process group is killed
     
     Returns:
         True if successful, False otherwise
     """
-    ssh_key = get_ssh_key()
-    if not ssh_key:
-        logger.error("Failed to load SSH key for droplet (set DROPLET_SSH_PRIVATE_KEY in env)")
-        return False
+    def _forward(stream: str, line: str) -> None:
+        print(line)
+        if stream == "stderr":
+            logger.info(f"Script errors: {line}")
+        else:
+            logger.info(f"Script output: {line}")
 
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            droplet_ip,
-            username="root",
-            pkey=ssh_key,
-            timeout=30
-        )
-
         # Execute the script
         logger.info(f"Executing {run_script} on droplet {droplet_ip}...")
-        stdin, stdout, stderr = ssh.exec_command(f"bash {run_script}")
-
-        # Wait for completion and get output
-        stdout_data = stdout.read().decode()
-        stderr_data = stderr.read().decode()
-        exit_status = stdout.channel.recv_exit_status()
-
-        if stdout_data:
-            print(f"Script output:\n{stdout_data}")
-            logger.info(f"Script output:\n{stdout_data}")
-        if stderr_data:
-            print(f"Script errors:\n{stderr_data}")
-            logger.info(f"Script errors:\n{stderr_data}")
+        exit_status, _, _ = ssh_connections.run_streaming(
+            droplet_ip, f"bash {shlex.quote(run_script)}", on_output=_forward, timeout=timeout
+        )
 
         if exit_status == 0:
             print(f"{run_script} executed successfully on {droplet_ip}")
             logger.info(f"{run_script} executed successfully on {droplet_ip}")
-            ssh.close()
             return True
         else:
             print(f"{run_script} failed with exit status: {exit_status}")
             logger.error(f"{run_script} failed with exit status: {exit_status}")
-            ssh.close()
             return False
 
     except Exception as e:
@@ -1,6 +1,9 @@
 import json
+from typing import Dict
 from openai import OpenAI
 from logger_config import logger
+from llm_cache import cached_responses_create, has_json_output
+from async_llm import aresponses_create
 from schemas import EVAL_RESPONSE_SCHEMA
 
 # Model configuration for evaluations
@@ -23,6 +26,9 @@ def clean_llm_json_response(response: str) -> str:
 
 MAX_EVAL_RETRIES = 2
 
+# Wall-clock budget for the task + code evaluations when they run concurrently
+EVAL_TIMEOUT_SECONDS = 600
+
 TASK_EVAL_PROMPT = """
 You are an expert technical assessment reviewer. Given the following task JSON, proficiency level, years of experience, and time constraint, answer the following:
 
@@ -75,73 +81,32 @@ CODE FILES:
 {code_files}
 """
 
-def llm_task_eval(task_json, proficiency, yoe, time_constraint, openai_client, model):
-    """
-    Evaluate task using the Responses API with gpt-5-nano for efficient evaluation.
-    Note: model parameter is ignored, using EVAL_MODEL constant for evals.
-    """
+def _eval_request(prompt: str) -> Dict:
+    """Build the Responses API request shared by the sync and async evals."""
+    return {
+        "model": EVAL_MODEL,
+        "input": [{"role": "user", "content": prompt}],
+        "reasoning": {"effort": "medium"},
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": EVAL_RESPONSE_SCHEMA["name"],
+                "schema": EVAL_RESPONSE_SCHEMA["schema"],
+                "strict": EVAL_RESPONSE_SCHEMA["strict"]
+            }
+        }
+    }
+
+def _task_eval_prompt(task_json, proficiency, yoe, time_constraint) -> str:
     task_json_str = json.dumps(task_json, indent=2)
-    prompt = TASK_EVAL_PROMPT.format(
+    return TASK_EVAL_PROMPT.format(
         task_json=task_json_str,
         proficiency=proficiency,
         yoe=yoe,
         time_constraint=time_constraint
     )
-    
-    # Build messages for Responses API
-    messages = [{"role": "user", "content": prompt}]
-    
-    try:
-        # Use configured eval model for efficient evaluations
-        response = openai_client.responses.create(
-            model=EVAL_MODEL,
-            input=messages,
-            reasoning={"effort": "medium"},
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": EVAL_RESPONSE_SCHEMA["name"],
-                    "schema": EVAL_RESPONSE_SCHEMA["schema"],
-                    "strict": EVAL_RESPONSE_SCHEMA["strict"]
-                }
-            }
-        )
-        
-        # Extract output_text from response
-        raw_response = getattr(response, "output_text", None)
-        if not raw_response:
-            logger.error("No output_text received from OpenAI Responses API for task eval")
-            return {
-                "pass": False,
-                "issues": ["No response from evaluation API"],
-                "validated_criteria": []
-            }
-        
-        logger.info(f"Raw LLM task eval response: {raw_response[:200]}...")
-        
-        return json.loads(raw_response)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse task eval JSON response: {str(e)}")
-        logger.error(f"Raw response: {raw_response}")
-        # Return a default failure response
-        return {
-            "pass": False,
-            "issues": ["Failed to parse evaluation response"],
-            "validated_criteria": []
-        }
-    except Exception as e:
-        logger.error(f"Unexpected error in task evaluation: {str(e)}")
-        return {
-            "pass": False,
-            "issues": [f"Evaluation error: {str(e)}"],
-            "validated_criteria": []
-        }
 
-def llm_code_eval(code_data, task_description, openai_client, model):
-    """
-    Evaluate code files using the Responses API with gpt-5-nano for efficient evaluation.
-    Note: model parameter is ignored, using EVAL_MODEL constant for evals.
-    """
+def _code_eval_prompt(code_data, task_description) -> str:
     # Handle both possible structures: direct files dict or nested under 'files' key
     if isinstance(code_data, dict):
         if 'files' in code_data:
@@ -152,53 +117,88 @@ def llm_code_eval(code_data, task_description, openai_client, model):
     else:
         files_content = {}
     
-    prompt = CODE_EVAL_PROMPT.format(code_files=json.dumps(files_content, indent=2), task_description=task_description)
+    return CODE_EVAL_PROMPT.format(code_files=json.dumps(files_content, indent=2), task_description=task_description)
+
+def _parse_eval_response(response, label: str) -> Dict:
+    """
+    Turn an eval response into the pass/issues dict, never raising.
+    
+    Args:
+        response: Responses API response
+        label: "task" or "code", used in log and issue messages
+    """
+    # Extract output_text from response
+    raw_response = getattr(response, "output_text", None)
+    if not raw_response:
+        logger.error(f"No output_text received from OpenAI Responses API for {label} eval")
+        return {
+            "pass": False,
+            "issues": ["No response from evaluation API"],
+            "validated_criteria": []
+        }
     
-    # Build messages for Responses API
-    messages = [{"role": "user", "content": prompt}]
+    logger.info(f"Raw LLM {label} eval response: {raw_response[:200]}...")
     
     try:
-        # Use configured eval model for efficient evaluations
-        response = openai_client.responses.create(
-            model=EVAL_MODEL,
-            input=messages,
-            reasoning={"effort": "medium"},
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": EVAL_RESPONSE_SCHEMA["name"],
-                    "schema": EVAL_RESPONSE_SCHEMA["schema"],
-                    "strict": EVAL_RESPONSE_SCHEMA["strict"]
-                }
-            }
-        )
-        
-        # Extract output_text from response
-        raw_response = getattr(response, "output_text", None)
-        if not raw_response:
-            logger.error("No output_text received from OpenAI Responses API for code eval")
-            return {
-                "pass": False,
-                "issues": ["No response from evaluation API"],
-                "validated_criteria": []
-            }
-        
-        logger.info(f"Raw LLM code eval response: {raw_response[:200]}...")
-        
         return json.loads(raw_response)
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse code eval JSON response: {str(e)}")
+        logger.error(f"Failed to parse {label} eval JSON response: {str(e)}")
         logger.error(f"Raw response: {raw_response}")
         # Return a default failure response
         return {
             "pass": False,
-            "issues": ["Failed to parse code evaluation response"],
+            "issues": ["Failed to parse evaluation response" if label == "task" else "Failed to parse code evaluation response"],
             "validated_criteria": []
         }
+
+def _eval_error(label: str, error: Exception) -> Dict:
+    logger.error(f"Unexpected error in {label} evaluation: {str(error)}")
+    return {
+        "pass": False,
+        "issues": [f"Evaluation error: {str(error)}" if label == "task" else f"Code evaluation error: {str(error)}"],
+        "validated_criteria": []
+    }
+
+def llm_task_eval(task_json, proficiency, yoe, time_constraint, openai_client, model):
+    """
+    Evaluate task using the Responses API with gpt-5-nano for efficient evaluation.
+    Note: model parameter is ignored, using EVAL_MODEL constant for evals.
+    """
+    prompt = _task_eval_prompt(task_json, proficiency, yoe, time_constraint)
+    try:
+        # Use configured eval model for efficient evaluations
+        response = cached_responses_create(openai_client, accept=has_json_output, **_eval_request(prompt))
+        return _parse_eval_response(response, "task")
     except Exception as e:
-        logger.error(f"Unexpected error in code evaluation: {str(e)}")
-        return {
-            "pass": False,
-            "issues": [f"Code evaluation error: {str(e)}"],
-            "validated_criteria": []
-        }
+        return _eval_error("task", e)
+
+def llm_code_eval(code_data, task_description, openai_client, model):
+    """
+    Evaluate code files using the Responses API with gpt-5-nano for efficient evaluation.
+    Note: model parameter is ignored, using EVAL_MODEL constant for evals.
+    """
+    prompt = _code_eval_prompt(code_data, task_description)
+    try:
+        # Use configured eval model for efficient evaluations
+        response = cached_responses_create(openai_client, accept=has_json_output, **_eval_request(prompt))
+        return _parse_eval_response(response, "code")
+    except Exception as e:
+        return _eval_error("code", e)
+
+async def allm_task_eval(task_json, proficiency, yoe, time_constraint, openai_client=None):
+    """Async variant of llm_task_eval; openai_client defaults to the shared AsyncOpenAI client."""
+    prompt = _task_eval_prompt(task_json, proficiency, yoe, time_constraint)
+    try:
+        response = await aresponses_create(openai_client, accept=has_json_output, **_eval_request(prompt))
+        return _parse_eval_response(response, "task")
+    except Exception as e:
+        return _eval_error("task", e)
+
+async def allm_code_eval(code_data, task_description, openai_client=None):
+    """Async variant of llm_code_eval; openai_client defaults to the shared AsyncOpenAI client."""
+    prompt = _code_eval_prompt(code_data, task_description)
+    try:
+        response = await aresponses_create(openai_client, accept=has_json_output, **_eval_request(prompt))
+        return _parse_eval_response(response, "code")
+    except Exception as e:
+        return _eval_error("code", e)
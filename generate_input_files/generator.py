@@ -21,13 +21,17 @@ Usage:
 import os
 import re
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
 import openai
 from dotenv import load_dotenv
-from supabase import Client, create_client
-from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
+from supabase import Client
+
+from rate_limiter import create_gateway_client, rate_limited_responses_create
+from supabase_client import get_supabase
 
 # Load environment variables
 load_dotenv()
@@ -65,73 +69,154 @@ PRICE_PER_M_OUTPUT = 2.00   # $2.00 per 1M output tokens
 
 
 def init_supabase(env: str = "dev") -> Client:
-    """Initialize Supabase client based on environment."""
-    if env == "dev":
-        url = os.getenv("SUPABASE_URL_APTITUDETESTSDEV")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTSDEV")
-    else:
-        url = os.getenv("SUPABASE_URL_APTITUDETESTS")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTS")
-
-    if not url or not key:
+    """Return the shared Supabase client for the environment (see supabase_client)."""
+    try:
+        return get_supabase(env)
+    except ValueError:
         raise click.ClickException(
             f"Missing Supabase credentials for environment: {env}. "
             f"Check your .env file for SUPABASE_URL and SUPABASE_API_KEY variables."
         )
 
-    return create_client(url, key)
-
 
 def init_openai_client() -> openai.OpenAI:
     """Initialize OpenAI client with Portkey gateway (same setup as multiagent.py)."""
     api_key = os.getenv("OPENAI_API_KEY")
-    portkey_key = os.getenv("PORTKEY_API_KEY")
 
     if not api_key:
         raise click.ClickException("Missing OPENAI_API_KEY in .env file.")
 
-    return openai.OpenAI(
-        api_key=api_key,
-        base_url=PORTKEY_GATEWAY_URL,
-        default_headers=createHeaders(
-            provider="openai",
-            api_key=portkey_key,
-        ),
-    )
+    return create_gateway_client(api_key)
+
+
+def _like_regex(pattern: str) -> re.Pattern:
+    """Python equivalent of a case-insensitive SQL LIKE pattern (% and _ wildcards, \\ escape)."""
+    parts, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        elif ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+        i += 1
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
 
 
-def fetch_competencies_from_db(supabase: Client, name: str, proficiency: str) -> list[dict]:
-    """Fetch competency rows from the database matching name and proficiency."""
-    result = (
-        supabase.table("competencies")
-        .select(COMPETENCY_FIELDS)
-        .ilike("name", name)
-        .eq("proficiency", proficiency)
-        .execute()
-    )
+def _postgrest_quote(value: str) -> str:
+    """Quote a value for a PostgREST or=(...) filter (names contain commas, dots, parentheses)."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
 
-    if not result.data:
-        available = (
-            supabase.table("competencies")
-            .select("name, proficiency")
-            .execute()
+class CompetencyCatalogue:
+    """Process-level cache of competency lookups, shared by every fetch in this process.
+
+    Rows are cached per (database, name pattern, proficiency), and the
+    name/proficiency listing used for "did you mean" suggestions is fetched
+    at most once per database. Competencies are reference data that doesn't
+    change during a run, so nothing expires. Misses (and an empty listing)
+    are not cached, so a competency added while the process runs is found on
+    the next lookup.
+    """
+
+    def __init__(self):
+        self._rows: dict[tuple[str, str, str], list[dict]] = {}
+        self._listings: dict[str, list[dict]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _database(supabase: Client) -> str:
+        return getattr(supabase, "supabase_url", None) or str(id(supabase))
+
+    def fetch(self, supabase: Client, names: list[str], proficiencies: list[str]) -> dict[tuple[str, str], list[dict]]:
+        """Rows for every (name, proficiency) pair; all uncached pairs are fetched in one query.
+
+        Names match like the single-name ilike filter did (case-insensitive,
+        % and _ wildcards). Pairs without a match map to an empty list.
+        """
+        database = self._database(supabase)
+        pairs = [(name, proficiency) for name in dict.fromkeys(names) for proficiency in dict.fromkeys(proficiencies)]
+        with self._lock:
+            found = {(n, p): self._rows.get((database, n.lower(), p)) for n, p in pairs}
+        missing = [pair for pair, rows in found.items() if rows is None]
+
+        if missing:
+            missing_names = list(dict.fromkeys(n for n, _ in missing))
+            missing_levels = list(dict.fromkeys(p for _, p in missing))
+            rows = (
+                supabase.table("competencies")
+                .select(COMPETENCY_FIELDS)
+                .or_(",".join(f"name.ilike.{_postgrest_quote(n)}" for n in missing_names))
+                .in_("proficiency", missing_levels)
+                .execute()
+            ).data or []
+            patterns = {name: _like_regex(name) for name in missing_names}
+            for name, proficiency in missing:
+                found[(name, proficiency)] = [
+                    row for row in rows
+                    if row.get("proficiency") == proficiency and patterns[name].fullmatch(row.get("name") or "")
+                ]
+            with self._lock:
+                for name, proficiency in missing:
+                    if found[(name, proficiency)]:
+                        self._rows[(database, name.lower(), proficiency)] = found[(name, proficiency)]
+
+        return {pair: list(rows) for pair, rows in found.items()}
+
+    def listing(self, supabase: Client) -> list[dict]:
+        """Every competency's name and proficiency (for suggestions), fetched once."""
+        database = self._database(supabase)
+        with self._lock:
+            cached = self._listings.get(database)
+        if cached is None:
+            cached = supabase.table("competencies").select("name, proficiency").execute().data or []
+            if cached:
+                with self._lock:
+                    self._listings[database] = cached
+        return cached
+
+
+competency_catalogue = CompetencyCatalogue()
+
+
+def _competency_not_found(supabase: Client, name: str, proficiency: str) -> click.ClickException:
+    available = competency_catalogue.listing(supabase)
+    if available:
+        unique_names = sorted(set(
+            f"  - {row['name']} ({row['proficiency']})"
+            for row in available
+        ))
+        names_list = "\n".join(unique_names)
+        return click.ClickException(
+            f"No competency found for name='{name}', proficiency='{proficiency}'.\n\n"
+            f"Available competencies:\n{names_list}"
         )
-        if available.data:
-            unique_names = sorted(set(
-                f"  - {row['name']} ({row['proficiency']})"
-                for row in available.data
-            ))
-            names_list = "\n".join(unique_names)
-            raise click.ClickException(
-                f"No competency found for name='{name}', proficiency='{proficiency}'.\n\n"
-            )
-        else:
-            raise click.ClickException(
-                f"No competency found for name='{name}', proficiency='{proficiency}'. "
-                "The competencies table appears to be empty."
-            )
+    return click.ClickException(
+        f"No competency found for name='{name}', proficiency='{proficiency}'. "
+        "The competencies table appears to be empty."
+    )
+
 
-    return result.data
+def fetch_competencies_batch(supabase: Client, names: list[str], proficiencies: list[str]) -> dict[tuple[str, str], list[dict]]:
+    """Fetch competency rows for every (name, proficiency) pair in one query.
+
+    Returns rows grouped by (name, proficiency). Raises ClickException (with
+    suggestions) for the first pair, in argument order, that has no match.
+    """
+    grouped = competency_catalogue.fetch(supabase, names, proficiencies)
+    for (name, proficiency), rows in grouped.items():
+        if not rows:
+            raise _competency_not_found(supabase, name, proficiency)
+    return grouped
+
+
+def fetch_competencies_from_db(supabase: Client, name: str, proficiency: str) -> list[dict]:
+    """Fetch competency rows from the database matching name and proficiency."""
+    return fetch_competencies_batch(supabase, [name], [proficiency])[(name, proficiency)]
 
 
 def extract_usage(response) -> dict:
@@ -167,7 +252,8 @@ def generate_role_context(client: openai.OpenAI, scope: str, name: str, proficie
         f"Competency scope:\n\n{scope}"
     )
 
-    response = client.responses.create(
+    response = rate_limited_responses_create(
+        client,
         model=MODEL,
         input=[{"role": "user", "content": prompt}],
         reasoning={"effort": "low"},
@@ -193,7 +279,8 @@ def generate_questions_prompt(client: openai.OpenAI, scope: str, name: str, prof
         f"Competency scope:\n\n{scope}"
     )
 
-    response = client.responses.create(
+    response = rate_limited_responses_create(
+        client,
         model=MODEL,
         input=[{"role": "user", "content": prompt}],
         reasoning={"effort": "low"},
@@ -202,6 +289,58 @@ def generate_questions_prompt(client: openai.OpenAI, scope: str, name: str, prof
     return response.output_text.strip(), extract_usage(response)
 
 
+BACKGROUND_FIELDS = ("role_context", "questions_prompt")
+
+
+def fallback_background_fields(name: str, proficiency: str, yoe: str) -> dict:
+    """Template role_context / questions_prompt used when the LLM call for a field fails."""
+    return {
+        "role_context": (
+            f"A software engineer with {yoe} years of experience in {name} "
+            f"is expected to work at the {proficiency} proficiency level."
+        ),
+        "questions_prompt": (
+            f"Please ensure the questions cover the key areas of {name} "
+            f"at the {proficiency} level as described in the competency scope."
+        ),
+    }
+
+
+def generate_background_fields(client: openai.OpenAI, scope: str, name: str, proficiency: str, yoe: str) -> tuple[dict, dict, dict]:
+    """Generate role_context and questions_prompt with both LLM calls in flight at once.
+
+    The two calls take the same inputs and don't depend on each other, so a
+    background file costs one LLM round trip instead of two.
+
+    Returns (fields, usage, errors): fields maps each of BACKGROUND_FIELDS to its
+    text (the fallback template if its call failed), usage is the combined token
+    usage of the successful calls, and errors maps each failed field to its exception.
+    """
+    generators = {
+        "role_context": generate_role_context,
+        "questions_prompt": generate_questions_prompt,
+    }
+    fallbacks = fallback_background_fields(name, proficiency, yoe)
+    fields, errors = {}, {}
+    usage = {"input_tokens": 0, "output_tokens": 0}
+
+    with ThreadPoolExecutor(max_workers=len(generators), thread_name_prefix="background") as executor:
+        futures = {
+            field: executor.submit(generate, client, scope, name, proficiency, yoe)
+            for field, generate in generators.items()
+        }
+        for field in BACKGROUND_FIELDS:
+            try:
+                fields[field], field_usage = futures[field].result()
+                usage["input_tokens"] += field_usage["input_tokens"]
+                usage["output_tokens"] += field_usage["output_tokens"]
+            except Exception as e:
+                fields[field] = fallbacks[field]
+                errors[field] = e
+
+    return fields, usage, errors
+
+
 def sanitize_folder_name(competency_name: str) -> str:
     """Convert a competency name into a folder-friendly slug prefixed with 'input_'.
 
@@ -314,10 +453,11 @@ def generate_input_files(name, proficiency, folder_name, force, dry_run, env):
     supabase = init_supabase(env)
     click.echo("Connected to Supabase.")
 
-    # 2. Fetch competencies from DB (one query per name, combined into one array)
+    # 2. Fetch competencies from DB (one query for all names, combined into one array)
+    rows_by_name = fetch_competencies_batch(supabase, names, [proficiency_upper])
     competency_data = []
     for comp_name in names:
-        rows = fetch_competencies_from_db(supabase, comp_name, proficiency_upper)
+        rows = rows_by_name[(comp_name, proficiency_upper)]
         click.echo(f"  Found {len(rows)} row(s) for '{comp_name}'.")
         for c in rows:
             competency_data.append({
@@ -345,31 +485,19 @@ def generate_input_files(name, proficiency, folder_name, force, dry_run, env):
     openai_client = init_openai_client()
     total_usage = {"input_tokens": 0, "output_tokens": 0}
 
-    try:
-        role_context, usage = generate_role_context(openai_client, combined_scope, combined_name, proficiency_upper, yoe)
-        total_usage["input_tokens"] += usage["input_tokens"]
-        total_usage["output_tokens"] += usage["output_tokens"]
-        click.echo("  role_context generated.")
-    except Exception as e:
-        click.echo(f"  WARNING: Failed to generate role_context: {e}")
-        click.echo("  Using fallback role_context.")
-        role_context = (
-            f"A software engineer with {yoe} years of experience in {combined_name} "
-            f"is expected to work at the {proficiency_upper} proficiency level."
-        )
-
-    try:
-        questions_prompt, usage = generate_questions_prompt(openai_client, combined_scope, combined_name, proficiency_upper, yoe)
-        total_usage["input_tokens"] += usage["input_tokens"]
-        total_usage["output_tokens"] += usage["output_tokens"]
-        click.echo("  questions_prompt generated.")
-    except Exception as e:
-        click.echo(f"  WARNING: Failed to generate questions_prompt: {e}")
-        click.echo("  Using fallback questions_prompt.")
-        questions_prompt = (
-            f"Please ensure the questions cover the key areas of {combined_name} "
-            f"at the {proficiency_upper} level as described in the competency scope."
-        )
+    fields, usage, errors = generate_background_fields(
+        openai_client, combined_scope, combined_name, proficiency_upper, yoe
+    )
+    total_usage["input_tokens"] += usage["input_tokens"]
+    total_usage["output_tokens"] += usage["output_tokens"]
+    for field in BACKGROUND_FIELDS:
+        if field in errors:
+            click.echo(f"  WARNING: Failed to generate {field}: {errors[field]}")
+            click.echo(f"  Using fallback {field}.")
+        else:
+            click.echo(f"  {field} generated.")
+    role_context = fields["role_context"]
+    questions_prompt = fields["questions_prompt"]
 
     # Display LLM cost summary
     total_cost = calculate_cost(total_usage)
@@ -31,7 +31,8 @@ import os
 import sys
 
 from dotenv import load_dotenv
-from supabase import Client, create_client
+from supabase import Client
+from supabase_client import get_supabase
 
 from logger_config import logger
 from utils import create_gist_from_template
@@ -46,18 +47,8 @@ GITHUB_GIST_TOKEN = os.getenv("GITHUB_GIST_TOKEN")
 # ---------------------------------------------------------------------------
 
 def init_supabase(env: str = "dev") -> Client:
-    """Initialize Supabase client for the given environment."""
-    if env == "dev":
-        url = os.getenv("SUPABASE_URL_APTITUDETESTSDEV")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTSDEV")
-    else:
-        url = os.getenv("SUPABASE_URL_APTITUDETESTS")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTS")
-
-    if not url or not key:
-        raise ValueError(f"Missing Supabase credentials for environment: {env}")
-
-    return create_client(url, key)
+    """Return the shared Supabase client for the environment (see supabase_client)."""
+    return get_supabase(env)
 
 
 def _task_id_column(supabase: Client) -> str:
@@ -1,7 +1,13 @@
 import re
 import os
+import json
+import base64
 import random
 import string
+import tarfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
+import requests
 from dotenv import load_dotenv
 import logging
 from github import Github, InputGitTreeElement
@@ -14,6 +20,17 @@ load_dotenv()
 REPO_OWNER = os.getenv("REPO_OWNER")
 GITHUB_UTKRUSHTAPPS_TOKEN = os.getenv("GITHUB_UTKRUSHTAPPS_TOKEN")
 
+# Files up to this size are sent inline in the create-tree request instead of as separate blobs
+INLINE_BLOB_MAX_BYTES = 64 * 1024
+# Cap on inlined bytes per tree request to keep the request body reasonable
+INLINE_TREE_MAX_TOTAL_BYTES = 2 * 1024 * 1024
+# Concurrent create-blob requests for files too large to inline
+BLOB_UPLOAD_WORKERS = 8
+# Concurrent get-blob requests when downloading via the recursive tree
+BLOB_DOWNLOAD_WORKERS = 8
+# Seconds to wait for the tarball connection / between streamed chunks
+TARBALL_TIMEOUT_SECONDS = 60
+
 def slugify(text: str) -> str:
     """Convert text to URL-friendly slug."""
     return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
@@ -90,6 +107,16 @@ def create_github_repo(base_name: str, is_public: bool = True) -> str:
         logger.error(f"Error creating repository: {str(e)}")
         raise
 
+def delete_github_repo(repo_name: str) -> None:
+    """Delete a repository of the organization (e.g. one left behind by a failed task run)."""
+    try:
+        github = Github(GITHUB_UTKRUSHTAPPS_TOKEN)
+        github.get_repo(f"{REPO_OWNER}/{repo_name}").delete()
+        logger.info(f"Deleted repository: {repo_name}")
+    except Exception as e:
+        logger.error(f"Error deleting repository {repo_name}: {str(e)}")
+        raise
+
 def create_repo_from_template(template_repo_name: str, new_repo_name: str, is_private: bool = True, owner: str = None) -> str:
     """Create a new repository from a template repository."""
     try:
@@ -150,6 +177,9 @@ def upload_files_batch(repo_obj, files_dict: dict, commit_message: str = "Initia
     """
     Upload multiple files to a GitHub repository in a single commit.
     
+    Small text files are inlined into the tree; larger ones have their blobs
+    created in parallel. Either way the result is one tree and one commit.
+    
     Args:
         repo_obj: PyGithub repository object
         files_dict: Dictionary with file paths as keys and content as values
@@ -167,31 +197,60 @@ def upload_files_batch(repo_obj, files_dict: dict, commit_message: str = "Initia
         base_commit = repo_obj.get_git_commit(ref.object.sha)
         base_tree = base_commit.tree
         
-        # Create a list of InputGitTreeElement objects for all files
-        element_list = []
+        # Normalise paths and content first
+        prepared_files = []
         for file_path, content in files_dict.items():
             # Strip leading slash from file path
             clean_file_path = file_path.lstrip('/')
             
             # Convert content to string if it's a dict
             if isinstance(content, dict):
-                import json
                 content_str = json.dumps(content, indent=2, ensure_ascii=False)
             else:
                 content_str = str(content)
-            
-            # Create blob for the file content
-            blob = repo_obj.create_git_blob(content_str, "utf-8")
-            
-            # Add to element list using InputGitTreeElement
-            element = InputGitTreeElement(
-                path=clean_file_path,
-                mode="100644",  # File mode (normal file)
-                type="blob",
-                sha=blob.sha
-            )
+            prepared_files.append((clean_file_path, content_str))
+        
+        # Small files are inlined into the tree request (GitHub creates their blobs
+        # server-side); the rest get blobs created concurrently before the tree
+        inline_budget = INLINE_TREE_MAX_TOTAL_BYTES
+        inline_paths = set()
+        for clean_file_path, content_str in prepared_files:
+            size = len(content_str.encode("utf-8"))
+            if size <= INLINE_BLOB_MAX_BYTES and size <= inline_budget:
+                inline_paths.add(clean_file_path)
+                inline_budget -= size
+        
+        blob_files = [(path, content_str) for path, content_str in prepared_files if path not in inline_paths]
+        blob_shas = {}
+        if blob_files:
+            with ThreadPoolExecutor(max_workers=min(BLOB_UPLOAD_WORKERS, len(blob_files)), thread_name_prefix="blob") as executor:
+                futures = {
+                    executor.submit(repo_obj.create_git_blob, content_str, "utf-8"): path
+                    for path, content_str in blob_files
+                }
+                for future in as_completed(futures):
+                    blob_shas[futures[future]] = future.result().sha
+        
+        # Create a list of InputGitTreeElement objects for all files (in input order)
+        element_list = []
+        for clean_file_path, content_str in prepared_files:
+            if clean_file_path in inline_paths:
+                element = InputGitTreeElement(
+                    path=clean_file_path,
+                    mode="100644",  # File mode (normal file)
+                    type="blob",
+                    content=content_str
+                )
+            else:
+                element = InputGitTreeElement(
+                    path=clean_file_path,
+                    mode="100644",  # File mode (normal file)
+                    type="blob",
+                    sha=blob_shas[clean_file_path]
+                )
             element_list.append(element)
             logger.info(f"Prepared file: {clean_file_path}")
+        logger.info(f"Inlined {len(inline_paths)} files into the tree, created {len(blob_files)} blobs")
         
         # Create a new tree with all files
         new_tree = repo_obj.create_git_tree(element_list, base_tree)
@@ -213,4 +272,83 @@ def upload_files_batch(repo_obj, files_dict: dict, commit_message: str = "Initia
         logger.error(f"Error uploading files in batch: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return False
\ No newline at end of file
+        return False
+
+def _safe_relative_path(path: str) -> PurePosixPath:
+    """Reject absolute paths and '..' components coming from a remote archive."""
+    relative = PurePosixPath(path)
+    if relative.is_absolute() or ".." in relative.parts:
+        raise ValueError(f"Unsafe path in repository archive: {path}")
+    return relative
+
+def download_repo_tarball(repo_obj, local_path: Path, ref: str = None) -> int:
+    """
+    Download a repository in one request by streaming its tarball to disk.
+    
+    Args:
+        repo_obj: PyGithub repository object
+        local_path: Directory to extract the files into
+        ref: Branch/tag/sha; defaults to the repository's default branch
+        
+    Returns:
+        Number of files written
+    """
+    # The archive link is a short-lived codeload URL that already carries auth for private repos
+    archive_url = repo_obj.get_archive_link("tarball", ref) if ref else repo_obj.get_archive_link("tarball")
+    local_path = Path(local_path)
+    file_count = 0
+    with requests.get(archive_url, stream=True, timeout=TARBALL_TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+            for member in archive:
+                # Entries are prefixed with a single "<owner>-<repo>-<sha>/" directory
+                parts = PurePosixPath(member.name).parts[1:]
+                if not parts or not member.isfile():
+                    continue
+                relative = _safe_relative_path("/".join(parts))
+                file_path = local_path.joinpath(*relative.parts)
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                with archive.extractfile(member) as source, open(file_path, "wb") as target:
+                    target.write(source.read())
+                if member.mode & 0o111:
+                    file_path.chmod(0o755)
+                file_count += 1
+                logger.info(f"Downloaded: {relative}")
+    return file_count
+
+def download_repo_tree(repo_obj, local_path: Path, ref: str = None) -> int:
+    """
+    Download a repository with one recursive tree request plus concurrent blob fetches.
+    
+    Args:
+        repo_obj: PyGithub repository object
+        local_path: Directory to write the files into
+        ref: Branch/tag/sha; defaults to the repository's default branch
+        
+    Returns:
+        Number of files written
+    """
+    tree = repo_obj.get_git_tree(ref or repo_obj.default_branch, recursive=True)
+    if getattr(tree, "raw_data", {}).get("truncated"):
+        raise RuntimeError("Recursive tree response was truncated")
+    blobs = [element for element in tree.tree if element.type == "blob"]
+    local_path = Path(local_path)
+    
+    def _fetch(element) -> str:
+        relative = _safe_relative_path(element.path)
+        blob = repo_obj.get_git_blob(element.sha)
+        data = base64.b64decode(blob.content) if blob.encoding == "base64" else blob.content.encode("utf-8")
+        file_path = local_path.joinpath(*relative.parts)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(data)
+        if element.mode == "100755":
+            file_path.chmod(0o755)
+        return element.path
+    
+    if blobs:
+        with ThreadPoolExecutor(max_workers=min(BLOB_DOWNLOAD_WORKERS, len(blobs)), thread_name_prefix="blob") as executor:
+            for future in as_completed([executor.submit(_fetch, element) for element in blobs]):
+                logger.info(f"Downloaded: {future.result()}")
+    return len(blobs)
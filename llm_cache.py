@@ -0,0 +1,271 @@
+"""
+Content-addressed on-disk cache for OpenAI Responses API calls.
+
+The cache is opt-in per task run: calls are only cached inside a
+cache_run(run_id) block. create_task opens one with an ID it checkpoints in
+its local task directory, so a run resumed with --resume replays the LLM calls
+the failed attempt already paid for, while a fresh run on the same inputs gets
+a new ID and always generates a new task. Outside a run nothing is cached.
+
+Entries are keyed by a SHA-256 hash of the run ID and the full request (model,
+input messages, reasoning settings and the text/schema format). Callers pass
+an accept check (e.g. "the output parses as JSON") so a response they would
+reject is never stored, and a rejected entry is dropped and re-requested
+instead of being replayed on every retry of the run.
+
+Configuration (environment variables):
+    LLM_CACHE_DIR        Cache directory (default: .llm_cache next to this file)
+    LLM_CACHE_MAX_MB     Size bound; oldest entries are evicted first (default: 512)
+    LLM_CACHE_TTL_HOURS  Entries older than this are ignored and evicted (default: 168)
+    LLM_CACHE_BYPASS     Set to 1/true to skip the cache entirely
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from logger_config import logger
+from rate_limiter import rate_limited_responses_create, arate_limited_responses_create
+
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", str(Path(__file__).parent / ".llm_cache")))
+CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024)
+CACHE_TTL_SECONDS = int(float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600)
+
+# Eviction scans the whole directory, so it runs at most this often per process
+CACHE_EVICT_INTERVAL_SECONDS = 600
+
+_bypass = os.getenv("LLM_CACHE_BYPASS", "").strip().lower() in ("1", "true", "yes")
+_evict_lock = threading.Lock()
+_last_evict = 0.0
+# ID of the task run whose calls may be cached; None outside cache_run()
+_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_cache_run_id", default=None)
+
+
+def set_cache_bypass(bypass: bool) -> None:
+    """Enable or disable the cache for every call in this process."""
+    global _bypass
+    _bypass = bypass
+    logger.info(f"LLM response cache {'bypassed' if bypass else 'enabled'}")
+
+
+@contextmanager
+def cache_run(run_id: str) -> Iterator[None]:
+    """
+    Cache LLM calls made in this block (and in stages/threads started with its
+    context) under run_id. Reusing the same run_id replays them.
+    """
+    token = _run_id.set(run_id)
+    try:
+        yield
+    finally:
+        _run_id.reset(token)
+
+
+def cache_key(request: Dict, run_id: str = "") -> str:
+    """Return the content hash identifying a Responses API request within a run."""
+    canonical = json.dumps({"run_id": run_id, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def _read_entry(key: str) -> Optional[Dict]:
+    """Load a cache entry, returning None when missing, unreadable or expired."""
+    path = _entry_path(key)
+    try:
+        # Entries are never rewritten, so mtime is the write time; eviction uses it too
+        if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable LLM cache entry {path}: {str(e)}")
+        return None
+
+
+def _write_entry(key: str, entry: Dict) -> None:
+    """Atomically write a cache entry and enforce the size bound."""
+    path = _entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    _maybe_evict()
+
+
+def _maybe_evict() -> None:
+    """Run evict_cache if it hasn't run in the last CACHE_EVICT_INTERVAL_SECONDS."""
+    global _last_evict
+    with _evict_lock:
+        now = time.monotonic()
+        if _last_evict and now - _last_evict < CACHE_EVICT_INTERVAL_SECONDS:
+            return
+        _last_evict = now
+    evict_cache()
+
+
+def evict_cache() -> int:
+    """
+    Remove expired entries, then the oldest entries until the cache fits
+    within CACHE_MAX_BYTES. Called from writes at most once per
+    CACHE_EVICT_INTERVAL_SECONDS.
+
+    Returns:
+        Number of entries removed
+    """
+    if not CACHE_DIR.exists():
+        return 0
+
+    with _evict_lock:
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in CACHE_DIR.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        # Oldest first; expired entries are dropped regardless of size
+        for mtime, size, path in sorted(entries):
+            expired = now - mtime > CACHE_TTL_SECONDS
+            if not expired and total_bytes <= CACHE_MAX_BYTES:
+                continue
+            try:
+                path.unlink()
+                total_bytes -= size
+                removed += 1
+            except OSError:
+                continue
+
+    if removed:
+        logger.info(f"Evicted {removed} LLM cache entries")
+    return removed
+
+
+def has_json_output(response) -> bool:
+    """Accept check for calls whose output_text must be a JSON document."""
+    try:
+        json.loads(getattr(response, "output_text", None) or "")
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def _drop_entry(key: str) -> None:
+    try:
+        _entry_path(key).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove LLM cache entry {key[:12]}: {str(e)}")
+
+
+def _cached_hit(key: str, request: Dict, accept: Optional[Callable[[Any], bool]]):
+    """Return the cached response for key, or None on a miss or a rejected entry."""
+    entry = _read_entry(key)
+    if entry is None:
+        return None
+    response = _cached_response(entry)
+    if accept is not None and not accept(response):
+        logger.warning(f"Dropping rejected LLM cache entry for {request.get('model')} ({key[:12]})")
+        _drop_entry(key)
+        return None
+    logger.info(f"LLM cache hit for {request.get('model')} ({key[:12]})")
+    return response
+
+
+def _cached_response(entry: Dict):
+    """Build the response-like object returned on a cache hit."""
+    return SimpleNamespace(
+        output_text=entry["output_text"],
+        usage=SimpleNamespace(input_tokens=0, output_tokens=0),
+        cached=True,
+    )
+
+
+def _store_response(key: str, request: Dict, response) -> None:
+    """Cache the output_text of a fresh API response (best effort)."""
+    output_text = getattr(response, "output_text", None)
+    if not output_text:
+        return
+    usage = getattr(response, "usage", None)
+    try:
+        _write_entry(key, {
+            "created_at": time.time(),
+            "model": request.get("model"),
+            "output_text": output_text,
+            "usage": {
+                "input_tokens": getattr(usage, "input_tokens", 0) if usage else 0,
+                "output_tokens": getattr(usage, "output_tokens", 0) if usage else 0,
+            },
+        })
+    except OSError as e:
+        logger.warning(f"Could not write LLM cache entry {key[:12]}: {str(e)}")
+
+
+def cached_responses_create(client, bypass: bool = False, accept: Optional[Callable[[Any], bool]] = None, **request):
+    """
+    Drop-in replacement for client.responses.create(**request) backed by the disk cache.
+
+    Only cached inside cache_run(). On a hit, returns an object exposing
+    output_text plus zero token usage (nothing was spent) and cached=True. On a
+    miss, calls the API, stores the output_text and returns the real response.
+
+    Args:
+        client: OpenAI client
+        bypass: Skip the cache for this call only
+        accept: Returns False for a response the caller will reject; such a
+            response is returned but not stored, and a cached one is dropped
+            and requested again
+        **request: Keyword arguments for responses.create
+    """
+    run_id = _run_id.get()
+    if bypass or _bypass or run_id is None:
+        return rate_limited_responses_create(client, **request)
+
+    key = cache_key(request, run_id)
+    cached = _cached_hit(key, request, accept)
+    if cached is not None:
+        return cached
+
+    response = rate_limited_responses_create(client, **request)
+    if accept is None or accept(response):
+        _store_response(key, request, response)
+    return response
+
+
+async def acached_responses_create(client, bypass: bool = False, accept: Optional[Callable[[Any], bool]] = None, **request):
+    """
+    Async counterpart of cached_responses_create for an AsyncOpenAI client.
+
+    Cache entries are shared with the sync path; the small disk reads/writes
+    happen inline since they are negligible next to the API call.
+    """
+    run_id = _run_id.get()
+    if bypass or _bypass or run_id is None:
+        return await arate_limited_responses_create(client, **request)
+
+    key = cache_key(request, run_id)
+    cached = _cached_hit(key, request, accept)
+    if cached is not None:
+        return cached
+
+    response = await arate_limited_responses_create(client, **request)
+    if accept is None or accept(response):
+        _store_response(key, request, response)
+    return response
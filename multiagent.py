@@ -1,3 +1,5 @@
+import asyncio
+import copy
 import json
 import subprocess
 import datetime
@@ -5,22 +7,33 @@ import os
 import paramiko
 import random
 import string
+import tempfile
 import shutil
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from pathlib import Path
-from github import Github
+from github import Github, GithubException
 import openai
-from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
 from dotenv import load_dotenv
 import click
-from typing import Dict, List, Optional
-from supabase import Client, create_client
+from typing import Callable, Dict, List, Optional
+from supabase import Client
+from supabase_client import get_supabase, insert_task_with_competencies, competency_task_index
 import traceback
-from evals import MAX_EVAL_RETRIES, llm_task_eval, llm_code_eval
+from evals import MAX_EVAL_RETRIES, EVAL_TIMEOUT_SECONDS, llm_task_eval, llm_code_eval, allm_task_eval, allm_code_eval
 from logger_config import logger
+from llm_cache import cache_run, cached_responses_create, has_json_output, set_cache_bypass
+from async_llm import run_async
+from rate_limiter import call_deadline, create_gateway_client
 from schemas import ANSWER_CODE_SCHEMA
-from utils import (parse_markdown_to_json,has_shared_infra_files,format_pre_requisites,format_outcomes,save_files_locally,load_relevant_scenarios,generate_task_with_code,read_json_file_robust,create_gist_from_template,)
-from droplet_utils import get_droplet_info, get_available_droplet_ips, get_ssh_key, upload_files_to_droplet, execute_script_on_droplet
-from github_utils import create_github_repo, create_github_template_repo, slugify ,upload_files_batch
+from utils import (parse_markdown_to_json,has_shared_infra_files,format_pre_requisites,format_outcomes,save_files_locally,save_stage_checkpoint,load_stage_checkpoints,remove_stage_checkpoint,load_relevant_scenarios,generate_task_with_code,read_json_file_robust,create_gist_from_template,)
+from droplet_utils import get_droplet_info, droplet_inventory, REMOTE_SCRIPT_TIMEOUT_SECONDS, get_available_droplet_ips, get_ssh_key, upload_files_to_droplet, execute_script_on_droplet, ssh_connections, probe_droplet_health, score_droplet_health, DROPLET_PROBE_TIMEOUT_SECONDS, DROPLET_GOOD_ENOUGH_SCORE
+from github_utils import create_github_repo, create_github_template_repo, delete_github_repo, slugify ,upload_files_batch, download_repo_tarball, download_repo_tree
+from droplet_pool import load_pool_config, get_pool_droplet_ips, pool_status, claim_droplet, release_droplet, reconcile_pool
+from deployment_progress import DeploymentProgressReporter
+from concurrency_utils import DEFAULT_STAGE_LIMITS, stage_slot, run_stage_graph, configure_stage_limits, reset_stage_stats, format_batch_report
 import os
 import click
 import json
@@ -37,14 +50,7 @@ load_dotenv()
 # Configure OpenAI
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-openai_client = openai.OpenAI(
-    api_key=OPENAI_API_KEY,
-    base_url=PORTKEY_GATEWAY_URL,
-    default_headers=createHeaders(
-        provider="openai",
-        api_key=os.environ.get("PORTKEY_API_KEY")
-    )
-)
+openai_client = create_gateway_client(OPENAI_API_KEY)
 model = "gpt-5.1-2025-11-13"
 
 # Static GitHub credentials
@@ -52,30 +58,17 @@ GITHUB_UTKRUSHTAPPS_TOKEN = os.getenv("GITHUB_UTKRUSHTAPPS_TOKEN")
 REPO_OWNER = os.getenv("REPO_OWNER")
 GITHUB_GIST_TOKEN = os.getenv("GITHUB_GIST_TOKEN")
 
-def run_evaluations(task_data: Dict) -> Dict:
-    """Run LLM-based evaluations on the task and code."""
+def _eval_parameters(task_data: Dict):
+    """Return (proficiency, yoe, time_constraint) used by the task evaluation."""
     # Get highest proficiency level
     prof_levels = [criteria["proficiency"].upper() for criteria in task_data.get("criterias", [])]
     yoe = task_data.get("background", {}).get("yoe", "")
     time_constraint = 25 if "ADVANCED" in prof_levels else 20 if "INTERMEDIATE" in prof_levels else 15
-    
-    # Task evaluation
-    task_eval_result = llm_task_eval(task_data, 
-                                   prof_levels[-1] if prof_levels else "BASIC",
-                                   yoe,
-                                   time_constraint,
-                                   openai_client,
-                                   model)
-                                   
-    # Code evaluation
-    code_eval_result = llm_code_eval(task_data.get("code_files", {}),
-                                   task_data.get("description", ""),
-                                   openai_client,
-                                   model)
-
-                      
+    return (prof_levels[-1] if prof_levels else "BASIC"), yoe, time_constraint
+
+def _build_eval_info(task_eval_result: Dict, code_eval_result: Dict) -> Dict:
     # Add evaluation info to task data
-    eval_info = {
+    return {
         "task_eval": {
             "pass": task_eval_result.get("pass", False),
             "validated_criteria": task_eval_result.get("validated_criteria", [])
@@ -85,22 +78,73 @@ def run_evaluations(task_data: Dict) -> Dict:
             "validated_criteria": code_eval_result.get("validated_criteria", [])
         }
     }
-    
-    return eval_info
+
+def run_evaluations(task_data: Dict, parallel: bool = True, timeout: float = EVAL_TIMEOUT_SECONDS) -> Dict:
+    """
+    Run LLM-based evaluations on the task and code.
+
+    The task and code evaluations are independent, so by default both are issued
+    concurrently on the shared async LLM client (see async_llm) and must finish
+    within `timeout` seconds. An evaluation still running at the deadline is
+    cancelled, which also cancels its request, and is recorded as failed,
+    exactly like one that errors. Pass parallel=False to run them one after the
+    other on the sync client without a timeout.
+    """
+    if parallel:
+        # One llm slot covers the pair, so --llm-concurrency still bounds eval stages
+        with stage_slot("llm"):
+            return run_async(arun_evaluations(task_data, timeout))
+
+    proficiency, yoe, time_constraint = _eval_parameters(task_data)
+    with stage_slot("llm"):
+        task_eval_result = llm_task_eval(task_data, 
+                                         proficiency,
+                                         yoe,
+                                         time_constraint,
+                                         openai_client,
+                                         model)
+    with stage_slot("llm"):
+        code_eval_result = llm_code_eval(task_data.get("code_files", {}),
+                                         task_data.get("description", ""),
+                                         openai_client,
+                                         model)
+
+    return _build_eval_info(task_eval_result, code_eval_result)
+
+async def arun_evaluations(task_data: Dict, timeout: float = EVAL_TIMEOUT_SECONDS) -> Dict:
+    """
+    Async variant of run_evaluations on the shared AsyncOpenAI client.
+
+    Both evaluations run concurrently; one still pending after `timeout` seconds
+    is cancelled and recorded as failed. Rate-limiter waits that would run past
+    the deadline fail straight away instead of sleeping until the cancel.
+    """
+    proficiency, yoe, time_constraint = _eval_parameters(task_data)
+    with call_deadline(time.monotonic() + timeout):
+        # Tasks copy the current context, so both evals see the deadline
+        evals = {
+            "Task evaluation": asyncio.ensure_future(allm_task_eval(task_data, proficiency, yoe, time_constraint)),
+            "Code evaluation": asyncio.ensure_future(allm_code_eval(task_data.get("code_files", {}), task_data.get("description", ""))),
+        }
+    await asyncio.wait(evals.values(), timeout=timeout)
+
+    results = {}
+    for eval_name, future in evals.items():
+        if future.done():
+            results[eval_name] = future.result()
+        else:
+            future.cancel()
+            logger.error(f"{eval_name} did not finish before the evaluation deadline")
+            results[eval_name] = {
+                "pass": False,
+                "issues": [f"{eval_name} timed out"],
+                "validated_criteria": []
+            }
+    return _build_eval_info(results["Task evaluation"], results["Code evaluation"])
 
 def init_supabase(env: str = "dev") -> Client:
-    """Initialize Supabase client based on environment."""
-    if env == "dev":
-        url = os.getenv("SUPABASE_URL_APTITUDETESTSDEV")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTSDEV")
-    else:
-        url = os.getenv("SUPABASE_URL_APTITUDETESTS")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTS")
-    
-    if not url or not key:
-        raise ValueError(f"Missing Supabase credentials for environment: {env}")
-    
-    return create_client(url, key)
+    """Return the shared Supabase client for the environment (see supabase_client)."""
+    return get_supabase(env)
 
 def validate_environment() -> None:
     """Validate that all required environment variables are set."""
@@ -280,73 +324,116 @@ def upload_files_to_github(repo: str, code_data: Dict) -> None:
         logger.error(f"Error uploading LLM-generated files: {str(e)}")
         raise
 
-def create_task(competency_file: Path, background_file: Path, scenarios_file: Path = None) -> Dict:
-    """Generate an intelligent assessment task."""
+def create_task(competency_file: Path, background_file: Path, scenarios_file: Path = None, resume_dir: Path = None) -> Dict:
+    """
+    Generate an intelligent assessment task.
+    
+    Every stage's result is checkpointed under <local task dir>/.checkpoints. Pass the
+    directory of a failed run as resume_dir to skip the stages that already completed
+    (the competency/background files are not re-read once generation has been checkpointed).
+    """
+    if resume_dir is not None:
+        local_task_dir = Path(resume_dir)
+        if not local_task_dir.is_dir():
+            raise Exception(f"Task creation failed: resume directory not found: {local_task_dir}")
+        checkpoints = load_stage_checkpoints(local_task_dir)
+        logger.info(f"Resuming task creation from {local_task_dir}")
+    else:
+        # Task ID doesn't exist yet, so checkpoints go to a pending directory that is
+        # renamed to the real task ID once the task is stored
+        pending_id = f"pending-{datetime.datetime.now():%Y%m%d-%H%M%S}-{''.join(random.choices(string.ascii_lowercase + string.digits, k=6))}"
+        local_task_dir = Path(__file__).parent / "infra_assets" / "tasks" / pending_id
+        local_task_dir.mkdir(parents=True, exist_ok=True)
+        checkpoints = {}
+    
+    # LLM responses are cached per run, so only a resume of this run replays them
+    if "llm_cache_run" not in checkpoints:
+        checkpoints["llm_cache_run"] = uuid.uuid4().hex
+        save_stage_checkpoint(local_task_dir, "llm_cache_run", checkpoints["llm_cache_run"])
+    
+    with cache_run(checkpoints["llm_cache_run"]):
+        return _run_create_task_stages(competency_file, background_file, scenarios_file, local_task_dir, checkpoints)
+
+def _run_create_task_stages(competency_file: Path, background_file: Path, scenarios_file: Optional[Path], local_task_dir: Path, checkpoints: Dict) -> Dict:
+    """Run the create_task stages in local_task_dir, reusing and saving stage checkpoints."""
+    def _checkpointed(stage: str, func):
+        """Wrap a stage so a checkpointed result is reused and a fresh one is saved."""
+        def run(*args):
+            if stage in checkpoints:
+                logger.info(f"Skipping stage '{stage}' (restored from checkpoint)")
+                return checkpoints[stage]
+            result = func(*args)
+            save_stage_checkpoint(local_task_dir, stage, result)
+            checkpoints[stage] = result
+            return result
+        return run
+    
     try:
-        # Set default scenarios file if not provided
-        if scenarios_file is None:
-            scenarios_file = Path(__file__).parent.parent.parent / "utilities" / "input_collection" / "task_scenarios.json"
-        
-        # Load input files 
-        logger.info(f"Reading competencies from {competency_file}")
-        competency_data = read_json_file_robust(competency_file)
+        def _generate() -> Dict:
+            # Set default scenarios file if not provided
+            nonlocal scenarios_file
+            if scenarios_file is None:
+                scenarios_file = Path(__file__).parent.parent.parent / "utilities" / "input_collection" / "task_scenarios.json"
             
-        # Convert single competency to list format
-        competencies = competency_data if isinstance(competency_data, list) else [competency_data]
-        logger.info(f"Successfully loaded {len(competencies)} competencies")
-        logger.info(f"Competency details: {competencies}")
-        
-        logger.info(f"Reading background from {background_file}")
-        background = read_json_file_robust(background_file)
+            # Load input files 
+            logger.info(f"Reading competencies from {competency_file}")
+            competency_data = read_json_file_robust(competency_file)
+                
+            # Convert single competency to list format
+            competencies = competency_data if isinstance(competency_data, list) else [competency_data]
+            logger.info(f"Successfully loaded {len(competencies)} competencies")
+            logger.info(f"Competency details: {competencies}")
             
-        # Use current timestamp for created_at
-        created_at = datetime.datetime.now(datetime.timezone.utc)
-        
-        # Load relevant scenarios
-        logger.info(f"Loading scenarios from: {scenarios_file}")
-        scenarios = load_relevant_scenarios(competencies, scenarios_file)
-        logger.info(f"Loaded {len(scenarios)} relevant scenarios")
-        logger.info(f"Scenarios: {scenarios}")
-        
-        input_data = {
-            "competencies": [
-                {
-                    "name": comp.get("name"),
-                    "scope": comp.get("scope"),
-                    "proficiency": comp.get("proficiency")
-                }
-                for comp in competencies
-            ],
-            "background": background,
-            "scenarios": scenarios
-        }
-        # Generate task with code in one step
-        task_data = generate_task_with_code(openai_client, input_data)
-        
-        # Add metadata
-        task_data["criterias"] = [{
-            "name": comp.get("name"),
-            "proficiency": comp.get("proficiency"),
-            "competency_id": comp.get("competency_id") or comp.get("id")
-        } for comp in competencies]
+            logger.info(f"Reading background from {background_file}")
+            background = read_json_file_robust(background_file)
+                
+            # Use current timestamp for created_at
+            created_at = datetime.datetime.now(datetime.timezone.utc)
+            
+            # Load relevant scenarios
+            logger.info(f"Loading scenarios from: {scenarios_file}")
+            scenarios = load_relevant_scenarios(competencies, scenarios_file)
+            logger.info(f"Loaded {len(scenarios)} relevant scenarios")
+            logger.info(f"Scenarios: {scenarios}")
+            
+            input_data = {
+                "competencies": [
+                    {
+                        "name": comp.get("name"),
+                        "scope": comp.get("scope"),
+                        "proficiency": comp.get("proficiency")
+                    }
+                    for comp in competencies
+                ],
+                "background": background,
+                "scenarios": scenarios
+            }
+            # Generate task with code in one step
+            with stage_slot("llm"):
+                task_data = generate_task_with_code(openai_client, input_data)
+            
+            # Add metadata
+            task_data["criterias"] = [{
+                "name": comp.get("name"),
+                "proficiency": comp.get("proficiency"),
+                "competency_id": comp.get("competency_id") or comp.get("id")
+            } for comp in competencies]
+            
+            # Generate code files and save them
+            if "code_files" not in task_data:
+                task_data["code_files"] = {}
+            
+            return {"task_data": task_data, "competencies": competencies, "created_at": created_at.isoformat()}
         
-        # Generate code files and save them
-        if "code_files" not in task_data:
-            task_data["code_files"] = {}
+        generation = _checkpointed("generation", _generate)()
+        task_data = copy.deepcopy(generation["task_data"])
+        competencies = generation["competencies"]
+        created_at = datetime.datetime.fromisoformat(generation["created_at"])
     
-        # Run evaluations
-        # we need check conditions that if the eval_info is true then it should be passed
-        logger.info("Running task evaluations")
-        eval_info = run_evaluations(task_data)
-        
         # Determine task type for shared infrastructure requirement
         task_type = determine_task_type(competencies, task_data)
         logger.info(f"Determined task type: {task_type}")
         
-        # Generate answer code and solutions
-        logger.info("Generating solution code and steps")
-        solutions_data = generate_answer_code_and_steps(task_data) # steps, files
-        
         # Use GitHub repo name from LLM-generated task or generate one
         repo_name_base = task_data.get("resources", {}).get("github_repo", "").split("/")[-1]
         if not repo_name_base:
@@ -356,63 +443,127 @@ def create_task(competency_file: Path, background_file: Path, scenarios_file: Pa
         if len(repo_name_base) > 50:
             repo_name_base = repo_name_base[:50].rstrip('-')
         
-        # Create GitHub template repo (public) using the template function
-        logger.info("Creating public GitHub template repository")
-        repo_name = create_github_template_repo(repo_name_base, is_private=True)
-        
-        # Update the GitHub URL with the final repository name
-        github_repo_url = f"https://github.com/{REPO_OWNER}/{repo_name}"
-        
-        # Create answer repository
-        logger.info("Creating answer repository")
         # Limit answer repo base name to 42 characters since "-answers" (8 chars) will be added
         answer_base_name = task_data.get("name", "assessment-task")
         if len(answer_base_name) > 42:
             answer_base_name = answer_base_name[:42].rstrip('-')
-        answer_repo_name = create_answer_github_repo(answer_base_name)
-
-        answer_repo_url = f"https://github.com/{REPO_OWNER}/{answer_repo_name}"
-        # Upload solution files to answer repository
-        logger.info("Uploading solution files to answer repository")
-        upload_answer_files_to_repo(answer_repo_name, solutions_data)
         
-        solutions_for_db = {
-            "steps": solutions_data.get("steps", []),
-            "answer_repo": answer_repo_url
-        }
-        
-        # Ensure resources key exists
-        if "resources" not in task_data:
-            task_data["resources"] = {}
-        task_data["resources"]["github_repo"] = github_repo_url
-        
-        # Save files locally and to GitHub
-        logger.info("Saving files locally...")
-        # Use repo name as temporary directory name since task ID doesn't exist yet
-        local_task_dir = save_files_locally(repo_name, task_data)
-        logger.info(f"Files saved locally to: {local_task_dir}")
-        
-        logger.info("Uploading files to GitHub repository...")
-        upload_files_to_github(repo_name, task_data)
-        
-        # Create Gist from template repo (same content for quick view/share)
-        gist_url = None     
-        if GITHUB_GIST_TOKEN:
+        # Evals and answer generation read an untouched snapshot because the upload
+        # stages below write resources into task_data while they are still running
+        generated_task = copy.deepcopy(task_data)
+        
+        # Stage graph: evals, answer generation and both repo creations are independent
+        # and run concurrently; uploads and the gist only wait for what they consume.
+        # If answer generation fails, the repos created alongside it are deleted again.
+        def _run_evals(done: Dict) -> Dict:
+            # we need check conditions that if the eval_info is true then it should be passed
+            logger.info("Running task evaluations")
+            return run_evaluations(generated_task)
+        
+        def _generate_answer(done: Dict) -> Dict:
+            logger.info("Generating solution code and steps")
+            with stage_slot("llm"):
+                return generate_answer_code_and_steps(generated_task) # steps, files
+        
+        def _create_template_repo(done: Dict) -> str:
+            logger.info("Creating public GitHub template repository")
+            with stage_slot("github"):
+                return create_github_template_repo(repo_name_base, is_private=True)
+        
+        def _create_answer_repo(done: Dict) -> str:
+            logger.info("Creating answer repository")
+            with stage_slot("github"):
+                return create_answer_github_repo(answer_base_name)
+        
+        def _upload_answer_files(done: Dict) -> None:
+            logger.info("Uploading solution files to answer repository")
+            with stage_slot("github"):
+                upload_answer_files_to_repo(done["answer_repo"], done["answer"])
+        
+        def _upload_task_files(done: Dict) -> str:
+            repo_name = done["template_repo"]
+            # Ensure resources key exists
+            if "resources" not in task_data:
+                task_data["resources"] = {}
+            task_data["resources"]["github_repo"] = f"https://github.com/{REPO_OWNER}/{repo_name}"
+            
+            # Save files locally and to GitHub
+            logger.info("Saving files locally...")
+            # Use the run directory (pending or resumed) since task ID doesn't exist yet
+            saved_dir = save_files_locally(local_task_dir.name, task_data, target_dir=local_task_dir)
+            logger.info(f"Files saved locally to: {saved_dir}")
+            
+            logger.info("Uploading files to GitHub repository...")
+            with stage_slot("github"):
+                upload_files_to_github(repo_name, task_data)
+            return str(saved_dir)
+        
+        def _create_gist(done: Dict) -> Optional[str]:
+            # Create Gist from template repo (same content for quick view/share)
+            if not GITHUB_GIST_TOKEN:
+                logger.warning("No GITHUB_GIST_TOKEN for gist; skipping gist creation")
+                return None
             try:
-                gist_url = create_gist_from_template(
-                    repo_url=github_repo_url,
-                    repo_token=GITHUB_UTKRUSHTAPPS_TOKEN,
-                    gist_token=GITHUB_GIST_TOKEN,
-                    description=task_data.get("name", repo_name),
-                    public=False,
-                )
+                with stage_slot("github"):
+                    gist_url = create_gist_from_template(
+                        repo_url=task_data["resources"]["github_repo"],
+                        repo_token=GITHUB_UTKRUSHTAPPS_TOKEN,
+                        gist_token=GITHUB_GIST_TOKEN,
+                        description=task_data.get("name", done["template_repo"]),
+                        public=False,
+                    )
                 if gist_url:
                     task_data["resources"]["gist_url"] = gist_url
                     logger.info(f"Gist created: {gist_url}")
+                return gist_url
             except Exception as e:
                 logger.warning(f"Gist creation skipped or failed: {e}")
-        else:
-            logger.warning("No GITHUB_GIST_TOKEN for gist; skipping gist creation")
+                return None
+        
+        def _delete_orphaned_repos(done: Dict) -> None:
+            if "answer" in done:
+                return
+            # Each repo stage with the stages that wrote into that repo
+            for stage, dependents in (("template_repo", ("task_upload", "gist")), ("answer_repo", ("answer_upload",))):
+                if not done.get(stage):
+                    continue
+                logger.info(f"Answer generation failed; deleting repository {done[stage]}")
+                try:
+                    with stage_slot("github"):
+                        delete_github_repo(done[stage])
+                except Exception:
+                    # Keep the checkpoints so a resumed run reuses the surviving repo
+                    continue
+                for checkpointed_stage in (stage, *dependents):
+                    remove_stage_checkpoint(local_task_dir, checkpointed_stage)
+                    checkpoints.pop(checkpointed_stage, None)
+        
+        stage_results = run_stage_graph({
+            "evals": (_checkpointed("evals", _run_evals), []),
+            "answer": (_checkpointed("answer", _generate_answer), []),
+            "template_repo": (_checkpointed("template_repo", _create_template_repo), []),
+            "answer_repo": (_checkpointed("answer_repo", _create_answer_repo), []),
+            "answer_upload": (_checkpointed("answer_upload", _upload_answer_files), ["answer", "answer_repo"]),
+            "task_upload": (_checkpointed("task_upload", _upload_task_files), ["template_repo"]),
+            "gist": (_checkpointed("gist", _create_gist), ["task_upload"]),
+        }, on_failure=_delete_orphaned_repos)
+        
+        eval_info = stage_results["evals"]
+        solutions_data = stage_results["answer"]
+        repo_name = stage_results["template_repo"]
+        gist_url = stage_results["gist"]
+        github_repo_url = f"https://github.com/{REPO_OWNER}/{repo_name}"
+        answer_repo_url = f"https://github.com/{REPO_OWNER}/{stage_results['answer_repo']}"
+        
+        # Upload stages restored from checkpoints did not write resources into task_data
+        task_data.setdefault("resources", {})["github_repo"] = github_repo_url
+        if gist_url:
+            task_data["resources"]["gist_url"] = gist_url
+        
+        solutions_for_db = {
+            "steps": solutions_data.get("steps", []),
+            "answer_repo": answer_repo_url
+        }
         
         # Store in Supabase
         logger.info("Storing task in Supabase...")
@@ -459,26 +610,18 @@ def create_task(competency_file: Path, background_file: Path, scenarios_file: Pa
         }
         
         supabase = init_supabase()
-        result = supabase.table("tasks").insert(task_data_for_db).execute()
         
-        if not result.data or len(result.data) == 0:
-            raise Exception("Failed to insert task into Supabase - no data returned")
+        def _insert_task() -> Dict:
+            # Task row and its competency links succeed or fail together
+            with stage_slot("supabase"):
+                return insert_task_with_competencies(
+                    supabase, task_data_for_db, [criteria.get("competency_id") for criteria in task_data["criterias"]]
+                )
         
-        supabase_task = result.data[0]
+        # Checkpointed so a resumed run never inserts the same task twice
+        supabase_task = _checkpointed("supabase_task", _insert_task)()
         task_id = supabase_task.get("id") or supabase_task.get("task_id")
         
-        # Insert task-competency relationships
-        for criteria in task_data["criterias"]:
-            competency_id = criteria.get("competency_id")
-            if competency_id:
-                try:
-                    supabase.table("task_competencies").insert({
-                        "task_id": task_id,
-                        "competency_id": competency_id
-                    }).execute()
-                except Exception as e:
-                    logger.error(f"Failed to insert task-competency relationship: {str(e)}")
-        
         task_data.update(supabase_task)
         task_data["task_id"] = task_id
         
@@ -496,7 +639,8 @@ def create_task(competency_file: Path, background_file: Path, scenarios_file: Pa
     except Exception as e:
         logger.error(f"Error in create_task function: {str(e)}")
         logger.error(traceback.format_exc())
-        raise Exception(f"Task creation failed: {str(e)}")
+        logger.error(f"Completed stages are checkpointed; resume with: python multiagent.py generate_tasks --resume {local_task_dir}")
+        raise Exception(f"Task creation failed: {str(e)} (resume with --resume {local_task_dir})")
 
 def deploy_task_impl(task_id: str, tasksession_id: str, droplet_ip: str = None, env: str = "dev"):
     """
@@ -626,7 +770,12 @@ def reset_task_impl(task_id: str, droplet_ip: str, script_path: str, env: str =
 @click.option('--deploy-existing', '-e',
               type=str,
               help='Deploy ALL existing undeployed tasks by competency_id (only works with --competency-id)')
-def deploy_task(competency_id: str, task_id: str, droplet_ip: str, deploy_existing: str = None, env: str = "dev"):
+@click.option('--max-parallel', '-p',
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              help='Maximum droplets to deploy to concurrently when deploying by competency')
+def deploy_task(competency_id: str, task_id: str, droplet_ip: str, deploy_existing: str = None, max_parallel: int = 1, env: str = "dev"):
     """
     Deploy a task to a droplet.
     """
@@ -661,6 +810,8 @@ def deploy_task(competency_id: str, task_id: str, droplet_ip: str, deploy_existi
         print(f" Droplet IP: {droplet_ip}")
     else:
         print(" Droplet IP: Auto-select from available pool")
+    if competency_id and max_parallel > 1:
+        print(f" Max Parallel Deployments: {max_parallel}")
     print(f" Environment: {env}")
     print()
     
@@ -670,7 +821,7 @@ def deploy_task(competency_id: str, task_id: str, droplet_ip: str, deploy_existi
             success = deploy_task_by_id(task_id, None, droplet_ip, env)
         else:
             # Deploy existing tasks by competency ID
-            success = deploy_existing_task(competency_id, droplet_ip, env)
+            success = deploy_existing_task(competency_id, droplet_ip, env, max_parallel=max_parallel)
             
         if success:
             print()
@@ -769,6 +920,50 @@ def reset_task(task_id: str, droplet_ip: str, script_path: str, env: str = "dev"
         print(" Please check the logs and try again.")
         print()
 
+@click.command()
+@click.option('--interval', '-i', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Re-run every N seconds (0 = reconcile once and exit)')
+@click.option('--status-only', is_flag=True, default=False,
+              help='Only show pool membership, do not warm or stage droplets')
+def warm_pool(interval: int, status_only: bool, env: str = "dev"):
+    """
+    Keep DROPLET_POOL_CONFIG droplets warm and pre-stage undeployed tasks on them.
+    """
+    config = load_pool_config()
+    if not config:
+        print(" ERROR: DROPLET_POOL_CONFIG is not set (see TASK_MANAGEMENT_GUIDE.md, Warm Droplet Pool)")
+        return
+    droplet_ips = get_pool_droplet_ips()
+    if not droplet_ips:
+        print(" ERROR: No droplet IPs configured in DROPLET_POOL_IPS or AVAILABLE_IPS")
+        return
+
+    print("=" * 70)
+    print(" WARM DROPLET POOL")
+    print("=" * 70)
+    print(f" Droplets: {', '.join(droplet_ips)}")
+    stacks = ", ".join(f"{name} (size {spec['size']})" for name, spec in config.items())
+    print(f" Stacks: {stacks}")
+    print()
+
+    while True:
+        if status_only:
+            for ip, status in pool_status(droplet_ips).items():
+                marker = status["marker"] or {}
+                state = "unreachable" if status["health"] is None else marker.get("state", "not in pool")
+                detail = f" ({marker.get('stack')}, task {marker['task_id']})" if marker.get("task_id") else \
+                    (f" ({marker.get('stack')})" if marker else "")
+                print(f"   • {ip}: {state}{detail}")
+        else:
+            summary = reconcile_pool(droplet_ips, lambda competency_ids: find_task_by_competencies(competency_ids, env),
+                                     download_repo_files, config)
+            for stack, counts in summary.items():
+                print(f"   • {stack}: {counts['warm'] + counts['staged']}/{counts['size']} ready "
+                      f"({counts['staged']} staged, {counts['warm']} warm)")
+        if not interval:
+            break
+        time.sleep(interval)
+
 @click.command()
 @click.option('--competency-file', '-c', 
               type=click.Path(exists=True, path_type=Path),
@@ -779,43 +974,58 @@ def reset_task(task_id: str, droplet_ip: str, script_path: str, env: str = "dev"
 @click.option('--scenarios-file', '-s',
               type=click.Path(exists=True, path_type=Path),
               help='Path to task_scenarios.json file')
-def generate_tasks(competency_file: Path, background_file: Path, scenarios_file: Path):
+@click.option('--no-llm-cache', is_flag=True, default=False,
+              help='Bypass the on-disk LLM response cache and always call the API')
+@click.option('--resume', 'resume_dir',
+              type=click.Path(exists=True, file_okay=False, path_type=Path),
+              help='Local task directory of a failed run; completed stages are skipped')
+def generate_tasks(competency_file: Path, background_file: Path, scenarios_file: Path, no_llm_cache: bool = False, resume_dir: Path = None):
     """
     Generate intelligent assessment tasks OR deploy existing tasks to droplets.
     
     DEFAULT MODE: Automatically detects single vs multi-competency and generates appropriate tasks.
     
     DEPLOYMENT MODE: Use --deploy-existing with a competency_id to deploy ALL existing undeployed tasks.
+    
+    RESUME MODE: Use --resume with the local task directory printed by a failed run.
     """
     # Run task creation workflow
     print(" INTELLIGENT TASK GENERATION AGENT")
+    if no_llm_cache:
+        set_cache_bypass(True)
     
-    # Check how many competencies we have
-    try:
-        competencies = read_json_file_robust(competency_file)
-        competency_count = len(competencies)
-        competency_names = [comp.get('name') for comp in competencies]
-        
-        print(f" Found {competency_count} competencies:")
-        for i, name in enumerate(competency_names, 1):
-            print(f"   {i}. {name}")
+    if resume_dir:
+        print(f" Resuming from checkpoints in: {resume_dir}")
         print()
-        
-    except Exception as e:
-        print(f" Error reading competencies file: {str(e)}")
-        return
     
-    missing_files = []
-    if not competency_file.exists():
-        missing_files.append(str(competency_file))
-    if not background_file.exists():
-        missing_files.append(str(background_file))
+    # Check how many competencies we have (a resumed run may reuse the checkpointed inputs)
+    if competency_file or not resume_dir:
+        try:
+            competencies = read_json_file_robust(competency_file)
+            competency_count = len(competencies)
+            competency_names = [comp.get('name') for comp in competencies]
+            
+            print(f" Found {competency_count} competencies:")
+            for i, name in enumerate(competency_names, 1):
+                print(f"   {i}. {name}")
+            print()
+            
+        except Exception as e:
+            print(f" Error reading competencies file: {str(e)}")
+            return
     
-    if missing_files:
-        print(" Missing files:")
-        for file in missing_files:
-            print(f"   - {file}")
-        return
+    if not resume_dir:
+        missing_files = []
+        if not competency_file.exists():
+            missing_files.append(str(competency_file))
+        if not background_file or not background_file.exists():
+            missing_files.append(str(background_file))
+        
+        if missing_files:
+            print(" Missing files:")
+            for file in missing_files:
+                print(f"   - {file}")
+            return
 
     try:
         # Create task(s) - function automatically handles single vs multi
@@ -825,7 +1035,7 @@ def generate_tasks(competency_file: Path, background_file: Path, scenarios_file:
         # Validate environment first
         validate_environment()
         
-        result = create_task(competency_file, background_file, scenarios_file)
+        result = create_task(competency_file, background_file, scenarios_file, resume_dir=resume_dir)
         
         task_type = result.get("task_type", "unknown")
         competencies_covered = result.get("competencies_covered", [])
@@ -852,6 +1062,129 @@ def generate_tasks(competency_file: Path, background_file: Path, scenarios_file:
         print(" Please check your configuration and try again.")
         print("=" * 70)
 
+def load_batch_manifest(batch_file: Path) -> List[Dict]:
+    """
+    Load a batch manifest and expand it into one job per task to generate.
+
+    The manifest is a JSON array of objects:
+        {"competency_file": "...", "background_file": "...", "scenarios_file": "...", "count": 5}
+    scenarios_file is optional and count defaults to 1.
+
+    Returns:
+        List of job dicts with label, competency_file, background_file and scenarios_file
+    """
+    manifest = read_json_file_robust(batch_file)
+    if not isinstance(manifest, list) or not manifest:
+        raise ValueError(f"Batch manifest {batch_file} must be a non-empty JSON array")
+
+    jobs = []
+    for entry_index, entry in enumerate(manifest, 1):
+        competency_file = Path(entry.get("competency_file", ""))
+        background_file = Path(entry.get("background_file", ""))
+        scenarios_file = Path(entry["scenarios_file"]) if entry.get("scenarios_file") else None
+        count = int(entry.get("count", 1))
+
+        missing = [str(f) for f in (competency_file, background_file, scenarios_file) if f is not None and not f.is_file()]
+        if missing:
+            raise ValueError(f"Batch entry {entry_index} references missing files: {', '.join(missing)}")
+
+        for copy_index in range(1, count + 1):
+            jobs.append({
+                "label": f"{competency_file.stem} #{copy_index}",
+                "competency_file": competency_file,
+                "background_file": background_file,
+                "scenarios_file": scenarios_file,
+            })
+    return jobs
+
+def run_task_batch(jobs: List[Dict], workers: int) -> List[Dict]:
+    """
+    Run create_task for every job on a bounded worker pool.
+
+    Per-stage limits (LLM, GitHub, Supabase) are enforced inside create_task via
+    stage_slot, so workers only bound how many pipelines are in flight.
+
+    Returns:
+        One result dict per job: label, status, duration, task_id/error
+    """
+    def _run(job: Dict) -> Dict:
+        start = time.monotonic()
+        try:
+            task = create_task(job["competency_file"], job["background_file"], job["scenarios_file"])
+            return {
+                "label": job["label"],
+                "status": "success",
+                "duration": time.monotonic() - start,
+                "task_id": task.get("task_id"),
+                "github_repo": task.get("resources", {}).get("github_repo"),
+            }
+        except Exception as e:
+            return {
+                "label": job["label"],
+                "status": "failed",
+                "duration": time.monotonic() - start,
+                "error": str(e),
+            }
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="create_task") as executor:
+        futures = {executor.submit(_run, job): job for job in jobs}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["status"] == "success":
+                print(f" [{len(results)}/{len(jobs)}] {result['label']}: task {result['task_id']} ({result['duration']:.1f}s)")
+            else:
+                print(f" [{len(results)}/{len(jobs)}] {result['label']}: FAILED ({result['error']})")
+    return results
+
+@click.command()
+@click.option('--batch-file', '-f', required=True,
+              type=click.Path(exists=True, path_type=Path),
+              help='JSON array of {competency_file, background_file, scenarios_file, count} entries')
+@click.option('--workers', '-w', default=4, show_default=True, type=click.IntRange(min=1),
+              help='Number of create_task pipelines to run concurrently')
+@click.option('--llm-concurrency', default=DEFAULT_STAGE_LIMITS["llm"], show_default=True, type=click.IntRange(min=1),
+              help='Maximum in-flight LLM calls across all pipelines')
+@click.option('--github-concurrency', default=DEFAULT_STAGE_LIMITS["github"], show_default=True, type=click.IntRange(min=1),
+              help='Maximum in-flight GitHub operations across all pipelines')
+@click.option('--supabase-concurrency', default=DEFAULT_STAGE_LIMITS["supabase"], show_default=True, type=click.IntRange(min=1),
+              help='Maximum in-flight Supabase writes across all pipelines')
+@click.option('--no-llm-cache', is_flag=True, default=False,
+              help='Bypass the on-disk LLM response cache and always call the API')
+def generate_tasks_batch(batch_file: Path, workers: int, llm_concurrency: int, github_concurrency: int, supabase_concurrency: int, no_llm_cache: bool = False):
+    """
+    Generate many tasks concurrently from a batch manifest.
+    """
+    print(" BATCH TASK GENERATION AGENT")
+    print("=" * 70)
+    if no_llm_cache:
+        set_cache_bypass(True)
+
+    try:
+        jobs = load_batch_manifest(batch_file)
+        validate_environment()
+    except Exception as e:
+        print(f" Error preparing batch: {str(e)}")
+        return
+
+    limits = configure_stage_limits(llm=llm_concurrency, github=github_concurrency, supabase=supabase_concurrency)
+    reset_stage_stats()
+
+    print(f" Tasks to generate: {len(jobs)}")
+    print(f" Workers: {workers}")
+    print(f" Stage limits: LLM={limits['llm']}, GitHub={limits['github']}, Supabase={limits['supabase']}")
+    print("-" * 50)
+
+    batch_start = time.monotonic()
+    results = run_task_batch(jobs, workers)
+    wall_seconds = time.monotonic() - batch_start
+
+    print()
+    print("=" * 70)
+    print(format_batch_report(results, wall_seconds))
+    print("=" * 70)
+
 # === NEW DEPLOYMENT FUNCTIONS ===
 
 
@@ -894,6 +1227,56 @@ def update_task_undeploy_status(task_id: str, env: str = "dev") -> bool:
         logger.error(f"Failed to update task {task_id} undeploy status: {str(e)}")
         return False
 
+# Columns the deploy paths read from a task; task_blob is narrowed to the fields they use
+TASK_LOOKUP_COLUMNS = "task_id, criterias, created_at, is_deployed, title:task_blob->>title, name:task_blob->>name, resources:task_blob->resources"
+# Task IDs per `in` filter, keeping request URLs well under proxy limits
+TASK_ID_CHUNK_SIZE = 200
+
+def _find_undeployed_tasks_fallback(supabase: Client, competency_ids: List[str], env: str) -> List[dict]:
+    """
+    Undeployed tasks containing ALL competency_ids, filtered server-side.
+
+    Candidates are the union of the task_competencies join table (via the
+    in-process competency index) and a JSONB containment match on the tasks'
+    criterias, so tasks that were never linked in task_competencies are still
+    found. Only TASK_LOOKUP_COLUMNS are transferred, and task_blob is rebuilt
+    with just its title and resources.
+    """
+    rows_by_id = {}
+    linked_lookup_failed = False
+    try:
+        task_ids = sorted(competency_task_index.task_ids_with_all(supabase, env, competency_ids))
+        logger.info(f"{len(task_ids)} task(s) linked to all competencies in task_competencies")
+        for start in range(0, len(task_ids), TASK_ID_CHUNK_SIZE):
+            for row in (supabase.table("tasks").select(TASK_LOOKUP_COLUMNS)
+                        .eq("is_deployed", False)
+                        .in_("task_id", task_ids[start:start + TASK_ID_CHUNK_SIZE])
+                        .execute().data or []):
+                rows_by_id[str(row["task_id"])] = row
+    except Exception as e:
+        logger.warning(f"task_competencies lookup failed ({str(e)}); relying on the criterias match")
+        linked_lookup_failed = True
+    try:
+        for row in (supabase.table("tasks").select(TASK_LOOKUP_COLUMNS)
+                    .eq("is_deployed", False)
+                    .contains("criterias", json.dumps([{"competency_id": cid} for cid in competency_ids]))
+                    .execute().data or []):
+            rows_by_id.setdefault(str(row["task_id"]), row)
+    except Exception as e:
+        if linked_lookup_failed:
+            raise
+        logger.warning(f"criterias match failed ({str(e)}); using task_competencies results only")
+    rows = list(rows_by_id.values())
+    
+    tasks = []
+    for row in rows:
+        title, name, resources = row.pop("title", None), row.pop("name", None), row.pop("resources", None)
+        row["task_blob"] = {"title": title, "resources": resources or {}}
+        row["name"] = title or name or "unknown"
+        tasks.append(row)
+    tasks.sort(key=lambda task: task.get("created_at") or "")
+    return tasks
+
 def find_task_by_competencies(competency_ids: List[str], env: str = "dev") -> List[dict]:
     """
     Search for undeployed tasks that contain ALL specified competency_ids using Supabase RPC functions.
@@ -959,42 +1342,12 @@ def find_task_by_competencies(competency_ids: List[str], env: str = "dev") -> Li
     except Exception as e:
         logger.error(f"Error calling RPC function for competencies {competency_ids}: {str(e)}")
         
-        # Fallback method - direct database query
+        # Fallback method - server-side filtered query
         logger.info("RPC function failed, using fallback method...")
         try:
-            # Direct database query - select all necessary fields
-            result = supabase.table("tasks").select(
-                "task_id, criterias, task_blob, is_deployed, created_at, deployment_info, pre_requisites, answer, readme_content, eval_info, solutions, is_shared_infra_required"
-            ).eq("is_deployed", False).execute()
-            
-            matching_tasks = []
-            if result.data:
-                logger.info(f"Found {len(result.data)} total undeployed tasks to search through")
-                
-                for task in result.data:
-                    criterias = task.get("criterias", [])
-                    if isinstance(criterias, list):
-                        # Get all competency_ids from this task's criterias
-                        task_competency_ids = set()
-                        for criteria in criterias:
-                            if isinstance(criteria, dict) and criteria.get("competency_id"):
-                                task_competency_ids.add(criteria.get("competency_id"))
-                        
-                        # Check if ALL required competencies are present in this task
-                        required_competencies = set(competency_ids)
-                        if required_competencies.issubset(task_competency_ids):
-                            # Extract task name from task_blob if available
-                            task_name = "unknown"
-                            task_blob = task.get("task_blob", {})
-                            if isinstance(task_blob, dict):
-                                task_name = task_blob.get("title") or task_blob.get("name") or "unknown"
-                            
-                            # Add the task name to the task object for easier access later
-                            task["name"] = task_name
-                            
-                            matching_tasks.append(task)
-                            logger.info(f"  - Matched Task ID: {task.get('task_id')}, Name: {task_name}")
-                            logger.info(f"    Task competencies: {list(task_competency_ids)}")
+            matching_tasks = _find_undeployed_tasks_fallback(supabase, competency_ids, env)
+            for task in matching_tasks:
+                logger.info(f"  - Matched Task ID: {task.get('task_id')}, Name: {task['name']}")
             
             if matching_tasks:
                 if len(competency_ids) == 1:
@@ -1044,24 +1397,13 @@ def download_repo_files(github_repo_url: str, local_dir: str) -> bool:
         local_path.mkdir(parents=True, exist_ok=True)
         logger.info(f"Local directory {local_dir} created successfully")
         
-        # Get all files from the repository
-        contents = repo.get_contents("")
-        
-        while contents:
-            logger.info(f"Processing files")
-            file_content = contents.pop(0)
-            if file_content.type == "dir":
-                # Add directory contents to the list
-                contents.extend(repo.get_contents(file_content.path))
-            else:
-                # Download file
-                file_path = local_path / file_content.path
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                with open(file_path, "wb") as f:
-                    f.write(file_content.decoded_content)
-                
-                logger.info(f"Downloaded: {file_content.path}")
+        # One streamed tarball request; fall back to a recursive tree + concurrent blob fetches
+        try:
+            file_count = download_repo_tarball(repo, local_path)
+        except Exception as e:
+            logger.warning(f"Tarball download failed ({str(e)}); falling back to recursive tree download")
+            file_count = download_repo_tree(repo, local_path)
+        logger.info(f"Downloaded {file_count} files")
         
         logger.info(f"Successfully downloaded repository to: {local_dir}")
         return True
@@ -1070,67 +1412,57 @@ def download_repo_files(github_repo_url: str, local_dir: str) -> bool:
         logger.error(f"Error downloading repository {github_repo_url}: {str(e)}")
         return False
 
-def execute_run_script(droplet_ip: str, remote_dir: str = "/root/task") -> bool:
+def execute_run_script(
+    droplet_ip: str,
+    remote_dir: str = "/root/task",
+    on_output: Optional[Callable[[str, str], None]] = None,
+    timeout: float = REMOTE_SCRIPT_TIMEOUT_SECONDS,
+) -> bool:
     """
-    Execute run.sh script on the droplet.
+    Execute run.sh script on the droplet, streaming its output as it runs.
 
     Args:
         droplet_ip: IP address of the droplet
         remote_dir: Remote directory containing the run.sh script
+        on_output: Optional extra sink called with ("stdout" | "stderr", line) per output line
+        timeout: Seconds before run.sh (and everything it started) is killed
 
     Returns:
         True if successful, False otherwise
     """
-    ssh_key = get_ssh_key()
-    if not ssh_key:
-        logger.error("Failed to load SSH key (set DROPLET_SSH_PRIVATE_KEY in env)")
-        return False
+    def _forward(stream: str, line: str) -> None:
+        logger.info(f"run.sh {'errors' if stream == 'stderr' else 'output'}: {line}")
+        if on_output is not None:
+            on_output(stream, line)
 
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            droplet_ip,
-            username="root",
-            pkey=ssh_key,
-            timeout=30
-        )
-        
         # Check if run.sh exists
         run_script_path = f"{remote_dir}/run.sh"
-        stdin, stdout, stderr = ssh.exec_command(f"ls -la {run_script_path}")
+        exit_status, _, _ = ssh_connections.run(droplet_ip, f"ls -la {run_script_path}")
         
-        if stdout.channel.recv_exit_status() != 0:
+        if exit_status != 0:
             logger.info(f"run.sh not found at {run_script_path}")
-            ssh.close()
             return False
         
-        # Make run.sh executable
-        ssh.exec_command(f"chmod +x {run_script_path}")
-        
-        # Execute run.sh
+        # Make run.sh executable and execute it in one round-trip
         logger.info(f"Executing run.sh on {droplet_ip}...")
-        stdin, stdout, stderr = ssh.exec_command(f"cd {remote_dir} && ./run.sh")
-        
-        # Wait for completion and get output
-        stdout_data = stdout.read().decode()
-        stderr_data = stderr.read().decode()
-        exit_status = stdout.channel.recv_exit_status()
-        
-        if stdout_data:
-            logger.info(f"run.sh output: {stdout_data}")
-        if stderr_data:
-            logger.info(f"run.sh errors: {stderr_data}")
-        
-        ssh.close()
+        exit_status, _, stderr_tail = ssh_connections.run_streaming(
+            droplet_ip, f"chmod +x {run_script_path} && cd {remote_dir} && ./run.sh",
+            on_output=_forward, timeout=timeout
+        )
         
         if exit_status == 0:
             logger.info("run.sh executed successfully")
             return True
         else:
             logger.error(f"run.sh failed with exit status: {exit_status}")
+            if stderr_tail:
+                logger.error(f"run.sh stderr (tail): {stderr_tail[-2000:]}")
             return False
         
+    except TimeoutError as e:
+        logger.error(f"run.sh timed out on droplet {droplet_ip}: {str(e)}")
+        return False
     except Exception as e:
         logger.error(f"Error executing run.sh on droplet {droplet_ip}: {str(e)}")
         return False
@@ -1222,52 +1554,202 @@ def parse_competency_input(competency_input: str) -> List[str]:
     
     return unique_competency_ids
 
-def select_best_droplet_ip(droplet_ips: List[str]) -> str:
+def select_best_droplet_ip(droplet_ips: List[str], health_by_ip: Optional[Dict[str, Optional[Dict]]] = None) -> str:
     """
-    Check each IP for running Docker containers and return the first IP with no containers.
+    Probe all IPs concurrently and return a droplet with no running containers.
+
+    The first idle droplet whose health score reaches DROPLET_GOOD_ENOUGH_SCORE is
+    returned as soon as it answers; otherwise the best-scoring idle droplet wins
+    once every probe has finished. Unreachable droplets cost at most one probe timeout.
+    Pass health_by_ip (probe_droplet_health results, e.g. from pool_status) to
+    choose from those instead of probing again.
     """
-    ssh_key = get_ssh_key()
-    if not ssh_key:
-        logger.error("Failed to load SSH key (set DROPLET_SSH_PRIVATE_KEY in env)")
+    if not droplet_ips:
         return None
 
-    for ip in droplet_ips:
-        logger.info(f"Checking IP {ip} for running containers")
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    best = {"ip": None, "score": None}
+
+    def _consider(ip: str, health: Optional[Dict]) -> bool:
+        """Record a probe result; True if ip is good enough to take right away."""
+        if health is None:
+            return False
+        score = score_droplet_health(health)
+        if score is None:
+            logger.info(f"IP {ip} has {int(health['containers'])} containers running")
+            return False
+        logger.info(f"IP {ip} is idle (score {score:.2f}, load {health.get('load1')}, "
+                    f"mem free {health.get('mem_available_kb', 0) / 1024:.0f} MB, "
+                    f"disk free {health.get('disk_available_kb', 0) / 1024 / 1024:.1f} GB)")
+        if score >= DROPLET_GOOD_ENOUGH_SCORE:
+            logger.info(f"Found IP {ip} with no running containers")
+            return True
+        if best["score"] is None or score > best["score"]:
+            best["ip"], best["score"] = ip, score
+        return False
 
+    if health_by_ip is not None:
+        for ip in droplet_ips:
+            if _consider(ip, health_by_ip.get(ip)):
+                return ip
+    else:
+        logger.info(f"Probing {len(droplet_ips)} droplet(s) for running containers and load")
+        executor = ThreadPoolExecutor(max_workers=len(droplet_ips))
+        futures = {executor.submit(probe_droplet_health, ip): ip for ip in droplet_ips}
         try:
-            ssh.connect(
-                ip,
-                username="root",
-                pkey=ssh_key,
-                timeout=10
-            )
-            
-            # Execute docker ps to count containers
-            stdin, stdout, stderr = ssh.exec_command("docker ps -q | wc -l")
-            exit_status = stdout.channel.recv_exit_status()
-            
-            if exit_status == 0:
-                container_count = int(stdout.read().decode().strip())
-                if container_count == 0:
-                    logger.info(f"Found IP {ip} with no running containers")
+            # Connect timeout + command timeout bounds each probe
+            for future in as_completed(futures, timeout=2 * DROPLET_PROBE_TIMEOUT_SECONDS + 5):
+                ip = futures[future]
+                if _consider(ip, future.result()):
                     return ip
-                logger.info(f"IP {ip} has {container_count} containers running")
-            else:
-                error = stderr.read().decode().strip()
-                logger.error(f"Failed to check containers on {ip}: {error}")
-                
-        except Exception as e:
-            logger.error(f"Error checking {ip}: {str(e)}")
+        except FuturesTimeoutError:
+            logger.warning("Some droplets did not answer the health probe in time")
         finally:
-            # Always close the SSH connection
-            ssh.close()
-    
+            # Don't wait for probes still stuck on unreachable droplets
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    if best["ip"]:
+        logger.info(f"Selected IP {best['ip']} with no running containers (best score {best['score']:.2f})")
+        return best["ip"]
     logger.info("No IPs found without running containers")
     return None
 
-def deploy_existing_task(competency_input: str, droplet_ip: str = None, env: str = "dev") -> bool:
+def _deploy_task_to_droplet(task: Dict, droplet_ip: str, position: int, total: int, env: str = "dev", prefix: str = "") -> Dict:
+    """
+    Deploy one task to one droplet: download, upload, run.sh, database update.
+
+    Args:
+        task: Task row from find_task_by_competencies
+        droplet_ip: Droplet the task is assigned to
+        position: 1-based position of this task in the deployment batch
+        total: Number of tasks in the deployment batch
+        env: Environment ("dev" or "prod")
+        prefix: Prepended to every progress line (tells parallel workers apart)
+
+    Returns:
+        Result entry for the deployment summary ("success", "partial" or "failed")
+    """
+    task_id = task.get("task_id")
+    task_name = task.get("name", "unknown")
+    github_repo_url = task.get("task_blob", {}).get("resources", {}).get("github_repo")
+    
+    # Show task competencies
+    criterias = task.get("criterias", [])
+    task_competencies = []
+    if isinstance(criterias, list):
+        for criteria in criterias:
+            if isinstance(criteria, dict) and criteria.get("competency_id"):
+                task_competencies.append(criteria.get("competency_id"))
+    
+    print(f"\n{prefix} DEPLOYING TASK {position}/{total}")
+    print(f"{prefix}   Task: {task_name} (ID: {task_id})")
+    print(f"{prefix}   Competencies: {', '.join(task_competencies) if task_competencies else 'None found'}")
+    print(f"{prefix}   Droplet: {droplet_ip}")
+    print(f"{prefix}   GitHub: {github_repo_url}")
+    print(prefix + "-" * 50)
+    
+    if not github_repo_url:
+        print(f"{prefix} No GitHub repository found for task: {task_name}")
+        return {
+            "task_id": task_id,
+            "task_name": task_name,
+            "droplet_ip": droplet_ip,
+            "status": "failed",
+            "reason": "No GitHub repository",
+            "competencies": task_competencies
+        }
+    
+    # Download files from GitHub into a private temp dir so concurrent workers never collide
+    print(f"{prefix} Downloading files from GitHub repository...")
+    local_dir = tempfile.mkdtemp(prefix=f"deploy_{task_id}_")
+    
+    if not download_repo_files(github_repo_url, local_dir):
+        print(f"{prefix} Failed to download files from GitHub repository")
+        shutil.rmtree(local_dir, ignore_errors=True)
+        return {
+            "task_id": task_id,
+            "task_name": task_name,
+            "droplet_ip": droplet_ip,
+            "status": "failed",
+            "reason": "GitHub download failed",
+            "competencies": task_competencies
+        }
+    
+    print(f"{prefix} Files downloaded to: {local_dir}")
+    
+    # Mark the droplet in-use so the warm pool does not stage over this deploy
+    if load_pool_config():
+        release_droplet(droplet_ip)
+    
+    # Upload files to droplet
+    print(f"{prefix} Uploading files to droplet: {droplet_ip}")
+    
+    if not upload_files_to_droplet(local_dir, droplet_ip):
+        print(f"{prefix} Failed to upload files to droplet")
+        # Clean up local files
+        shutil.rmtree(local_dir, ignore_errors=True)
+        return {
+            "task_id": task_id,
+            "task_name": task_name,
+            "droplet_ip": droplet_ip,
+            "status": "failed",
+            "reason": "Upload to droplet failed",
+            "competencies": task_competencies
+        }
+    
+    print(f"{prefix} Files uploaded to droplet")
+
+    # Execute run.sh script
+    print(f"{prefix}  Executing run.sh script on droplet...")
+    
+    run_script_success = execute_run_script(droplet_ip)
+    if not run_script_success:
+        print(f"{prefix}  Failed to execute run.sh script")
+        print(f"{prefix}   Files are uploaded but run.sh failed - skipping database update")
+        db_update_success = False
+    else:
+        print(f"{prefix} run.sh executed successfully")
+        
+        # Only update database if run.sh executes successfully
+        print(f"{prefix} Updating database to mark task as deployed...")
+        
+        db_update_success = update_task_deployment_status(task_id, droplet_ip, env)
+        if not db_update_success:
+            print(f"{prefix} Failed to update database")
+            print(f"{prefix}   Task is deployed but database update failed")
+        else:
+            print(f"{prefix} Database updated successfully")
+    
+    # Clean up local files
+    try:
+        shutil.rmtree(local_dir)
+        print(f"{prefix}🧹 Cleaned up local files")
+    except Exception as e:
+        print(f"{prefix}  Failed to clean up local files: {str(e)}")
+    
+    # Determine if this deployment was successful
+    if run_script_success and db_update_success:
+        print(f"{prefix} Task '{task_name}' deployed successfully to {droplet_ip}")
+        return {
+            "task_id": task_id,
+            "task_name": task_name,
+            "droplet_ip": droplet_ip,
+            "status": "success",
+            "ssh_access": f"ssh root@{droplet_ip}",
+            "remote_directory": "/root/task",
+            "competencies": task_competencies
+        }
+    else:
+        print(f"{prefix}  Task '{task_name}' partially deployed to {droplet_ip} (some steps failed)")
+        return {
+            "task_id": task_id,
+            "task_name": task_name,
+            "droplet_ip": droplet_ip,
+            "status": "partial",
+            "reason": f"run.sh: {'OK' if run_script_success else 'FAILED'}, db_update: {'OK' if db_update_success else 'FAILED'}",
+            "competencies": task_competencies
+        }
+
+def deploy_existing_task(competency_input: str, droplet_ip: str = None, env: str = "dev", max_parallel: int = 1) -> bool:
     """
     Deploy existing undeployed tasks for one or more competencies to available droplets.
     
@@ -1280,11 +1762,13 @@ def deploy_existing_task(competency_input: str, droplet_ip: str = None, env: str
     3. Gets ALL available droplet IPs (if not specified)
     4. Deploys only as many tasks as there are available droplets (one task per droplet)
     5. For each task: downloads files, uploads to droplet, executes run.sh, updates database
+       (up to max_parallel droplets at a time, each worker in its own temp directory)
     
     Args:
         competency_input: Single competency ID or multiple competency IDs (comma/space separated)
         droplet_ip: IP address of specific droplet to use (if None, auto-select all available)
         env: Environment ("dev" or "prod")
+        max_parallel: Maximum droplets deployed concurrently (1 = one after another)
     
     Returns:
         True if at least one deployment successful, False if all deployments failed
@@ -1348,9 +1832,8 @@ def deploy_existing_task(competency_input: str, droplet_ip: str = None, env: str
         print(f" Found {len(available_droplets)} available droplet(s): {', '.join(available_droplets)}")
     
     # Step 3: Deploy tasks to available droplets (one task per droplet maximum)
-    successful_deployments = 0
-    failed_deployments = 0
     deployment_results = []
+    droplet_inventory.prefetch()
     
     # Limit tasks to number of available droplets (one task per droplet)
     max_deployments = len(available_droplets)
@@ -1367,138 +1850,40 @@ def deploy_existing_task(competency_input: str, droplet_ip: str = None, env: str
     print(f"\n Starting deployment of {len(tasks_to_deploy)} task(s) to {len(available_droplets)} droplet(s)...")
     print("=" * 70)
     
-    for task_index, task in enumerate(tasks_to_deploy):
-        task_id = task.get("task_id")
-        task_name = task.get("name", "unknown")
-        github_repo_url = task.get("task_blob", {}).get("resources", {}).get("github_repo")
-        
-        # Show task competencies
-        criterias = task.get("criterias", [])
-        task_competencies = []
-        if isinstance(criterias, list):
-            for criteria in criterias:
-                if isinstance(criteria, dict) and criteria.get("competency_id"):
-                    task_competencies.append(criteria.get("competency_id"))
-        
-        # Assign task to specific droplet (one-to-one mapping)
-        selected_droplet = available_droplets[task_index]
-        
-        print(f"\n DEPLOYING TASK {task_index + 1}/{len(tasks_to_deploy)}")
-        print(f"   Task: {task_name} (ID: {task_id})")
-        print(f"   Competencies: {', '.join(task_competencies) if task_competencies else 'None found'}")
-        print(f"   Droplet: {selected_droplet}")
-        print(f"   GitHub: {github_repo_url}")
-        print("-" * 50)
-        
-        if not github_repo_url:
-            print(f" No GitHub repository found for task: {task_name}")
-            failed_deployments += 1
-            deployment_results.append({
-                "task_id": task_id,
-                "task_name": task_name,
-                "droplet_ip": selected_droplet,
-                "status": "failed",
-                "reason": "No GitHub repository",
-                "competencies": task_competencies
-            })
-            continue
-        
-        # Download files from GitHub
-        print(f" Downloading files from GitHub repository...")
-        local_dir = f"temp_deploy_{task_id}"
-        
-        if not download_repo_files(github_repo_url, local_dir):
-            print(f" Failed to download files from GitHub repository")
-            failed_deployments += 1
-            deployment_results.append({
-                "task_id": task_id,
-                "task_name": task_name,
-                "droplet_ip": selected_droplet,
-                "status": "failed",
-                "reason": "GitHub download failed",
-                "competencies": task_competencies
-            })
-            continue
-        
-        print(f" Files downloaded to: {local_dir}")
-        
-        # Upload files to droplet
-        print(f" Uploading files to droplet: {selected_droplet}")
-        
-        if not upload_files_to_droplet(local_dir, selected_droplet):
-            print(f" Failed to upload files to droplet")
-            # Clean up local files
-            try:
-                import shutil
-                shutil.rmtree(local_dir)
-            except:
-                pass
-            failed_deployments += 1
-            deployment_results.append({
-                "task_id": task_id,
-                "task_name": task_name,
-                "droplet_ip": selected_droplet,
-                "status": "failed",
-                "reason": "Upload to droplet failed",
-                "competencies": task_competencies
-            })
-            continue
-        
-        print(f" Files uploaded to droplet")
+    if max_parallel > 1 and len(tasks_to_deploy) > 1:
+        # One worker per droplet; results are kept in task order for the summary
+        workers = min(max_parallel, len(tasks_to_deploy))
+        print(f" Deploying in parallel ({workers} concurrent droplet(s))")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_deploy_task_to_droplet, task, available_droplets[task_index],
+                                task_index + 1, len(tasks_to_deploy), env, f"[{available_droplets[task_index]}]")
+                for task_index, task in enumerate(tasks_to_deploy)
+            ]
+            for task_index, future in enumerate(futures):
+                try:
+                    deployment_results.append(future.result())
+                except Exception as e:
+                    task = tasks_to_deploy[task_index]
+                    logger.error(f"Deployment of task {task.get('task_id')} crashed: {str(e)}")
+                    deployment_results.append({
+                        "task_id": task.get("task_id"),
+                        "task_name": task.get("name", "unknown"),
+                        "droplet_ip": available_droplets[task_index],
+                        "status": "failed",
+                        "reason": f"Deployment error: {str(e)}",
+                        "competencies": [c.get("competency_id") for c in task.get("criterias") or []
+                                         if isinstance(c, dict) and c.get("competency_id")],
+                    })
+    else:
+        for task_index, task in enumerate(tasks_to_deploy):
+            # Assign task to specific droplet (one-to-one mapping)
+            deployment_results.append(
+                _deploy_task_to_droplet(task, available_droplets[task_index], task_index + 1, len(tasks_to_deploy), env)
+            )
 
-        # Execute run.sh script
-        print(f"  Executing run.sh script on droplet...")
-        
-        run_script_success = execute_run_script(selected_droplet)
-        if not run_script_success:
-            print(f"  Failed to execute run.sh script")
-            print(f"   Files are uploaded but run.sh failed - skipping database update")
-            db_update_success = False
-        else:
-            print(f" run.sh executed successfully")
-            
-            # Only update database if run.sh executes successfully
-            print(f" Updating database to mark task as deployed...")
-            
-            db_update_success = update_task_deployment_status(task_id, selected_droplet, env)
-            if not db_update_success:
-                print(f" Failed to update database")
-                print(f"   Task is deployed but database update failed")
-            else:
-                print(f" Database updated successfully")
-        
-        # Clean up local files
-        try:
-            import shutil
-            shutil.rmtree(local_dir)
-            print(f"🧹 Cleaned up local files")
-        except Exception as e:
-            print(f"  Failed to clean up local files: {str(e)}")
-        
-        # Determine if this deployment was successful
-        if run_script_success and db_update_success:
-            print(f" Task '{task_name}' deployed successfully to {selected_droplet}")
-            successful_deployments += 1
-            deployment_results.append({
-                "task_id": task_id,
-                "task_name": task_name,
-                "droplet_ip": selected_droplet,
-                "status": "success",
-                "ssh_access": f"ssh root@{selected_droplet}",
-                "remote_directory": "/root/task",
-                "competencies": task_competencies
-            })
-        else:
-            print(f"  Task '{task_name}' partially deployed to {selected_droplet} (some steps failed)")
-            failed_deployments += 1
-            deployment_results.append({
-                "task_id": task_id,
-                "task_name": task_name,
-                "droplet_ip": selected_droplet,
-                "status": "partial",
-                "reason": f"run.sh: {'OK' if run_script_success else 'FAILED'}, db_update: {'OK' if db_update_success else 'FAILED'}",
-                "competencies": task_competencies
-            })
+    successful_deployments = sum(1 for result in deployment_results if result["status"] == "success")
+    failed_deployments = len(deployment_results) - successful_deployments
     
     # Step 4: Display final deployment summary
     print("\n" + "=" * 70)
@@ -1553,16 +1938,31 @@ def deploy_task_by_id(task_id: str, tasksession_id: Optional[str] = None, drople
     """
     Deploy a specific task by its task ID to a droplet.
     
+    Progress is reported to the task_deployment_jobs row of tasksession_id (if
+    given) by a background writer; terminal states are written before returning.
+    
     Args:
         task_id: The specific task ID to deploy
+        tasksession_id: Task session whose deployment job log receives progress updates
         droplet_ip: IP address of specific droplet to use (if None, auto-select)
         env: Environment ("dev" or "prod")
     
     Returns:
         True if deployment successful, False otherwise
     """
+    progress = DeploymentProgressReporter(tasksession_id, lambda: init_supabase(env))
+    try:
+        return _deploy_task_by_id(task_id, tasksession_id, droplet_ip, env, progress)
+    finally:
+        progress.close()
+
+def _deploy_task_by_id(task_id: str, tasksession_id: Optional[str], droplet_ip: Optional[str], env: str,
+                       progress: DeploymentProgressReporter) -> bool:
+    """Body of deploy_task_by_id; progress messages go through the given reporter."""
     
     logger.info(f" Searching for task with ID: {task_id}")
+    # Warm the droplet inventory while the deploy runs, so the final DB update doesn't wait on it
+    droplet_inventory.prefetch()
     
     # Step 1: Find the specific task by ID
     try:
@@ -1604,123 +2004,117 @@ def deploy_task_by_id(task_id: str, tasksession_id: Optional[str] = None, drople
             logger.info(f" No GitHub repository found for task: {task_name}")
             return False
 
-        if tasksession_id:  
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "GitHub Repository found for the task"}
-            }).eq("tasksession_id", tasksession_id).execute()
+        progress.update("STARTED", "GitHub Repository found for the task")
         
     except Exception as e:
         logger.info(f" Error finding task {task_id}: {str(e)}")
         return False
     
     # Step 2: Get droplet IP
+    prestaged = False
+    pool_claim = None
+    pool_config = load_pool_config()
     if droplet_ip:
         selected_droplet = droplet_ip
         logger.info(f" Using specified droplet: {selected_droplet}")
     else:
         logger.info(f" Getting available droplet IPs...")
 
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Getting available droplet IPs..."}
-            }).eq("tasksession_id", tasksession_id).execute()
+        progress.update("STARTED", "Getting available droplet IPs...")
         available_droplets = get_available_droplet_ips()
         if not available_droplets:
             logger.info(f" No droplet IPs configured in environment variable DIGITAL_OCEAN_IPS")
             return False
         
-        selected_droplet = select_best_droplet_ip(available_droplets)
+        # A warm pool droplet (ideally with this task already staged) beats a cold one
+        statuses = pool_status(available_droplets) if pool_config else None
+        pool_claim = claim_droplet(task, available_droplets, pool_config, statuses) if pool_config else None
+        if pool_claim:
+            selected_droplet, pool_marker = pool_claim
+            prestaged = pool_marker.get("state") == "staged" and pool_marker.get("task_id") == task_id
+            logger.info(f" Claimed warm pool droplet: {selected_droplet} (task {'pre-staged' if prestaged else 'not staged'})")
+            if not prestaged:
+                # Drop files of whichever task was staged there before
+                try:
+                    exit_status, _, stderr_data = ssh_connections.run(selected_droplet, "rm -rf /root/task")
+                    if exit_status != 0:
+                        raise RuntimeError(stderr_data.strip())
+                except Exception as e:
+                    progress.update("FAILED", f"Failed to clear /root/task on {selected_droplet}")
+                    logger.info(f" Failed to clear /root/task on {selected_droplet}: {str(e)}")
+                    return False
+        else:
+            # Reuse the pool probes instead of probing every droplet again
+            health_by_ip = {ip: status["health"] for ip, status in statuses.items()} if statuses is not None else None
+            selected_droplet = select_best_droplet_ip(available_droplets, health_by_ip)
         logger.info(f" Auto-selected droplet: {selected_droplet}")
         if not selected_droplet:
-            if tasksession_id:
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "FAILED", "message": "No available droplets found"}
-                }).eq("tasksession_id", tasksession_id).execute()
+            progress.update("FAILED", "No available droplets found")
             logger.info(f" No available droplets found")
             return False
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Droplet Selected"}
-            }).eq("tasksession_id", tasksession_id).execute()
+        progress.update("STARTED", "Droplet Selected")
+
+    if pool_config and not pool_claim:
+        # A droplet deployed outside claim_droplet is marked in-use before its files change
+        release_droplet(selected_droplet)
     
     # Step 3: Deploy the task
     
     try:
-        # Download files from GitHub
-        logger.info(f" Downloading files from GitHub repository...")
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Downloading files from GitHub repository..."}
-            }).eq("tasksession_id", tasksession_id).execute()
         local_dir = f"temp_deploy_{task_id}"
+        if prestaged:
+            # Files and images are already on the droplet; run.sh just starts the containers
+            logger.info(f" Task files already staged on {selected_droplet}; skipping download and upload")
+        else:
+            # Download files from GitHub
+            logger.info(f" Downloading files from GitHub repository...")
+            progress.update("STARTED", "Downloading files from GitHub repository...")
         
-        if not download_repo_files(github_repo_url, local_dir):
-            if tasksession_id:
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "FAILED", "message": "Failed to download files from GitHub repository"}
-                }).eq("tasksession_id", tasksession_id).execute()
-            logger.info(f" Failed to download files from GitHub repository")
-            return False
+            if not download_repo_files(github_repo_url, local_dir):
+                progress.update("FAILED", "Failed to download files from GitHub repository")
+                logger.info(f" Failed to download files from GitHub repository")
+                return False
         
-        logger.info(f" Files downloaded to: {local_dir}")
+            logger.info(f" Files downloaded to: {local_dir}")
         
-        # Upload files to droplet
-        logger.info(f" Uploading files to droplet: {selected_droplet}")
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Uploading files to droplet..."}
-            }).eq("tasksession_id", tasksession_id).execute()
+            # Upload files to droplet
+            logger.info(f" Uploading files to droplet: {selected_droplet}")
+            progress.update("STARTED", "Uploading files to droplet...")
         
-        if not upload_files_to_droplet(local_dir, selected_droplet):
-            if tasksession_id:
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "FAILED", "message": "Failed to upload files to droplet"}
-                }).eq("tasksession_id", tasksession_id).execute()
-            logger.info(f" Failed to upload files to droplet")
-            # Clean up local files
-            try:
-                shutil.rmtree(local_dir)
-            except:
-                pass
-            return False
+            if not upload_files_to_droplet(local_dir, selected_droplet):
+                progress.update("FAILED", "Failed to upload files to droplet")
+                logger.info(f" Failed to upload files to droplet")
+                # Clean up local files
+                try:
+                    shutil.rmtree(local_dir)
+                except:
+                    pass
+                return False
         
-        logger.info(f" Files uploaded to droplet")
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Files uploaded to droplet"}
-            }).eq("tasksession_id", tasksession_id).execute()
+            logger.info(f" Files uploaded to droplet")
+            progress.update("STARTED", "Files uploaded to droplet")
 
         # Execute run.sh script
         logger.info(f"  Executing run.sh script on droplet...")
-        if tasksession_id:
-            #update deployment log table with task id
-            supabase.table("task_deployment_jobs").update({
-                "log": {"status": "STARTED", "message": "Executing run.sh script on droplet..."}
-            }).eq("tasksession_id", tasksession_id).execute()
+        progress.update("STARTED", "Executing run.sh script on droplet...")
+        
+        # Mirror the last run.sh lines into the job log (coalesced by the reporter)
+        recent_output = deque(maxlen=20)
+        
+        def _mirror_output(stream: str, line: str) -> None:
+            recent_output.append(line)
+            progress.set_output(recent_output)
         
-        run_script_success = execute_run_script(selected_droplet)
+        run_script_success = execute_run_script(selected_droplet, on_output=_mirror_output if progress.enabled else None)
         if not run_script_success:
-            if tasksession_id:
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "FAILED", "message": "Failed to execute run.sh script"}
-                }).eq("tasksession_id", tasksession_id).execute()
+            progress.update("FAILED", "Failed to execute run.sh script")
             logger.info(f" Failed to execute run.sh script")
             logger.info(f"   Files are uploaded but run.sh failed")
             # Do not update database if run.sh fails
             db_update_success = False
         else:
             logger.info(f" run.sh executed successfully")
-            if tasksession_id:
-                #update deployment log table with task id
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "STARTED", "message": "run.sh executed successfully"}
-                }).eq("tasksession_id", tasksession_id).execute()
+            progress.update("STARTED", "run.sh executed successfully")
             # Only update database if run.sh succeeds
             db_update_success = update_task_deployment_status(task_id, selected_droplet, env)
             if not db_update_success:
@@ -1730,31 +2124,24 @@ def deploy_task_by_id(task_id: str, tasksession_id: Optional[str] = None, drople
                 logger.info(f" Database updated successfully")
         
         # Clean up local files
-        try:
-            shutil.rmtree(local_dir)
-            logger.info(f" Cleaned up local files")
-        except Exception as e:
-            logger.info(f" Failed to clean up local files: {str(e)}")
+        if not prestaged:
+            try:
+                shutil.rmtree(local_dir)
+                logger.info(f" Cleaned up local files")
+            except Exception as e:
+                logger.info(f" Failed to clean up local files: {str(e)}")
         
         # Determine if deployment was successful
         if run_script_success and db_update_success:
             logger.info(f"\n Task '{task_name}' deployed successfully to {selected_droplet}")
             logger.info(f"   SSH access: ssh root@{selected_droplet}")
             logger.info(f"   Remote directory: /root/task")
-            if tasksession_id:
-                #update deployment log table with task id
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "STARTED", "message": "Task deployed successfully to {selected_droplet}"}
-                }).eq("tasksession_id", tasksession_id).execute()
+            progress.update("STARTED", f"Task deployed successfully to {selected_droplet}")
 
             # schedule task after everything is done
 
             logger.info(f"DEPLOYMENT DONE, back to scheduling")
-            if tasksession_id:
-                #update deployment log table with task id
-                supabase.table("task_deployment_jobs").update({
-                    "log": {"status": "STARTED", "message": "Scheduling your task..."}
-                }).eq("tasksession_id", tasksession_id).execute()
+            progress.update("STARTED", "Scheduling your task...")
             server_id = None
             task_blobs = []
         
@@ -1818,11 +2205,7 @@ def deploy_task_by_id(task_id: str, tasksession_id: Optional[str] = None, drople
 
                 report = response.data[0] if response.data else None
                 logger.info(f"\n *** Task blob added: {report['tasksession_id']}\n")
-                if tasksession_id:
-                    #update deployment log table with task id
-                    supabase.table("task_deployment_jobs").update({
-                        "log": {"status": "COMPLETED", "message": "Task ready"}
-                    }).eq("tasksession_id", tasksession_id).execute()
+                progress.update("COMPLETED", "Task ready")
             except Exception as e:
                 logger.error(f"Error adding task blob: {str(e)}")
             return True
@@ -1888,7 +2271,9 @@ def generate_answer_code_and_steps(task_data: Dict) -> Dict:
         ]
         
         # Use Responses API with reasoning and structured JSON output
-        response = openai_client.responses.create(
+        response = cached_responses_create(
+            openai_client,
+            accept=has_json_output,
             model=model,
             input=messages,
             reasoning={"effort": "medium"},
@@ -1985,6 +2370,8 @@ def upload_answer_files_to_repo(repo_name: str, answer_code_data: Dict):
 if __name__ == "__main__":
     cli = click.Group()
     cli.add_command(generate_tasks)
+    cli.add_command(generate_tasks_batch)
     cli.add_command(deploy_task)
     cli.add_command(reset_task)
+    cli.add_command(warm_pool)
     cli()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import json
 from typing import Dict
 from logger_config import logger
+from rate_limiter import rate_limited_call, estimate_tokens
 
 def clean_llm_json_response(response: str) -> str:
     """Clean LLM response to extract valid JSON"""
@@ -99,7 +100,7 @@ def llm_task_eval(task_json: Dict, proficiency: str, yoe: str, time_constraint:
 
     for attempt in range(1, MAX_EVAL_RETRIES + 1):
         try:
-            response = openai_client.chat.completions.create(
+            request = dict(
                 model=model,
                 # JSON mode – model will try to return strict JSON
                 response_format={"type": "json_object"},
@@ -120,6 +121,11 @@ def llm_task_eval(task_json: Dict, proficiency: str, yoe: str, time_constraint:
                     },
                 ],
             )
+            response = rate_limited_call(
+                model,
+                lambda: openai_client.chat.completions.create(**request),
+                estimate_tokens(request),
+            )
 
             raw_response = response.choices[0].message.content
             logger.info(f"Raw LLM task eval response (attempt {attempt}): {raw_response[:200]}...")
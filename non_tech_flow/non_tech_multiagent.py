@@ -8,7 +8,7 @@ import sys
 from typing import Dict, List
 from dotenv import load_dotenv
 from datetime import datetime, timezone
-from supabase import Client, create_client
+from supabase import Client
 
 # Try to import OpenAI - if not available, we'll handle it gracefully
 try:
@@ -26,6 +26,8 @@ except ImportError:
 sys.path.append(str(Path(__file__).parent.parent))
 
 from logger_config import logger
+from supabase_client import get_supabase, insert_task_with_competencies
+from rate_limiter import create_gateway_client
 
 # Local test imports
 from test_utils import (
@@ -46,14 +48,7 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 if OPENAI_AVAILABLE and OPENAI_API_KEY:
-    openai_client = openai.OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=PORTKEY_GATEWAY_URL,
-        default_headers=createHeaders(
-            provider="openai",
-            api_key=os.environ.get("PORTKEY_API_KEY")
-        )
-    )
+    openai_client = create_gateway_client(OPENAI_API_KEY)
 else:
     openai_client = None
     
@@ -86,18 +81,8 @@ def validate_environment() -> None:
 validate_environment()
 
 def init_supabase(env: str = "dev") -> Client:
-    """Initialize Supabase client based on environment."""
-    if env == "dev":
-        url = os.getenv("SUPABASE_URL_APTITUDETESTSDEV")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTSDEV")
-    else:
-        url = os.getenv("SUPABASE_URL_APTITUDETESTS")
-        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTS")
-    
-    if not url or not key:
-        raise ValueError(f"Missing Supabase credentials for environment: {env}")
-    
-    return create_client(url, key)
+    """Return the shared Supabase client for the environment (see supabase_client)."""
+    return get_supabase(env)
 
 
 def create_test_task(competency_file: Path, background_file: Path, scenarios_file: Path = None, env: str = "dev") -> Dict:
@@ -215,30 +200,19 @@ def create_test_task(competency_file: Path, background_file: Path, scenarios_fil
             # Convert all empty strings to None
             task_data_for_db = convert_empty_to_none(task_data_for_db)
             
-            # Insert into Supabase 
+            # Insert the task and its task-competency links together (rolled back on failure)
             logger.info(f"Inserting task into Supabase: {task_id}")
-            result = supabase.table("tasks").insert(task_data_for_db).execute()
-            
-            if not result.data:
-                logger.error("Failed to insert task into Supabase")
+            try:
+                supabase_task = insert_task_with_competencies(
+                    supabase, task_data_for_db, [criteria.get("competency_id") for criteria in criterias_for_db]
+                )
+            except Exception as e:
+                logger.error(f"Failed to insert task into Supabase: {str(e)}")
                 continue
             
             # Get the task_id from Supabase response
-            supabase_task = result.data[0]
             db_task_id = supabase_task.get("id") or supabase_task.get("task_id")
             
-            # Insert task-competency relationships
-            for criteria in criterias_for_db:
-                competency_id_for_relationship = criteria.get("competency_id")
-                if competency_id_for_relationship:
-                    try:
-                        supabase.table("task_competencies").insert({
-                            "task_id": db_task_id,
-                            "competency_id": competency_id_for_relationship
-                        }).execute()
-                    except Exception as e:
-                        logger.error(f"Failed to insert task-competency relationship: {str(e)}")
-            
             # Save task data locally for reference
             task_data["task_id"] = db_task_id
             save_task_data_only(db_task_id, task_data)
@@ -7,6 +7,7 @@ import sys
 from typing import Optional
 from datetime import datetime
 from logger_config import logger
+from rate_limiter import rate_limited_responses_create
 from models import TaskResponse
 
 # Add parent directory to path for logger and imports
@@ -307,7 +308,8 @@ def generate_task_with_code(openai_client, input_data: Dict) -> Dict:
         response = None
         for prompt in task_generation_prompts:
             messages.append({"role": "user", "content": prompt})
-            response = openai_client.responses.create(
+            response = rate_limited_responses_create(
+                openai_client,
                 model=model,
                 input=messages,
                 reasoning={"effort": "medium"}
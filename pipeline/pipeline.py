@@ -15,7 +15,11 @@ level — all competencies are processed together at that level each time.
 
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Callable
 
 import click
 
@@ -23,8 +27,9 @@ from generate_input_files.generator import (
     init_supabase,
     init_openai_client,
     fetch_competencies_from_db,
-    generate_role_context,
-    generate_questions_prompt,
+    competency_catalogue,
+    generate_background_fields,
+    BACKGROUND_FIELDS,
     sanitize_folder_name,
     resolve_output_folder,
     write_json_safe,
@@ -53,6 +58,13 @@ def _parse_multi_option(raw_values: tuple) -> list[str]:
     return result
 
 
+def _buffered_echo(lines: list) -> Callable[..., None]:
+    """An echo replacement that collects (message, err) pairs instead of printing."""
+    def echo(message: str = "", err: bool = False):
+        lines.append((message, err))
+    return echo
+
+
 def _run_single_proficiency(
     *,
     names: list[str],
@@ -66,25 +78,30 @@ def _run_single_proficiency(
     supabase,
     openai_client,
     global_usage: dict,
+    usage_lock=None,
+    echo: Callable[..., None] = click.echo,
 ):
     """Run the full pipeline for all competencies at one proficiency level.
 
-    Mutates `global_usage` in-place to accumulate token usage across runs.
+    Mutates `global_usage` in-place to accumulate token usage across runs
+    (under `usage_lock` when runs share it from several threads). All console
+    output goes through `echo`, so parallel runs can buffer theirs.
     Returns number of scenarios generated.
     """
 
     def _track(model: str, usage: dict):
-        if model not in global_usage:
-            global_usage[model] = {"input_tokens": 0, "output_tokens": 0}
-        global_usage[model]["input_tokens"] += usage["input_tokens"]
-        global_usage[model]["output_tokens"] += usage["output_tokens"]
+        with usage_lock or nullcontext():
+            if model not in global_usage:
+                global_usage[model] = {"input_tokens": 0, "output_tokens": 0}
+            global_usage[model]["input_tokens"] += usage["input_tokens"]
+            global_usage[model]["output_tokens"] += usage["output_tokens"]
 
     # ── Step 1: Fetch competencies ──────────────────────────────────────
-    click.echo(f"\n  Fetching from Supabase at {proficiency} level...")
+    echo(f"\n  Fetching from Supabase at {proficiency} level...")
     competency_data = []
     for comp_name in names:
         rows = fetch_competencies_from_db(supabase, comp_name, proficiency)
-        click.echo(f"    Found {len(rows)} row(s) for '{comp_name}' ({proficiency}).")
+        echo(f"    Found {len(rows)} row(s) for '{comp_name}' ({proficiency}).")
         for c in rows:
             competency_data.append({
                 "competency_id": c["competency_id"],
@@ -94,7 +111,7 @@ def _run_single_proficiency(
                 "name": c["name"],
                 "scope": c["scope"],
             })
-    click.echo(f"    Total: {len(competency_data)} competency row(s).")
+    echo(f"    Total: {len(competency_data)} competency row(s).")
 
     # ── Step 2: Generate background via LLM ────────────────────────────
     yoe = PROFICIENCY_YOE_MAP.get(proficiency, "1-2")
@@ -104,32 +121,19 @@ def _run_single_proficiency(
         f"[{c['name']} ({c['proficiency']})]\n{c['scope']}" for c in competency_data
     )
 
-    click.echo("  Generating background via LLM...")
-    try:
-        role_context, usage = generate_role_context(
-            openai_client, combined_scope, combined_name, proficiency, yoe
-        )
+    echo("  Generating background via LLM...")
+    fields, usage, errors = generate_background_fields(
+        openai_client, combined_scope, combined_name, proficiency, yoe
+    )
+    if len(errors) < len(BACKGROUND_FIELDS):
         _track(INPUT_GEN_MODEL, usage)
-        click.echo("    role_context generated.")
-    except Exception as e:
-        click.echo(f"    WARNING: Failed to generate role_context: {e}. Using fallback.")
-        role_context = (
-            f"A software engineer with {yoe} years of experience in {combined_name} "
-            f"is expected to work at the {proficiency} proficiency level."
-        )
-
-    try:
-        questions_prompt, usage = generate_questions_prompt(
-            openai_client, combined_scope, combined_name, proficiency, yoe
-        )
-        _track(INPUT_GEN_MODEL, usage)
-        click.echo("    questions_prompt generated.")
-    except Exception as e:
-        click.echo(f"    WARNING: Failed to generate questions_prompt: {e}. Using fallback.")
-        questions_prompt = (
-            f"Please ensure the questions cover the key areas of {combined_name} "
-            f"at the {proficiency} level as described in the competency scope."
-        )
+    for field in BACKGROUND_FIELDS:
+        if field in errors:
+            echo(f"    WARNING: Failed to generate {field}: {errors[field]}. Using fallback.")
+        else:
+            echo(f"    {field} generated.")
+    role_context = fields["role_context"]
+    questions_prompt = fields["questions_prompt"]
 
     background_data = {
         "organization": HARDCODED_ORGANIZATION,
@@ -150,17 +154,17 @@ def _run_single_proficiency(
     comp_path = output_dir / comp_filename
     bg_path = output_dir / bg_filename
 
-    click.echo(f"  Output directory: {output_dir}")
+    echo(f"  Output directory: {output_dir}")
 
     if dry_run:
-        click.echo("  [DRY RUN] Skipping input file writes.")
-        click.echo("  Competency JSON preview:")
-        click.echo(json.dumps(competency_data, indent=2, ensure_ascii=False)[:800])
-        click.echo("  Background JSON preview:")
-        click.echo(json.dumps(background_data, indent=2, ensure_ascii=False)[:800])
+        echo("  [DRY RUN] Skipping input file writes.")
+        echo("  Competency JSON preview:")
+        echo(json.dumps(competency_data, indent=2, ensure_ascii=False)[:800])
+        echo("  Background JSON preview:")
+        echo(json.dumps(background_data, indent=2, ensure_ascii=False)[:800])
     else:
         os.makedirs(output_dir, exist_ok=True)
-        click.echo("  Writing input files...")
+        echo("  Writing input files...")
         write_json_safe(comp_path, competency_data, force)
         write_json_safe(bg_path, background_data, force)
 
@@ -168,9 +172,9 @@ def _run_single_proficiency(
     scenario_key = build_scenario_key(competency_data)
     target_file = Path(scenario_output) if scenario_output else get_target_scenario_file(competency_data)
 
-    click.echo(f"  Scenario key:  {scenario_key}")
-    click.echo(f"  Target file:   {target_file}")
-    click.echo(f"  Generating {count} scenarios...")
+    echo(f"  Scenario key:  {scenario_key}")
+    echo(f"  Target file:   {target_file}")
+    echo(f"  Generating {count} scenarios...")
 
     scenarios, scenario_usage = generate_scenarios_for_competencies(
         openai_client=openai_client,
@@ -182,23 +186,23 @@ def _run_single_proficiency(
         _track(model, usage)
 
     if not scenarios:
-        click.echo("  WARNING: No scenarios were generated for this run.", err=True)
+        echo("  WARNING: No scenarios were generated for this run.", err=True)
         return 0
 
     # Display
-    click.echo(f"\n  {'='*66}")
-    click.echo(f"  Generated {len(scenarios)} scenarios for: {scenario_key}")
-    click.echo(f"  {'='*66}")
+    echo(f"\n  {'='*66}")
+    echo(f"  Generated {len(scenarios)} scenarios for: {scenario_key}")
+    echo(f"  {'='*66}")
     for i, s in enumerate(scenarios, 1):
-        click.echo(f"\n  --- Scenario {i} ---")
-        click.echo(f"  {s}")
+        echo(f"\n  --- Scenario {i} ---")
+        echo(f"  {s}")
 
     # Save
     if not dry_run:
         save_generated_scenarios(scenarios, scenario_key, target_file, append=append)
-        click.echo(f"\n  Saved to: {target_file} (key: '{scenario_key}', append={append})")
+        echo(f"\n  Saved to: {target_file} (key: '{scenario_key}', append={append})")
     else:
-        click.echo("\n  [DRY RUN] Scenarios not saved.")
+        echo("\n  [DRY RUN] Scenarios not saved.")
 
     return len(scenarios)
 
@@ -246,7 +250,12 @@ def _run_single_proficiency(
     type=click.Path(),
     help="Override scenario output file path",
 )
-def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run, env, scenario_output):
+@click.option(
+    "--max-parallel", default=1,
+    type=click.IntRange(min=1),
+    help="Proficiency levels to run concurrently (default: 1 = one after another). Output is grouped per level.",
+)
+def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run, env, scenario_output, max_parallel):
     """Unified pipeline: generate input files + task scenarios in one command.
 
     \b
@@ -262,6 +271,9 @@ def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run,
     Multiple flags form:
         python -m pipeline --name "Pandas" --name "Numpy" \\
                            --proficiency BASIC --proficiency INTERMEDIATE --count 2
+
+    All levels at once (each level's output is printed as one block when it finishes):
+        python -m pipeline --name "Pandas,Numpy" --proficiency BASIC,INTERMEDIATE --count 2 --max-parallel 2
     """
     # ── Parse names ─────────────────────────────────────────────────────
     names = _parse_multi_option(name)
@@ -285,6 +297,9 @@ def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run,
     click.echo(f"Proficiencies:  {', '.join(proficiencies)}")
     click.echo(f"Scenarios/run:  {count}")
     click.echo(f"Total runs:     {len(proficiencies)}")
+    workers = min(max_parallel, len(proficiencies))
+    if workers > 1:
+        click.echo(f"Parallel runs:  {workers}")
     click.echo(f"Environment:    {env}")
     if dry_run:
         click.echo("Mode:           DRY RUN (no files will be written)")
@@ -292,19 +307,22 @@ def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run,
     # ── Init shared clients ─────────────────────────────────────────────
     supabase = init_supabase(env)
     click.echo("\nConnected to Supabase.")
+    # One query for every name at every level; each run's lookups are then served from the cache
+    competency_catalogue.fetch(supabase, names, proficiencies)
     openai_client = init_openai_client()
 
     # Unified usage accumulator across all runs
     global_usage: dict = {}
+    usage_lock = threading.Lock()
     total_generated = 0
+    failed: list[str] = []
 
-    # ── Run pipeline once per proficiency level ─────────────────────────
-    for run_idx, prof in enumerate(proficiencies, 1):
-        click.echo(f"\n{'─'*70}")
-        click.echo(f"  RUN {run_idx}/{len(proficiencies)}: {', '.join(names)} at {prof}")
-        click.echo(f"{'─'*70}")
+    def _run_level(run_idx: int, prof: str, echo: Callable[..., None]) -> int:
+        echo(f"\n{'─'*70}")
+        echo(f"  RUN {run_idx}/{len(proficiencies)}: {', '.join(names)} at {prof}")
+        echo(f"{'─'*70}")
 
-        generated = _run_single_proficiency(
+        return _run_single_proficiency(
             names=names,
             proficiency=prof,
             count=count,
@@ -316,8 +334,36 @@ def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run,
             supabase=supabase,
             openai_client=openai_client,
             global_usage=global_usage,
+            usage_lock=usage_lock,
+            echo=echo,
         )
-        total_generated += generated
+
+    if workers == 1:
+        # ── Run pipeline once per proficiency level ─────────────────────
+        for run_idx, prof in enumerate(proficiencies, 1):
+            total_generated += _run_level(run_idx, prof, click.echo)
+    else:
+        # ── Run all levels concurrently, printing each level's output as one block ──
+        def _run_buffered(run_idx: int, prof: str):
+            lines = []
+            try:
+                return _run_level(run_idx, prof, _buffered_echo(lines)), lines, None
+            except Exception as e:
+                return 0, lines, e
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline") as executor:
+            futures = {
+                executor.submit(_run_buffered, run_idx, prof): prof
+                for run_idx, prof in enumerate(proficiencies, 1)
+            }
+            for future in as_completed(futures):
+                generated, lines, error = future.result()
+                for message, err in lines:
+                    click.echo(message, err=err)
+                if error is not None:
+                    click.echo(f"  ERROR: Run at {futures[future]} failed: {error}", err=True)
+                    failed.append(futures[future])
+                total_generated += generated
 
     # ── Unified cost summary across all runs ────────────────────────────
     click.echo(f"\n{'='*70}")
@@ -326,3 +372,6 @@ def run_pipeline(name, proficiency, count, append, folder_name, force, dry_run,
 
     runs_label = f"{len(proficiencies)} run(s)" if len(proficiencies) > 1 else "1 run"
     click.echo(f"\nDone. {total_generated} scenario(s) generated across {runs_label}.")
+
+    if failed:
+        raise click.ClickException(f"Run(s) failed at: {', '.join(failed)}")
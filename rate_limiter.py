@@ -0,0 +1,376 @@
+"""
+Per-model rate limiting and retry for every LLM call in the repo.
+
+Each model family (gpt-5.1, gpt-5-nano, ...) gets two token buckets: one for
+requests per minute and one for tokens per minute. A call reserves one request
+plus an estimate of its tokens before it is sent, and the estimate is corrected
+with the real usage once the response arrives. Throttling responses (429) and
+transient server errors are retried with exponential backoff and full jitter,
+honouring the provider's retry-after headers; a 429 also pauses every other
+caller of the same model so the whole process backs off together.
+
+Clients built with create_gateway_client leave retries to this module, so
+the SDK's own retries never stack on top of these. Inside a call_deadline
+block every request, wait and retry ends by the deadline. Works for both
+threads (rate_limited_call) and asyncio (arate_limited_call).
+
+Configuration (environment variables):
+    LLM_RATE_LIMITS       JSON overrides, e.g. {"gpt-5.1": {"tpm": 800000, "rpm": 500}}
+    LLM_MAX_RETRIES       Retries per call after the first attempt (default: 5)
+    LLM_BACKOFF_BASE      Initial backoff in seconds (default: 1)
+    LLM_BACKOFF_MAX       Backoff ceiling in seconds (default: 60)
+"""
+
+import asyncio
+import contextvars
+import datetime
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from logger_config import logger
+
+T = TypeVar("T")
+
+# Limits per model family; the longest matching prefix of the model name wins
+DEFAULT_MODEL_LIMITS = {
+    "gpt-5.1": {"tpm": 500_000, "rpm": 500},
+    "gpt-5-nano": {"tpm": 2_000_000, "rpm": 5_000},
+    "default": {"tpm": 200_000, "rpm": 500},
+}
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Output tokens reserved up front for a call; corrected from usage afterwards
+ESTIMATED_OUTPUT_TOKENS = 2_000
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _load_model_limits() -> Dict[str, Dict[str, int]]:
+    limits = {family: dict(values) for family, values in DEFAULT_MODEL_LIMITS.items()}
+    overrides = os.getenv("LLM_RATE_LIMITS")
+    if overrides:
+        try:
+            for family, values in json.loads(overrides).items():
+                limits.setdefault(family, dict(DEFAULT_MODEL_LIMITS["default"])).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid LLM_RATE_LIMITS: {str(e)}")
+    return limits
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at capacity per minute.
+
+    reserve() never blocks; it debits the bucket (possibly into debt) and
+    returns how long the caller must wait before its reservation is covered.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        # A single request larger than a whole minute of quota can still go through once the bucket is full
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Credit (negative delta) or debit (positive delta) the bucket after the fact."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ModelRateLimiter:
+    """Request and token budgets for one model family, plus a shared throttle pause."""
+
+    def __init__(self, family: str, tpm: int, rpm: int):
+        self.family = family
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Reserve capacity for one call and return the seconds to wait before sending it."""
+        with self._lock:
+            pause = max(0.0, self._paused_until - time.monotonic())
+        return max(pause, self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket with the real usage of a finished call."""
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - min(estimated_tokens, self.tokens.capacity))
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller of this model for the given time (after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_model_limits = _load_model_limits()
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _model_family(model: str) -> str:
+    matches = [family for family in _model_limits if family != "default" and model.startswith(family)]
+    return max(matches, key=len) if matches else "default"
+
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    """Return the shared limiter for the family of the given model."""
+    family = _model_family(model or "")
+    with _limiters_lock:
+        limiter = _limiters.get(family)
+        if limiter is None:
+            limits = _model_limits[family]
+            limiter = ModelRateLimiter(family, tpm=limits["tpm"], rpm=limits["rpm"])
+            _limiters[family] = limiter
+        return limiter
+
+
+def configure_model_limits(family: str, tpm: int, rpm: int) -> None:
+    """Set the TPM/RPM budget of a model family (replaces its limiter)."""
+    if tpm < 1 or rpm < 1:
+        raise ValueError(f"Rate limits for '{family}' must be >= 1, got tpm={tpm} rpm={rpm}")
+    with _limiters_lock:
+        _model_limits[family] = {"tpm": tpm, "rpm": rpm}
+        _limiters.pop(family, None)
+    logger.info(f"Rate limits for {family}: {tpm} TPM, {rpm} RPM")
+
+
+def estimate_tokens(request: Dict) -> int:
+    """Rough token estimate for a request: ~4 characters per input token plus an output allowance."""
+    payload = request.get("input", request.get("messages", ""))
+    chars = len(payload) if isinstance(payload, str) else len(json.dumps(payload, ensure_ascii=False, default=str))
+    return chars // 4 + ESTIMATED_OUTPUT_TOKENS
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    total = getattr(usage, "total_tokens", None)
+    if total is not None:
+        return total
+    # Responses API uses input/output, Chat Completions uses prompt/completion
+    return (getattr(usage, "input_tokens", 0) or getattr(usage, "prompt_tokens", 0) or 0) + \
+           (getattr(usage, "output_tokens", 0) or getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # Connection drops and timeouts carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read retry-after-ms / retry-after (seconds or HTTP date) from an API error."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            # Malformed header: fall back to plain backoff
+            return None
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return max(0.0, parsed.timestamp() - time.time())
+    return None
+
+
+def _backoff_seconds(attempt: int, error: Exception) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's retry-after."""
+    backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    retry_after = _retry_after_seconds(error)
+    return max(backoff, retry_after) if retry_after is not None else backoff
+
+
+def _on_failure(limiter: ModelRateLimiter, model: str, attempt: int, error: Exception) -> float:
+    delay = _backoff_seconds(attempt, error)
+    if _status_code(error) == 429:
+        limiter.pause(delay)
+    logger.warning(f"LLM call to {model} failed ({type(error).__name__}: {str(error)[:200]}); "
+                   f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
+
+# time.monotonic() by which calls in the current context must give up
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_call_deadline", default=None)
+
+
+@contextmanager
+def call_deadline(deadline: float) -> Iterator[None]:
+    """
+    Bound every rate-limited call in the block by a time.monotonic() deadline.
+
+    Requests get the remaining time as their HTTP timeout, and a limiter wait
+    or retry that would end past the deadline raises TimeoutError instead.
+    """
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _time_left() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _sleep_before_deadline(seconds: float, model: str) -> None:
+    left = _time_left()
+    if left is not None and seconds >= left:
+        raise TimeoutError(f"LLM call to {model} would not finish before its deadline")
+    time.sleep(seconds)
+
+
+async def _asleep_before_deadline(seconds: float, model: str) -> None:
+    left = _time_left()
+    if left is not None and seconds >= left:
+        raise TimeoutError(f"LLM call to {model} would not finish before its deadline")
+    await asyncio.sleep(seconds)
+
+
+def rate_limited_call(model: str, call: Callable[[], T], estimated_tokens: int) -> T:
+    """
+    Run a blocking LLM call within the model's rate limits, retrying throttled/transient failures.
+
+    Args:
+        model: Model name, used to pick the limiter
+        call: Zero-argument function that performs the API request
+        estimated_tokens: Up-front token estimate (see estimate_tokens)
+    """
+    limiter = get_rate_limiter(model)
+    attempt = 0
+    while True:
+        wait = limiter.reserve(estimated_tokens)
+        try:
+            if wait > 0:
+                _sleep_before_deadline(wait, model)
+            response = call()
+        except Exception as e:
+            limiter.settle(estimated_tokens, 0)
+            if attempt >= MAX_RETRIES or not _is_retryable(e):
+                raise
+            _sleep_before_deadline(_on_failure(limiter, model, attempt, e), model)
+            attempt += 1
+            continue
+        limiter.settle(estimated_tokens, _usage_tokens(response))
+        return response
+
+
+async def arate_limited_call(model: str, call: Callable[[], Awaitable[T]], estimated_tokens: int) -> T:
+    """Async counterpart of rate_limited_call; call returns a fresh awaitable per attempt."""
+    limiter = get_rate_limiter(model)
+    attempt = 0
+    while True:
+        wait = limiter.reserve(estimated_tokens)
+        try:
+            if wait > 0:
+                await _asleep_before_deadline(wait, model)
+            response = await call()
+        except Exception as e:
+            limiter.settle(estimated_tokens, 0)
+            if attempt >= MAX_RETRIES or not _is_retryable(e):
+                raise
+            await _asleep_before_deadline(_on_failure(limiter, model, attempt, e), model)
+            attempt += 1
+            continue
+        limiter.settle(estimated_tokens, _usage_tokens(response))
+        return response
+
+
+def rate_limited_responses_create(client, **request) -> Any:
+    """client.responses.create(**request) under the shared rate limits."""
+    def _create():
+        left = _time_left()
+        if left is None:
+            return client.responses.create(**request)
+        if left <= 0:
+            raise TimeoutError(f"LLM call to {request.get('model', '')} reached its deadline")
+        return client.with_options(timeout=left).responses.create(**request)
+
+    return rate_limited_call(request.get("model", ""), _create, estimate_tokens(request))
+
+
+async def arate_limited_responses_create(client, **request) -> Any:
+    """Async client.responses.create(**request) under the shared rate limits."""
+    def _create():
+        left = _time_left()
+        if left is None:
+            return client.responses.create(**request)
+        if left <= 0:
+            raise TimeoutError(f"LLM call to {request.get('model', '')} reached its deadline")
+        return client.with_options(timeout=left).responses.create(**request)
+
+    return await arate_limited_call(request.get("model", ""), _create, estimate_tokens(request))
+
+
+def create_gateway_client(api_key: Optional[str] = None):
+    """
+    OpenAI client on the Portkey gateway for use with rate_limited_call.
+
+    The SDK's own retries are disabled so that 429s and transient errors are
+    retried only here, against the shared per-model budgets.
+
+    Args:
+        api_key: OpenAI API key (default: OPENAI_API_KEY)
+    """
+    import openai
+    from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
+
+    return openai.OpenAI(
+        max_retries=0,
+        api_key=api_key or os.getenv("OPENAI_API_KEY"),
+        base_url=PORTKEY_GATEWAY_URL,
+        default_headers=createHeaders(
+            provider="openai",
+            api_key=os.getenv("PORTKEY_API_KEY"),
+        ),
+    )
@@ -0,0 +1,90 @@
+"""
+Benchmark ScenarioIndex against the linear difflib dedup path.
+
+Indexes most of the existing scenario files, then queries both paths with the
+held-out scenarios (fresh, should pass) and perturbed copies of indexed ones
+(truncated, sentence-shuffled or word-edited; mostly duplicates). Reports
+timings and any query where the two paths disagree.
+
+Usage:
+    python -m scenario_generator.benchmark_dedup [--near-duplicates 200] [--seed 7]
+"""
+
+import json
+import random
+import time
+from pathlib import Path
+
+import click
+
+from scenario_generator.dedup import SIMILARITY_THRESHOLD, ScenarioIndex, find_duplicate_difflib
+from scenario_generator.generator import load_all_existing_scenarios
+
+DEFAULT_SCENARIO_DIR = Path(__file__).parent.parent / "task_input_files" / "task_scenarios"
+
+
+def _perturb(scenario: str, rng: random.Random) -> str:
+    """A near-duplicate of scenario, the kind of rewrite an LLM tends to repeat."""
+    kind = rng.choice(["truncate", "shuffle", "edit"])
+    if kind == "truncate":
+        return scenario[:int(len(scenario) * rng.uniform(0.5, 0.95))]
+    if kind == "shuffle":
+        sentences = scenario.split(". ")
+        rng.shuffle(sentences)
+        return ". ".join(sentences)
+    words = scenario.split()
+    for i in range(len(words)):
+        if rng.random() < rng.uniform(0.05, 0.4):
+            words[i] = rng.choice(words)
+    return " ".join(words)
+
+
+@click.command()
+@click.option("--scenario-dir", type=click.Path(exists=True, file_okay=False), default=str(DEFAULT_SCENARIO_DIR),
+              help="Directory of task scenario JSON files")
+@click.option("--holdout", default=0.2, type=float, help="Fraction of scenarios queried as fresh (default: 0.2)")
+@click.option("--near-duplicates", default=200, type=int, help="Perturbed copies to query (default: 200)")
+@click.option("--seed", default=7, type=int, help="Random seed")
+def benchmark(scenario_dir, holdout, near_duplicates, seed):
+    """Compare indexed and linear difflib scenario dedup on the scenario files."""
+    rng = random.Random(seed)
+    scenarios = [s for s in load_all_existing_scenarios(sorted(Path(scenario_dir).glob("*.json")))
+                 if isinstance(s, str)]
+    if len(scenarios) < 2:
+        raise click.ClickException(f"Need at least 2 scenarios in {scenario_dir}, found {len(scenarios)}")
+    rng.shuffle(scenarios)
+    split = max(1, int(len(scenarios) * (1 - holdout)))
+    indexed, fresh = scenarios[:split], scenarios[split:]
+    queries = fresh + [_perturb(rng.choice(indexed), rng) for _ in range(near_duplicates)]
+
+    start = time.perf_counter()
+    index = ScenarioIndex(indexed)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear = [find_duplicate_difflib(q, indexed, SIMILARITY_THRESHOLD) is not None for q in queries]
+    linear_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed_results = [index.find_duplicate(q) is not None for q in queries]
+    indexed_seconds = time.perf_counter() - start
+
+    disagreements = [i for i, (a, b) in enumerate(zip(linear, indexed_results)) if a != b]
+    click.echo(json.dumps({
+        "indexed_scenarios": len(indexed),
+        "queries": len(queries),
+        "fresh_queries": len(fresh),
+        "duplicates_difflib": sum(linear),
+        "duplicates_index": sum(indexed_results),
+        "disagreements": len(disagreements),
+        "index_build_ms": round(build_seconds * 1000, 1),
+        "difflib_ms_per_query": round(linear_seconds * 1000 / len(queries), 2),
+        "index_ms_per_query": round(indexed_seconds * 1000 / len(queries), 2),
+        "speedup": round(linear_seconds / indexed_seconds, 1) if indexed_seconds else None,
+    }, indent=2))
+    for i in disagreements:
+        click.echo(f"difflib={'duplicate' if linear[i] else 'unique'} index={'duplicate' if indexed_results[i] else 'unique'}: {queries[i][:80]}...")
+
+
+if __name__ == "__main__":
+    benchmark()
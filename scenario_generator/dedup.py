@@ -0,0 +1,160 @@
+"""
+Near-duplicate detection for generated scenarios.
+
+check_similarity compares a new scenario against every existing one with
+difflib.SequenceMatcher, which is quadratic per pair and runs in pure Python
+against 200+ long scenarios for every candidate on every attempt. ScenarioIndex
+keeps the same decision (ratio > threshold on lowercased text) but only runs
+difflib on a shortlist:
+
+1. Every scenario is embedded once as an IDF-weighted, L2-normalised vector of
+   hashed character 4-grams, stored as a row of a NumPy matrix.
+2. A query is a single dense matrix-vector product; rows with cosine similarity
+   of at least CANDIDATE_MIN_COSINE are shortlisted, most similar first.
+3. Each shortlisted pair is verified with difflib, behind its cheap exact upper
+   bounds (real_quick_ratio, quick_ratio).
+4. Before a scenario is accepted, the RECHECK_TOP nearest rows not yet verified
+   are re-checked with find_duplicate_difflib.
+
+A query is still O(N * HASH_DIMENSIONS), i.e. linear in the corpus size; the
+gain over check_similarity is a constant factor, because the per-row work is
+one multiply-add in NumPy and difflib only runs on a handful of rows.
+
+Verification is exact, so the index never rejects a scenario difflib would
+accept. The opposite is not guaranteed: a duplicate whose cosine falls below
+the cut-off and outside the RECHECK_TOP nearest rows is accepted. On
+near-duplicates derived from the shipped scenario files, every pair difflib
+scores above 0.6 had a cosine of 0.64 or more and the benchmark found no
+disagreements, but that is a property of that corpus, not of the method.
+Run `python -m scenario_generator.benchmark_dedup` to compare both paths.
+"""
+
+import difflib
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SIMILARITY_THRESHOLD = 0.6
+NGRAM_SIZE = 4
+HASH_DIMENSIONS = 4096
+CANDIDATE_MIN_COSINE = 0.5
+RECHECK_TOP = 5
+
+
+def find_duplicate_difflib(
+    new_scenario: str, existing_scenarios: Iterable[str], threshold: float = SIMILARITY_THRESHOLD
+) -> Optional[Tuple[str, float]]:
+    """Linear reference path: first existing scenario with ratio > threshold, and its ratio."""
+    new_lower = new_scenario.lower()
+    for existing in existing_scenarios:
+        ratio = difflib.SequenceMatcher(None, new_lower, existing.lower()).ratio()
+        if ratio > threshold:
+            return existing, ratio
+    return None
+
+
+# Sparse n-gram counts of one scenario: (bucket ids, counts), both sorted by id
+Signature = Tuple[np.ndarray, np.ndarray]
+
+
+def ngram_signature(text: str) -> Signature:
+    """Hashed character n-gram counts of lowercased, whitespace-collapsed text."""
+    text = " ".join(text.lower().split())
+    if len(text) < NGRAM_SIZE:
+        grams = [text] if text else []
+    else:
+        grams = [text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)]
+    buckets = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % HASH_DIMENSIONS for gram in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+    ids, counts = np.unique(buckets, return_counts=True)
+    return ids.astype(np.uint16), counts.astype(np.uint32)
+
+
+class ScenarioIndex:
+    """
+    Dedup index over existing scenarios, built once per run.
+
+    IDF weights come from the scenarios the index is built with; scenarios
+    added later (e.g. accepted ones) reuse them. Pass precomputed signatures
+    (one per scenario, e.g. from ScenarioStore) to skip tokenising.
+    """
+
+    def __init__(
+        self,
+        scenarios: Iterable[str] = (),
+        threshold: float = SIMILARITY_THRESHOLD,
+        signatures: Optional[List[Signature]] = None,
+    ):
+        self.threshold = threshold
+        scenarios = list(scenarios)
+        if signatures is None:
+            scenarios = [s for s in scenarios if isinstance(s, str)]
+            signatures = [ngram_signature(s) for s in scenarios]
+        elif len(signatures) != len(scenarios):
+            raise ValueError(f"Got {len(signatures)} signatures for {len(scenarios)} scenarios")
+        self._scenarios: List[str] = []
+        self._lowered: List[str] = []
+
+        document_frequency = np.zeros(HASH_DIMENSIONS, dtype=np.float32)
+        for ids, _ in signatures:
+            document_frequency[ids] += 1
+        self._idf = (np.log((1 + len(scenarios)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        self._matrix = np.zeros((max(len(scenarios), 16), HASH_DIMENSIONS), dtype=np.float32)
+        for scenario, signature in zip(scenarios, signatures):
+            self._append(scenario, signature)
+
+    def __len__(self) -> int:
+        return len(self._scenarios)
+
+    def add(self, scenario: str) -> None:
+        """Index one more scenario (e.g. one accepted in this run)."""
+        self._append(scenario, ngram_signature(scenario))
+
+    def find_duplicate(self, new_scenario: str) -> Optional[Tuple[str, float]]:
+        """
+        First shortlisted scenario (nearest first) with difflib ratio > threshold, and its ratio.
+
+        Linear in the number of indexed scenarios (one dense matrix-vector product).
+        """
+        size = len(self._scenarios)
+        if not size:
+            return None
+        scores = self._matrix[:size] @ self._vector(ngram_signature(new_scenario))
+        shortlist = np.flatnonzero(scores >= CANDIDATE_MIN_COSINE)
+        shortlist = shortlist[np.argsort(-scores[shortlist])]
+
+        new_lower = new_scenario.lower()
+        for i in shortlist:
+            matcher = difflib.SequenceMatcher(None, new_lower, self._lowered[i])
+            if matcher.real_quick_ratio() > self.threshold and matcher.quick_ratio() > self.threshold:
+                ratio = matcher.ratio()
+                if ratio > self.threshold:
+                    return self._scenarios[i], ratio
+
+        # Safety net before accepting: the nearest rows below the cut-off get the reference check
+        top = min(RECHECK_TOP + len(shortlist), size)
+        nearest = np.argpartition(-scores, top - 1)[:top]
+        nearest = [i for i in nearest[np.argsort(-scores[nearest])] if scores[i] < CANDIDATE_MIN_COSINE]
+        return find_duplicate_difflib(new_scenario, [self._scenarios[i] for i in nearest[:RECHECK_TOP]], self.threshold)
+
+    def _vector(self, signature: Signature) -> np.ndarray:
+        ids, counts = signature
+        vector = np.zeros(HASH_DIMENSIONS, dtype=np.float32)
+        vector[ids] = counts * self._idf[ids]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _append(self, scenario: str, signature: Signature) -> None:
+        row = len(self._scenarios)
+        if row == self._matrix.shape[0]:
+            grown = np.zeros((2 * row, HASH_DIMENSIONS), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+        self._matrix[row] = self._vector(signature)
+        self._scenarios.append(scenario)
+        self._lowered.append(scenario.lower())
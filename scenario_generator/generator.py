@@ -5,15 +5,18 @@ Core scenario generation logic — classification, LLM calls, validation, and pi
 import json
 import os
 import re
-import difflib
+import sqlite3
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import openai
-from portkey_ai import PORTKEY_GATEWAY_URL, createHeaders
 from dotenv import load_dotenv
 
 from logger_config import logger
+from rate_limiter import create_gateway_client, rate_limited_responses_create
+from scenario_generator.dedup import ScenarioIndex, find_duplicate_difflib
+from scenario_generator.store import scenario_store
 from scenario_generator.prompts import (
     SCENARIO_SYSTEM_PROMPT,
     SCENARIO_GENERATION_SCHEMA,
@@ -148,6 +151,10 @@ def get_target_scenario_file(competencies: List[Dict]) -> Path:
 # LOADING & SAVING SCENARIOS
 # ============================================================================
 
+# Serialises read-merge-write of scenario files within this process
+_save_lock = threading.Lock()
+
+
 def load_all_existing_scenarios(scenario_files: List[Path]) -> List[str]:
     """Load all scenarios from multiple files into a flat list for deduplication."""
     all_scenarios = []
@@ -186,24 +193,32 @@ def load_scenarios_for_key(scenario_files: List[Path], key: str) -> List[str]:
 
 
 def save_generated_scenarios(scenarios: List[str], key: str, target_file: Path, append: bool = True):
-    """Save scenarios to the target JSON file under the given key."""
-    if append and target_file.exists():
-        try:
-            with open(target_file, "r", encoding="utf-8") as fh:
-                existing = json.load(fh)
-        except (json.JSONDecodeError, IOError):
-            existing = {}
-        if key in existing and isinstance(existing[key], list):
-            existing[key].extend(scenarios)
+    """Save scenarios to the target JSON file under the given key.
+
+    Safe to call from several threads (e.g. parallel pipeline runs sharing a
+    scenario file): the read-merge-write is serialised, and the file is
+    replaced atomically so readers never see a partial write.
+    """
+    with _save_lock:
+        if append and target_file.exists():
+            try:
+                with open(target_file, "r", encoding="utf-8") as fh:
+                    existing = json.load(fh)
+            except (json.JSONDecodeError, IOError):
+                existing = {}
+            if key in existing and isinstance(existing[key], list):
+                existing[key].extend(scenarios)
+            else:
+                existing[key] = scenarios
+            data = existing
         else:
-            existing[key] = scenarios
-        data = existing
-    else:
-        data = {key: scenarios}
+            data = {key: scenarios}
 
-    target_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(target_file, "w", encoding="utf-8") as fh:
-        json.dump(data, fh, indent=2, ensure_ascii=False)
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = target_file.with_name(f".{target_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, target_file)
     logger.info(f"Saved {len(scenarios)} scenarios to {target_file} under key '{key}'")
 
 
@@ -214,19 +229,11 @@ def save_generated_scenarios(scenarios: List[str], key: str, target_file: Path,
 def create_openai_client() -> openai.OpenAI:
     """Create OpenAI client with Portkey gateway, matching multiagent.py configuration."""
     api_key = os.getenv("OPENAI_API_KEY")
-    portkey_key = os.getenv("PORTKEY_API_KEY")
 
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY environment variable is not set")
 
-    return openai.OpenAI(
-        api_key=api_key,
-        base_url=PORTKEY_GATEWAY_URL,
-        default_headers=createHeaders(
-            provider="openai",
-            api_key=portkey_key,
-        ),
-    )
+    return create_gateway_client(api_key)
 
 
 # ============================================================================
@@ -327,13 +334,32 @@ def check_similarity(new_scenario: str, existing_scenarios: List[str], threshold
     Returns True if the scenario is unique enough (below threshold).
     Returns False if it's too similar to an existing one.
     """
-    for existing in existing_scenarios:
-        ratio = difflib.SequenceMatcher(None, new_scenario.lower(), existing.lower()).ratio()
-        if ratio > threshold:
-            logger.warning(
-                f"Scenario too similar (ratio={ratio:.2f}) to existing: {existing[:80]}..."
-            )
-            return False
+    duplicate = find_duplicate_difflib(new_scenario, existing_scenarios, threshold)
+    if duplicate:
+        existing, ratio = duplicate
+        logger.warning(
+            f"Scenario too similar (ratio={ratio:.2f}) to existing: {existing[:80]}..."
+        )
+        return False
+    return True
+
+
+def check_similarity_indexed(new_scenario: str, index: ScenarioIndex) -> bool:
+    """Approximate check_similarity against a prebuilt ScenarioIndex.
+
+    Returns False only for a scenario check_similarity would also reject (the
+    difflib ratio is verified). It only verifies a cosine shortlist plus the
+    RECHECK_TOP nearest scenarios, though, so it can return True for a
+    duplicate the full difflib scan would catch. tests/test_dedup.py measures
+    that false-accept rate on a fixture corpus.
+    """
+    duplicate = index.find_duplicate(new_scenario)
+    if duplicate:
+        existing, ratio = duplicate
+        logger.warning(
+            f"Scenario too similar (ratio={ratio:.2f}) to existing: {existing[:80]}..."
+        )
+        return False
     return True
 
 
@@ -388,7 +414,8 @@ def call_llm_generate(
 
     logger.info(f"Calling LLM ({GENERATION_MODEL}) to generate {count} scenarios...")
 
-    response = client.responses.create(
+    response = rate_limited_responses_create(
+        client,
         model=GENERATION_MODEL,
         input=messages,
         reasoning={"effort": "medium"},
@@ -438,7 +465,8 @@ def call_llm_evaluate(
 
     logger.info(f"Calling LLM ({EVAL_MODEL}) to evaluate {len(scenarios)} scenarios...")
 
-    response = client.responses.create(
+    response = rate_limited_responses_create(
+        client,
         model=EVAL_MODEL,
         input=messages,
         reasoning={"effort": "medium"},
@@ -510,10 +538,18 @@ def generate_scenarios_for_competencies(
         Path(__file__).parent.parent / "task_input_files" / "task_scenarios" / "task_sceanrio_no_code.json",
     ]
     scenario_files = existing_scenarios_files or default_files
-    all_existing = load_all_existing_scenarios(scenario_files)
-    key_existing = load_scenarios_for_key(scenario_files, scenario_key)
+    try:
+        all_existing, signatures = scenario_store.corpus(scenario_files)
+        key_existing = scenario_store.scenarios_for_key(scenario_files, scenario_key)
+    except sqlite3.Error as e:
+        logger.warning(f"Scenario index unavailable ({e}); reading scenario files directly")
+        all_existing = load_all_existing_scenarios(scenario_files)
+        key_existing = load_scenarios_for_key(scenario_files, scenario_key)
+        signatures = None
 
     logger.info(f"Loaded {len(all_existing)} total existing scenarios, {len(key_existing)} for this key")
+    # Built once; accepted scenarios are added as they pass evaluation
+    dedup_index = ScenarioIndex(all_existing, signatures=signatures)
 
     # --- Generation + Validation loop ---
     passing_scenarios = []
@@ -556,10 +592,9 @@ def generate_scenarios_for_competencies(
                 logger.warning(f"Scenario failed structural validation: {s[:80]}...")
 
         # Deduplication against all existing + already accepted
-        combined_existing = all_existing + passing_scenarios
         unique = []
         for s in structurally_valid:
-            if check_similarity(s, combined_existing):
+            if check_similarity_indexed(s, dedup_index):
                 unique.append(s)
             else:
                 logger.warning(f"Scenario rejected as duplicate: {s[:80]}...")
@@ -581,6 +616,7 @@ def generate_scenarios_for_competencies(
             idx = ev.get("scenario_index", -1)
             if 0 <= idx < len(unique) and ev.get("pass", False):
                 passing_scenarios.append(unique[idx])
+                dedup_index.add(unique[idx])
                 logger.info(f"Scenario {idx+1} passed evaluation")
             elif 0 <= idx < len(unique):
                 reason = ev.get("reason", "unknown")
@@ -0,0 +1,165 @@
+"""
+Persistent index of the scenario corpus shared across scenario_generator runs.
+
+Every generation run used to re-read and re-parse all scenario files twice
+(once for the whole corpus, once for its own key) and re-tokenise every
+scenario for dedup. ScenarioStore keeps one SQLite database with each file's
+scenarios, their key and their precomputed n-gram signature:
+
+- A file is only re-parsed when its mtime or size changed since it was last
+  indexed, and then only that file's rows are replaced.
+- Scenarios for a key are an indexed lookup instead of a file scan.
+- The dedup index is built from the stored signatures, so old scenarios are
+  never re-tokenised.
+
+Configuration (environment variables):
+    SCENARIO_INDEX_PATH  SQLite file (default: .scenario_index.sqlite next to this package)
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from logger_config import logger
+from scenario_generator.dedup import HASH_DIMENSIONS, NGRAM_SIZE, Signature, ngram_signature
+
+# Stored signatures are only valid for the n-gram settings they were built with
+SIGNATURE_VERSION = f"{NGRAM_SIZE}:{HASH_DIMENSIONS}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS scenarios (
+    path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    key_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    gram_ids BLOB NOT NULL,
+    gram_counts BLOB NOT NULL,
+    PRIMARY KEY (path, key_position, position)
+);
+CREATE INDEX IF NOT EXISTS scenarios_by_key ON scenarios (key, path);
+"""
+
+
+class ScenarioStore:
+    """
+    SQLite-backed scenario corpus with mtime-based invalidation.
+
+    Every read method takes the list of scenario files it should cover and
+    first brings the stored copy of those files up to date. Results keep file
+    order, then key order, then position within the key, like the JSON loaders.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+
+    def corpus(self, scenario_files: List[Path]) -> Tuple[List[str], List[Signature]]:
+        """All scenarios of the files and their n-gram signatures."""
+        paths = self._sync(scenario_files)
+        scenarios, signatures = [], []
+        with self._connect() as conn:
+            for path in paths:
+                rows = conn.execute(
+                    "SELECT text, gram_ids, gram_counts FROM scenarios WHERE path = ? "
+                    "ORDER BY key_position, position",
+                    (path,),
+                )
+                for text, gram_ids, gram_counts in rows:
+                    scenarios.append(text)
+                    signatures.append((np.frombuffer(gram_ids, dtype=np.uint16),
+                                       np.frombuffer(gram_counts, dtype=np.uint32)))
+        return scenarios, signatures
+
+    def scenarios_for_key(self, scenario_files: List[Path], key: str) -> List[str]:
+        """Scenarios stored under key (or its reverse, for 2-competency keys)."""
+        keys = [key]
+        parts = [p.strip() for p in key.split(",")]
+        if len(parts) == 2:
+            keys.append(f"{parts[1]}, {parts[0]}")
+        paths = self._sync(scenario_files)
+        scenarios = []
+        with self._connect() as conn:
+            for path in paths:
+                for k in keys:
+                    rows = conn.execute(
+                        "SELECT text FROM scenarios WHERE key = ? AND path = ? ORDER BY position",
+                        (k, path),
+                    )
+                    scenarios.extend(text for (text,) in rows)
+        return scenarios
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection whose block runs as one transaction; closed afterwards."""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.executescript(_SCHEMA)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _sync(self, scenario_files: List[Path]) -> List[str]:
+        """Re-index files that changed on disk; return the paths of the ones that exist."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        present = []
+        with self._connect() as conn:
+            version = conn.execute("SELECT value FROM meta WHERE name = 'signature_version'").fetchone()
+            if version is None or version[0] != SIGNATURE_VERSION:
+                conn.execute("DELETE FROM files")
+                conn.execute("DELETE FROM scenarios")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature_version', ?)", (SIGNATURE_VERSION,))
+
+            for scenario_file in scenario_files:
+                path = str(Path(scenario_file).resolve())
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                    conn.execute("DELETE FROM scenarios WHERE path = ?", (path,))
+                    continue
+                present.append(path)
+                indexed = conn.execute("SELECT mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+                if indexed == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                rows = self._parse(path)
+                if rows is None:
+                    # Unreadable right now; keep the last good copy and retry next time
+                    continue
+                conn.execute("DELETE FROM scenarios WHERE path = ?", (path,))
+                conn.executemany("INSERT INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, stat.st_mtime_ns, stat.st_size))
+                logger.info(f"Indexed {len(rows)} scenarios from {path}")
+        return present
+
+    @staticmethod
+    def _parse(path: str) -> Optional[List[tuple]]:
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Could not read scenarios from {path}: {e}")
+            return None
+        rows = []
+        if not isinstance(data, dict):
+            return rows
+        for key_position, (key, scenarios) in enumerate(data.items()):
+            if not isinstance(scenarios, list):
+                continue
+            for position, text in enumerate(scenarios):
+                if isinstance(text, str):
+                    ids, counts = ngram_signature(text)
+                    rows.append((path, key, key_position, position, text, ids.tobytes(), counts.tobytes()))
+        return rows
+
+
+scenario_store = ScenarioStore(
+    Path(os.getenv("SCENARIO_INDEX_PATH", str(Path(__file__).parent.parent / ".scenario_index.sqlite")))
+)
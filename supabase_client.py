@@ -0,0 +1,171 @@
+"""
+Shared Supabase clients, one per environment.
+
+Creating a Supabase client builds a new HTTP session, so every call site that
+ran init_supabase() paid a fresh TCP + TLS handshake. get_supabase(env) lazily
+creates one client per environment on first use and hands the same instance
+to every module. Its requests go through a single pooled, keep-alive httpx
+client, which is thread-safe and is shared by the stage graph and deploy workers.
+
+Configuration (environment variables):
+    SUPABASE_HTTP_POOL_SIZE       Maximum pooled connections per environment (default: 20)
+    COMPETENCY_INDEX_TTL_SECONDS  Reuse window of the competency -> task index (default: 300)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+import httpx
+from supabase import Client, ClientOptions, create_client
+
+from logger_config import logger
+
+SUPABASE_HTTP_POOL_SIZE = int(os.getenv("SUPABASE_HTTP_POOL_SIZE", "20"))
+# Same request timeout supabase-py uses when it owns the HTTP client
+SUPABASE_TIMEOUT_SECONDS = 120
+
+_clients: Dict[str, Client] = {}
+_http_clients: Dict[str, httpx.Client] = {}
+_lock = threading.Lock()
+
+
+def supabase_credentials(env: str = "dev") -> Tuple[str, str]:
+    """Return (url, key) for an environment; anything but "dev" means production."""
+    if env == "dev":
+        url = os.getenv("SUPABASE_URL_APTITUDETESTSDEV")
+        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTSDEV")
+    else:
+        url = os.getenv("SUPABASE_URL_APTITUDETESTS")
+        key = os.getenv("SUPABASE_API_KEY_APTITUDETESTS")
+
+    if not url or not key:
+        raise ValueError(f"Missing Supabase credentials for environment: {env}")
+    return url, key
+
+
+def get_supabase(env: str = "dev") -> Client:
+    """Return the shared Supabase client for an environment, creating it on first use."""
+    env_key = "dev" if env == "dev" else "prod"
+    with _lock:
+        client = _clients.get(env_key)
+        if client is None:
+            url, key = supabase_credentials(env)
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_HTTP_POOL_SIZE,
+                    max_keepalive_connections=SUPABASE_HTTP_POOL_SIZE,
+                ),
+                timeout=SUPABASE_TIMEOUT_SECONDS,
+            )
+            client = create_client(url, key, options=ClientOptions(httpx_client=http_client))
+            _clients[env_key] = client
+            _http_clients[env_key] = http_client
+            logger.info(f"Created shared Supabase client for {env_key} (pool size {SUPABASE_HTTP_POOL_SIZE})")
+        return client
+
+
+def close_supabase_clients() -> None:
+    """Drop every shared client and close its pooled connections."""
+    with _lock:
+        http_clients = list(_http_clients.values())
+        _clients.clear()
+        _http_clients.clear()
+    for http_client in http_clients:
+        http_client.close()
+
+
+def insert_task_with_competencies(supabase: Client, task_row: Dict, competency_ids: List[str]) -> Dict:
+    """
+    Insert a task and all of its task_competencies links, or neither.
+
+    The links go in as one bulk insert (a single statement, so all or nothing).
+    If that fails, the task row is deleted again so no task is left without its
+    competencies, and the error is re-raised.
+
+    Returns:
+        The inserted task row
+    """
+    result = supabase.table("tasks").insert(task_row).execute()
+    if not result.data:
+        raise RuntimeError("Failed to insert task into Supabase - no data returned")
+    task = result.data[0]
+    key_column = "id" if task.get("id") else "task_id"
+    task_id = task[key_column]
+
+    # dict.fromkeys keeps the first occurrence of each ID in order
+    links = [{"task_id": task_id, "competency_id": competency_id}
+             for competency_id in dict.fromkeys(c for c in competency_ids if c)]
+    if links:
+        try:
+            supabase.table("task_competencies").insert(links).execute()
+        except Exception as e:
+            logger.error(f"Failed to insert {len(links)} task-competency links for task {task_id}; rolling back task: {str(e)}")
+            try:
+                supabase.table("tasks").delete().eq(key_column, task_id).execute()
+            except Exception as rollback_error:
+                logger.error(f"Rollback of task {task_id} failed; delete it manually: {str(rollback_error)}")
+            raise
+    env = next((env for env, client in _clients.items() if client is supabase), None)
+    if env is not None:
+        competency_task_index.add(env, task_id, [link["competency_id"] for link in links])
+    logger.info(f"Inserted task {task_id} with {len(links)} competency link(s)")
+    return task
+
+
+class CompetencyTaskIndex:
+    """
+    In-process inverted index competency_id -> task IDs, built from task_competencies.
+
+    Only the (task_id, competency_id) pairs of the requested competencies are
+    fetched, and each competency's postings are reused for
+    COMPETENCY_INDEX_TTL_SECONDS so repeated lookups in one run skip the query.
+    Tasks inserted through insert_task_with_competencies are added immediately.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        # (env, competency_id) -> (fetched_at, task IDs)
+        self._postings: Dict[Tuple[str, str], Tuple[float, Set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def task_ids_with_all(self, supabase: Client, env: str, competency_ids: List[str]) -> Set[str]:
+        """Task IDs linked to every one of the given competencies."""
+        now = time.monotonic()
+        with self._lock:
+            missing = [cid for cid in dict.fromkeys(competency_ids)
+                       if (env, cid) not in self._postings or now - self._postings[(env, cid)][0] > self.ttl_seconds]
+        if missing:
+            fetched: Dict[str, Set[str]] = {cid: set() for cid in missing}
+            offset = 0
+            while True:
+                # A stable order keeps pages from skipping or repeating rows
+                rows = supabase.table("task_competencies").select("task_id, competency_id") \
+                    .in_("competency_id", missing).order("task_id").order("competency_id") \
+                    .range(offset, offset + self.PAGE_SIZE - 1).execute().data or []
+                for row in rows:
+                    fetched.setdefault(row["competency_id"], set()).add(str(row["task_id"]))
+                if len(rows) < self.PAGE_SIZE:
+                    break
+                offset += self.PAGE_SIZE
+            with self._lock:
+                for cid, task_ids in fetched.items():
+                    self._postings[(env, cid)] = (now, task_ids)
+
+        with self._lock:
+            postings = [self._postings[(env, cid)][1] for cid in dict.fromkeys(competency_ids)]
+        return set.intersection(*postings) if postings else set()
+
+    def add(self, env: str, task_id: str, competency_ids: List[str]) -> None:
+        """Record a new task's links in postings that are already cached."""
+        with self._lock:
+            for cid in competency_ids:
+                entry = self._postings.get((env, cid))
+                if entry is not None:
+                    entry[1].add(str(task_id))
+
+
+competency_task_index = CompetencyTaskIndex(float(os.getenv("COMPETENCY_INDEX_TTL_SECONDS", "300")))
@@ -0,0 +1,51 @@
+"""
+check_similarity_indexed against the linear check_similarity on a fixture
+corpus drawn from the shipped scenario files: held-out scenarios (fresh) plus
+perturbed copies of indexed ones (mostly near-duplicates).
+
+Run with: python -m pytest tests
+"""
+
+import random
+
+import pytest
+
+from scenario_generator.benchmark_dedup import DEFAULT_SCENARIO_DIR, _perturb
+from scenario_generator.dedup import ScenarioIndex
+from scenario_generator.generator import check_similarity, check_similarity_indexed, load_all_existing_scenarios
+
+SEED = 7
+INDEXED = 40
+FRESH = 10
+NEAR_DUPLICATES = 30
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    scenarios = [s for s in load_all_existing_scenarios(sorted(DEFAULT_SCENARIO_DIR.glob("*.json")))
+                 if isinstance(s, str)]
+    if len(scenarios) < INDEXED + FRESH:
+        pytest.skip(f"Need {INDEXED + FRESH} scenarios in {DEFAULT_SCENARIO_DIR}, found {len(scenarios)}")
+    rng = random.Random(SEED)
+    rng.shuffle(scenarios)
+    indexed = scenarios[:INDEXED]
+    queries = scenarios[INDEXED:INDEXED + FRESH] + [_perturb(rng.choice(indexed), rng) for _ in range(NEAR_DUPLICATES)]
+    linear = [check_similarity(q, indexed) for q in queries]
+    index = ScenarioIndex(indexed)
+    return queries, linear, [check_similarity_indexed(q, index) for q in queries]
+
+
+def test_index_never_rejects_what_difflib_accepts(corpus):
+    _, linear, indexed = corpus
+    false_rejects = [i for i, (a, b) in enumerate(zip(linear, indexed)) if a and not b]
+    assert false_rejects == []
+
+
+def test_index_false_accept_rate_on_fixture_corpus(corpus):
+    queries, linear, indexed = corpus
+    duplicates = [i for i, unique in enumerate(linear) if not unique]
+    false_accepts = [i for i in duplicates if indexed[i]]
+    # The corpus must exercise the duplicate path for the rate to mean anything
+    assert len(duplicates) >= NEAR_DUPLICATES // 2
+    # The index is an approximate filter; on this corpus it currently misses none
+    assert len(false_accepts) / len(duplicates) == 0.0, [queries[i][:80] for i in false_accepts]
@@ -0,0 +1,216 @@
+"""
+Warm pool lifecycle (warm, stage, claim, release, reconcile) against an
+in-memory stand-in for droplet_utils.ssh_connections.
+
+Run with: python -m pytest tests
+"""
+
+import json
+import re
+import shlex
+
+import pytest
+
+import droplet_pool
+from droplet_pool import POOL_MARKER_PATH, POOL_TASK_DIR
+
+STACK = "fastapi-postgres"
+CONFIG = {STACK: {"competencies": ["comp_1", "comp_2"], "size": 2, "images": ["python:3.11-slim", "postgres:16"]}}
+IDLE = {"containers": 0, "cpus": 2, "load1": 0.1, "mem_total_kb": 4_000_000, "mem_available_kb": 3_000_000,
+        "disk_total_kb": 50_000_000, "disk_available_kb": 40_000_000}
+BUSY = dict(IDLE, containers=3)
+
+
+def make_task(task_id, competencies=("comp_1", "comp_2")):
+    return {
+        "task_id": task_id,
+        "criterias": [{"competency_id": cid} for cid in competencies],
+        "task_blob": {"resources": {"github_repo": f"https://github.com/org/{task_id}"}},
+    }
+
+
+class FakeDroplet:
+    def __init__(self, health):
+        self.health = health
+        self.marker = None
+        self.task_files = None
+        self.pulled = []
+        self.builds = 0
+        self.probes = 0
+
+
+class FakeSSHConnections:
+    """Answers exactly the shell commands droplet_pool sends, against FakeDroplet state."""
+
+    def __init__(self, droplets):
+        self.droplets = droplets
+        self.commands = []
+
+    def get_client(self, host, timeout=30):
+        return object()
+
+    def run(self, host, command, timeout=None):
+        self.commands.append((host, command))
+        droplet = self.droplets[host]
+        if command.startswith(f"cat {POOL_MARKER_PATH}"):
+            return (0, droplet.marker, "") if droplet.marker else (1, "", "")
+        if command.startswith("printf %s"):
+            droplet.marker = shlex.split(command)[2]
+            return 0, "", ""
+        if command.startswith(f"mv {POOL_MARKER_PATH} {POOL_MARKER_PATH}.swap"):
+            marker = droplet.marker
+            if not marker:
+                return 1, "", ""
+            require = re.search(r"grep -qE ('[^']*'|\S+)", command)
+            if require and not re.search(shlex.split(require.group(1))[0], marker):
+                return 1, "", ""
+            droplet.marker = shlex.split(command.split("printf %s ", 1)[1])[0]
+            return 0, marker, ""
+        if command == f"rm -rf {POOL_TASK_DIR}":
+            droplet.task_files = None
+            return 0, "", ""
+        if "docker pull" in command:
+            droplet.pulled.extend(shlex.split(command.split(" in ", 1)[1].split(";", 1)[0]))
+            return 0, "", ""
+        if command.startswith(f"cd {POOL_TASK_DIR} && "):
+            droplet.builds += 1
+            return 0, "", ""
+        raise AssertionError(f"Unexpected command on {host}: {command}")
+
+
+@pytest.fixture
+def droplets(monkeypatch):
+    droplets = {"10.0.0.1": FakeDroplet(IDLE), "10.0.0.2": FakeDroplet(IDLE), "10.0.0.3": FakeDroplet(BUSY)}
+    ssh = FakeSSHConnections(droplets)
+
+    def probe(ip):
+        droplets[ip].probes += 1
+        return droplets[ip].health
+
+    def upload(local_dir, ip, remote_dir="/root/task", mode=None):
+        droplets[ip].task_files = remote_dir
+        return True
+
+    monkeypatch.setattr(droplet_pool, "ssh_connections", ssh)
+    monkeypatch.setattr(droplet_pool, "probe_droplet_health", probe)
+    monkeypatch.setattr(droplet_pool, "upload_files_to_droplet", upload)
+    return droplets
+
+
+def fetch_ok(url, local_dir):
+    return True
+
+
+def marker(droplet):
+    return json.loads(droplet.marker) if droplet.marker else None
+
+
+def test_warm_and_stage_write_markers(droplets):
+    droplet = droplets["10.0.0.1"]
+    assert droplet_pool.warm_droplet("10.0.0.1", STACK, CONFIG[STACK]["images"])
+    assert droplet.pulled == ["python:3.11-slim", "postgres:16"]
+    assert marker(droplet)["state"] == "warm"
+
+    assert droplet_pool.stage_task("10.0.0.1", STACK, make_task("t1"), fetch_ok)
+    assert droplet.task_files == POOL_TASK_DIR and droplet.builds == 1
+    assert marker(droplet)["state"] == "staged" and marker(droplet)["task_id"] == "t1"
+
+
+def test_claim_prefers_exact_staged_task_and_is_exclusive(droplets):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    droplet_pool.warm_droplet("10.0.0.2", STACK, [])
+    droplet_pool.stage_task("10.0.0.2", STACK, make_task("t2"), fetch_ok)
+    ips = ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+    ip, claimed = droplet_pool.claim_droplet(make_task("t2"), ips, CONFIG)
+    assert ip == "10.0.0.2" and claimed["task_id"] == "t2"
+    assert marker(droplets["10.0.0.2"])["state"] == "in-use"
+
+    ip, claimed = droplet_pool.claim_droplet(make_task("t2"), ips, CONFIG)
+    assert ip == "10.0.0.1" and claimed["state"] == "warm"
+    assert droplet_pool.claim_droplet(make_task("t2"), ips, CONFIG) is None
+
+
+def test_claim_ignores_tasks_outside_every_stack(droplets):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    assert droplet_pool.claim_droplet(make_task("t1", ["comp_1"]), ["10.0.0.1"], CONFIG) is None
+    assert marker(droplets["10.0.0.1"])["state"] == "warm"
+
+
+def test_claim_reuses_given_statuses(droplets):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    ips = ["10.0.0.1", "10.0.0.2"]
+    statuses = droplet_pool.pool_status(ips)
+    assert droplet_pool.claim_droplet(make_task("t1"), ips, CONFIG, statuses)[0] == "10.0.0.1"
+    assert [droplets[ip].probes for ip in ips] == [1, 1]
+
+
+def test_release_clears_staged_task(droplets):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    droplet_pool.stage_task("10.0.0.1", STACK, make_task("t1"), fetch_ok)
+    assert droplet_pool.release_droplet("10.0.0.1")["state"] == "staged"
+    assert marker(droplets["10.0.0.1"])["state"] == "in-use" and droplets["10.0.0.1"].task_files is None
+    assert droplet_pool.release_droplet("10.0.0.1")["state"] == "in-use"
+    # A droplet outside the pool is marked in-use too
+    assert droplet_pool.release_droplet("10.0.0.2") is None
+    assert marker(droplets["10.0.0.2"])["state"] == "in-use"
+
+
+def test_staging_droplet_cannot_be_claimed(droplets, monkeypatch):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    upload = droplet_pool.upload_files_to_droplet
+
+    def upload_while_claiming(local_dir, ip, remote_dir="/root/task", mode=None):
+        assert marker(droplets[ip])["state"] == "staging"
+        assert droplet_pool.claim_droplet(make_task("t9"), [ip], CONFIG) is None
+        return upload(local_dir, ip, remote_dir, mode)
+
+    monkeypatch.setattr(droplet_pool, "upload_files_to_droplet", upload_while_claiming)
+    assert droplet_pool.stage_task("10.0.0.1", STACK, make_task("t1"), fetch_ok)
+    assert marker(droplets["10.0.0.1"])["state"] == "staged"
+
+
+def test_stage_does_not_overwrite_a_deploy_that_took_the_droplet(droplets, monkeypatch):
+    droplet_pool.warm_droplet("10.0.0.1", STACK, [])
+    upload = droplet_pool.upload_files_to_droplet
+
+    def upload_then_deploy(local_dir, ip, remote_dir="/root/task", mode=None):
+        result = upload(local_dir, ip, remote_dir, mode)
+        droplet_pool.release_droplet(ip)
+        return result
+
+    monkeypatch.setattr(droplet_pool, "upload_files_to_droplet", upload_then_deploy)
+    assert not droplet_pool.stage_task("10.0.0.1", STACK, make_task("t1"), fetch_ok)
+    assert marker(droplets["10.0.0.1"])["state"] == "in-use"
+    # In-use and staging droplets are never staged
+    assert not droplet_pool.stage_task("10.0.0.1", STACK, make_task("t1"), fetch_ok)
+
+
+def test_reconcile_skips_droplets_marked_in_use(droplets):
+    droplet_pool.release_droplet("10.0.0.1")
+    summary = droplet_pool.reconcile_pool(["10.0.0.1"], lambda competencies: [make_task("t1")], fetch_ok, CONFIG)
+    assert summary[STACK]["staged"] == 0 and marker(droplets["10.0.0.1"])["state"] == "in-use"
+
+    # An in-use marker from a deploy that never started its containers eventually expires
+    stale = dict(marker(droplets["10.0.0.1"]), updated_at="2000-01-01T00:00:00+00:00")
+    droplets["10.0.0.1"].marker = json.dumps(stale)
+    summary = droplet_pool.reconcile_pool(["10.0.0.1"], lambda competencies: [make_task("t1")], fetch_ok, CONFIG)
+    assert summary[STACK]["staged"] == 1
+
+
+def test_reconcile_fills_stack_and_stages_distinct_tasks(droplets):
+    tasks = [make_task("t1"), make_task("t2"), make_task("t3")]
+    summary = droplet_pool.reconcile_pool(
+        ["10.0.0.1", "10.0.0.2", "10.0.0.3"], lambda competencies: tasks, fetch_ok, CONFIG
+    )
+    assert summary == {STACK: {"size": 2, "warm": 0, "staged": 2}}
+    staged = {marker(droplets[ip])["task_id"] for ip in ("10.0.0.1", "10.0.0.2")}
+    assert staged == {"t1", "t2"}
+    # Busy droplets are never taken into the pool
+    assert droplets["10.0.0.3"].marker is None
+
+    # Once t1 is deployed elsewhere, its droplet is re-staged with the next task
+    tasks.pop(0)
+    droplet_pool.reconcile_pool(["10.0.0.1", "10.0.0.2", "10.0.0.3"], lambda competencies: tasks, fetch_ok, CONFIG)
+    staged = {marker(droplets[ip])["task_id"] for ip in ("10.0.0.1", "10.0.0.2")}
+    assert staged == {"t2", "t3"}
@@ -6,6 +6,7 @@ import base64
 from urllib.parse import urlparse
 from pathlib import Path
 from logger_config import logger
+from llm_cache import cached_responses_create
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 
@@ -331,11 +332,16 @@ def unwrap_file_contents(files_dict):
             new_files[file_path] = content
     return new_files
 
-def save_files_locally(task_id: str, task_data: Dict) -> Path:
-    """Save generated files locally before uploading to GitHub and droplet."""
+def save_files_locally(task_id: str, task_data: Dict, target_dir: Optional[Path] = None) -> Path:
+    """
+    Save generated files locally before uploading to GitHub and droplet.
+
+    Files go to target_dir if given (e.g. a resumed run's directory, wherever it
+    lives), otherwise to infra_assets/tasks/<task_id>.
+    """
     try:
         base_dir = Path(__file__).parent / "infra_assets"
-        local_task_dir = base_dir / "tasks" / task_id
+        local_task_dir = Path(target_dir) if target_dir is not None else base_dir / "tasks" / task_id
         local_task_dir.mkdir(parents=True, exist_ok=True)
 
         logger.info(f"Saving files locally to: {local_task_dir}")
@@ -374,6 +380,39 @@ def save_files_locally(task_id: str, task_data: Dict) -> Path:
         logger.error(f"Error saving files locally: {str(e)}")
         raise
 
+CHECKPOINT_DIR_NAME = ".checkpoints"
+
+def save_stage_checkpoint(local_task_dir: Path, stage: str, result: Any) -> None:
+    """Persist the JSON-serialisable result of a create_task stage in the local task directory."""
+    checkpoint_dir = Path(local_task_dir) / CHECKPOINT_DIR_NAME
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = checkpoint_dir / f"{stage}.json"
+    tmp_path = checkpoint_path.with_suffix(".json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"stage": stage, "saved_at": datetime.now().isoformat(), "result": result}, f, indent=2, ensure_ascii=False, default=str)
+    tmp_path.replace(checkpoint_path)
+    logger.info(f"Checkpointed stage '{stage}' to {checkpoint_path}")
+
+def remove_stage_checkpoint(local_task_dir: Path, stage: str) -> None:
+    """Delete a stage checkpoint so a resumed run repeats that stage."""
+    (Path(local_task_dir) / CHECKPOINT_DIR_NAME / f"{stage}.json").unlink(missing_ok=True)
+
+def load_stage_checkpoints(local_task_dir: Path) -> Dict[str, Any]:
+    """Load every stage checkpoint from a local task directory as a dict of stage -> result."""
+    checkpoint_dir = Path(local_task_dir) / CHECKPOINT_DIR_NAME
+    checkpoints = {}
+    if not checkpoint_dir.is_dir():
+        return checkpoints
+    for checkpoint_path in sorted(checkpoint_dir.glob("*.json")):
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            checkpoints[data["stage"]] = data["result"]
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {str(e)}")
+    logger.info(f"Loaded checkpoints for stages: {sorted(checkpoints)}")
+    return checkpoints
+
 def clean_llm_json_response(response: str) -> str:
     """Clean LLM response to extract valid JSON"""
     try:
@@ -596,6 +635,70 @@ def get_task_prompt_by_technology_stack(competency_stack, input_data):
         prompts = prompt_library.get(competency_stack, [])
     return prompts
 
+def _extract_task_json(response_text: str) -> Optional[Dict]:
+    """Parse the task JSON from the final generation turn, returning None if none is found."""
+    # Try to extract JSON from the response, handling cases where it might be embedded in text or markdown
+    task_data = None
+    response_text = response_text.strip()
+    
+    try:
+        # First, try parsing the response directly as JSON
+        task_data = json.loads(response_text)
+    except json.JSONDecodeError:
+        # If direct parsing fails, try to extract JSON from markdown code blocks
+        logger.warning("Direct JSON parsing failed, attempting to extract JSON from markdown code blocks")
+        
+        # Look for JSON in markdown code blocks (```json ... ``` or ``` ... ```)
+        json_patterns = [
+            r'```json\s*(.*?)\s*```',  # JSON in ```json code block
+            r'```\s*(\{.*?\})\s*```',  # JSON object in ``` code block
+            r'(\{.*\})',  # Any JSON object in the text
+        ]
+        
+        for pattern in json_patterns:
+            matches = re.findall(pattern, response_text, re.DOTALL)
+            for match in matches:
+                try:
+                    # Try to parse the matched content
+                    extracted_json = match.strip()
+                    task_data = json.loads(extracted_json)
+                    logger.info("Successfully extracted JSON from markdown code block")
+                    break
+                except json.JSONDecodeError:
+                    continue
+            
+            if task_data is not None:
+                break
+        
+        # If still no JSON found, try to find the largest JSON object in the text
+        if task_data is None:
+            logger.warning("JSON extraction from code blocks failed, attempting to find JSON object in text")
+            # Find all potential JSON objects (starting with { and ending with })
+            brace_count = 0
+            start_idx = -1
+            for i, char in enumerate(response_text):
+                if char == '{':
+                    if brace_count == 0:
+                        start_idx = i
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0 and start_idx != -1:
+                        potential_json = response_text[start_idx:i+1]
+                        try:
+                            task_data = json.loads(potential_json)
+                            logger.info("Successfully extracted JSON object from text")
+                            break
+                        except json.JSONDecodeError:
+                            continue
+
+    return task_data
+
+
+def _has_task_json(response) -> bool:
+    return _extract_task_json(getattr(response, "output_text", None) or "") is not None
+
+
 def generate_task_with_code(openai_client, input_data: Dict) -> Dict:
     """Generate task and code files using language_prompts with Responses API and reasoning.
     
@@ -633,9 +736,13 @@ def generate_task_with_code(openai_client, input_data: Dict) -> Dict:
 
         # Send prompts one by one and log each response using Responses API
         response = None
-        for prompt in task_generation_prompts:
+        for turn, prompt in enumerate(task_generation_prompts, 1):
             messages.append({"role": "user", "content": prompt})
-            response = openai_client.responses.create(
+            final_turn = turn == len(task_generation_prompts)
+            response = cached_responses_create(
+                openai_client,
+                # Never store (or replay) a final answer that has no task JSON in it
+                accept=_has_task_json if final_turn else None,
                 model=model,
                 input=messages,
                 reasoning={"effort": "medium"},
@@ -654,61 +761,9 @@ def generate_task_with_code(openai_client, input_data: Dict) -> Dict:
             raise RuntimeError("Failed to get output_text from OpenAI Responses API")
 
         # Parse JSON from the final response
-        # Try to extract JSON from the response, handling cases where it might be embedded in text or markdown
-        task_data = None
         response_text = response.output_text.strip()
-        
-        try:
-            # First, try parsing the response directly as JSON
-            task_data = json.loads(response_text)
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to extract JSON from markdown code blocks
-            logger.warning("Direct JSON parsing failed, attempting to extract JSON from markdown code blocks")
-            
-            # Look for JSON in markdown code blocks (```json ... ``` or ``` ... ```)
-            json_patterns = [
-                r'```json\s*(.*?)\s*```',  # JSON in ```json code block
-                r'```\s*(\{.*?\})\s*```',  # JSON object in ``` code block
-                r'(\{.*\})',  # Any JSON object in the text
-            ]
-            
-            for pattern in json_patterns:
-                matches = re.findall(pattern, response_text, re.DOTALL)
-                for match in matches:
-                    try:
-                        # Try to parse the matched content
-                        extracted_json = match.strip()
-                        task_data = json.loads(extracted_json)
-                        logger.info("Successfully extracted JSON from markdown code block")
-                        break
-                    except json.JSONDecodeError:
-                        continue
-                
-                if task_data is not None:
-                    break
-            
-            # If still no JSON found, try to find the largest JSON object in the text
-            if task_data is None:
-                logger.warning("JSON extraction from code blocks failed, attempting to find JSON object in text")
-                # Find all potential JSON objects (starting with { and ending with })
-                brace_count = 0
-                start_idx = -1
-                for i, char in enumerate(response_text):
-                    if char == '{':
-                        if brace_count == 0:
-                            start_idx = i
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0 and start_idx != -1:
-                            potential_json = response_text[start_idx:i+1]
-                            try:
-                                task_data = json.loads(potential_json)
-                                logger.info("Successfully extracted JSON object from text")
-                                break
-                            except json.JSONDecodeError:
-                                continue
-        
+        task_data = _extract_task_json(response_text)
+
         if task_data is None:
             error_msg = f"Failed to parse JSON from response.output_text. Response preview: {response_text[:500]}"
             logger.error(error_msg)